@@ -1,6 +1,5 @@
 from uuid import uuid4
-from django.db import transaction
-from django.db.models import DO_NOTHING, ForeignKey, Model
+from django.db.models import DO_NOTHING, Expression, ForeignKey, Model
 from django.db.models.fields import (
     BooleanField,
     CharField,
@@ -30,13 +29,22 @@ class UUIDPKField(UUIDField):
         super().__init__(*args, **kwargs)
 
 
+class SequenceDefault(Expression):
+    """Значение по-умолчанию колонки (DEFAULT) в INSERT."""
+
+    def as_sql(self, compiler, connection):
+        return 'DEFAULT', []
+
+
 class Article(Field):
     """
     Авто-инкрементное поле, но при этом не PK.
 
     Собрано из стандартных AutoField и IntegerField.
+    Значения выдаёт последовательность базы.
     """
     description = _("Integer")
+    db_returning = True
 
     empty_strings_allowed = False
     default_error_messages = {
@@ -104,22 +112,18 @@ class Article(Field):
         cls._meta.auto_field = self
 
     def pre_save(self, model_instance, add):
-        # Проверяем, что значение корректно встало
+        """
+        Новое значение выдаёт последовательность serial.
+
+        Вместо значения в INSERT уходит DEFAULT, а присвоенный номер
+        возвращается через RETURNING (db_returning), в том числе
+        для каждого объекта в bulk_create. Таблица не блокируется.
+        """
         value = getattr(model_instance, self.attname, None)
         if value is None and add:
-            value = self.get_next_value(model_instance)
-            setattr(model_instance, self.attname, value)
+            return SequenceDefault(output_field=self)
         return value
 
-    def get_next_value(self, model_instance):
-        with transaction.atomic():
-            # Лочим табличку чтобы избежать race conditions
-            last_instance = model_instance.__class__.objects.select_for_update(
-            ).order_by('-' + self.attname).first()
-            if last_instance:
-                return getattr(last_instance, self.attname) + 1
-            return 1
-
     def formfield(self, **kwargs):
         return None
 
@@ -1,3 +1,5 @@
+from datetime import datetime, timedelta
+from functools import cache
 from typing import Type, TypeVar
 from django.db.models import Model
 
@@ -68,7 +70,19 @@ def get_list_of_file_types() -> dict[str, set[str]]:
 
 
 def get_minio_client(external=False):
-    """Авторизует запрос для обращений к облаку."""
+    """
+    Авторизует запрос для обращений к облаку.
+
+    Клиент один на процесс (свой для внешнего и внутреннего адреса),
+    чтобы переиспользовать его пул соединений.
+    """
+    # get_minio_client(), get_minio_client(False) и external=False -
+    # разные ключи кеша, поэтому кешируем по приведённому аргументу
+    return _get_minio_client(bool(external))
+
+
+@cache
+def _get_minio_client(external: bool):
     from minio import Minio
     from django.conf import settings
 
@@ -87,20 +101,93 @@ def get_minio_client(external=False):
     return minio_client
 
 
-def get_instance_or_404(model: Type[ModelType],
-                        pk: str) -> ModelType:
+# Ссылки на скачивание выдаются на PRESIGNED_URL_EXPIRES, а отдаются
+# из кеша не дольше PRESIGNED_URL_CACHE_TIMEOUT, чтобы у клиента
+# оставался запас времени на скачивание
+PRESIGNED_URL_EXPIRES = timedelta(hours=2)
+PRESIGNED_URL_CACHE_TIMEOUT = timedelta(hours=1, minutes=30)
+PRESIGNED_URL_CACHE_SIZE = 100_000
+_presigned_urls: dict[tuple[str, str], tuple[str, datetime]] = {}
+
+
+def get_presigned_url(bucket: str, object_name: str) -> str:
     """
-    Если в базе существует объект модели {model} с заданным {pk},
-    возвращаем его, иначе возвращаем 404_NOT_FOUND.
-    Если {pk} не является UUID, возвращаем 400_BAD_REQUEST.
+    Ссылка на скачивание объекта из облака.
+
+    Подпись ссылки считается локально, но всё равно заметно дороже
+    обращения к словарю, а в плейлисте бывают сотни файлов. Поэтому
+    ссылки кешируются в памяти процесса по пути объекта.
     """
-    from django.shortcuts import get_object_or_404
+    key = (bucket, object_name)
+    now = datetime.now()
+    cached = _presigned_urls.get(key)
+    if cached is not None and cached[1] > now:
+        return cached[0]
+    url = get_minio_client(external=True).get_presigned_url(
+        'GET',
+        bucket,
+        object_name,
+        expires=PRESIGNED_URL_EXPIRES
+    )
+    if len(_presigned_urls) >= PRESIGNED_URL_CACHE_SIZE:
+        _presigned_urls.clear()
+    _presigned_urls[key] = (url, now + PRESIGNED_URL_CACHE_TIMEOUT)
+    return url
+
+
+@cache
+def get_redis_client():
+    """Общий на процесс клиент редиса со своим пулом соединений."""
+    from redis import Redis
+    from django.conf import settings
+
+    return Redis.from_url(settings.REDIS_URL, decode_responses=True)
+
+
+@cache
+def get_clickhouse_client():
+    """
+    Общий на процесс HTTP клиент кликхауса.
+
+    ORM ходит в кликхаус по нативному протоколу, а этот клиент нужен там,
+    где ответ кликхауса надо отдать как есть (выгрузки статистики).
+    """
+    import clickhouse_connect
+    from clickhouse_connect import common
+    from django.conf import settings
+    from django.db import connections
+
+    # без сессии клиент можно использовать из нескольких потоков
+    common.set_setting('autogenerate_session_id', False)
+    database = connections['clickhouse'].settings_dict
+    return clickhouse_connect.get_client(
+        host=database['HOST'],
+        port=settings.CLICKHOUSE_HTTP_PORT,
+        username=database['USER'],
+        password=database['PASSWORD'] or '',
+        database=database['NAME']
+    )
+
+
+def validate_uuid(pk: str) -> None:
+    """Если {pk} не является UUID, возвращаем 400_BAD_REQUEST."""
     from rest_framework.exceptions import ValidationError
     from uuid import UUID
     try:
         UUID(pk)
     except ValueError:
         raise ValidationError(f'Значение {pk} не является верным UUID-ом.')
+
+
+def get_instance_or_404(model: Type[ModelType],
+                        pk: str) -> ModelType:
+    """
+    Если в базе существует объект модели {model} с заданным {pk},
+    возвращаем его, иначе возвращаем 404_NOT_FOUND.
+    Если {pk} не является UUID, возвращаем 400_BAD_REQUEST.
+    """
+    from django.shortcuts import get_object_or_404
+    validate_uuid(pk)
     instance = get_object_or_404(model, id=pk)
     return instance
 
@@ -1,12 +1,86 @@
-from rest_framework.pagination import PageNumberPagination
+from hashlib import md5
+
+from django.core.cache import cache
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 from rest_framework.response import Response
 
 
+class KeysetPagination(CursorPagination):
+    """
+    Курсорная пагинация для больших таблиц.
+
+    Следующая страница выбирается условием по полю сортировки, а не
+    OFFSET, поэтому время ответа не зависит от того, насколько глубоко
+    листает пользователь. Сортировка берётся из кверисета, либо из
+    Meta.ordering модели, так что работает и для таблиц кликхауса.
+    Общее количество по-умолчанию не считается. По запросу (count=true)
+    отдаётся закешированным на count_cache_timeout секунд.
+    """
+
+    page_size_query_param = 'limit'
+    max_page_size = 1000
+    count_query_param = 'count'
+    count_cache_timeout = 60
+
+    def get_ordering(self, request, queryset, view):
+        # курсор строится только по названиям полей, сортировку
+        # выражениями (F('field').desc()) пропускаем
+        for ordering in (queryset.query.order_by,
+                         queryset.model._meta.ordering):
+            fields = tuple(
+                field for field in ordering if isinstance(field, str)
+            )
+            if fields:
+                return fields
+        return ('-created',)
+
+    def get_count(self, queryset) -> int:
+        query_hash = md5(str(queryset.query).encode()).hexdigest()
+        return cache.get_or_set(
+            f'pagination_count_{queryset.db}_{query_hash}',
+            queryset.count,
+            self.count_cache_timeout
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        if request.query_params.get(self.count_query_param) in ('true', '1'):
+            self.count = self.get_count(queryset)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data, **kwargs):
+        return Response({
+            'count': self.count,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+            **kwargs,
+        })
+
+
 class PageLimitPagination(PageNumberPagination):
+    """
+    Постраничная пагинация.
+
+    Вьюсеты с keyset_pagination = True дополнительно поддерживают
+    курсорную пагинацию (KeysetPagination): она включается параметром
+    cursor, для первой страницы - пустым (?cursor=).
+    """
 
     page_size_query_param = 'limit'
+    keyset = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if (getattr(view, 'keyset_pagination', False)
+                and KeysetPagination.cursor_query_param
+                in request.query_params):
+            self.keyset = KeysetPagination()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
 
     def get_paginated_response(self, data, **kwargs):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data, **kwargs)
         return Response({
             'count': self.page.paginator.count,
             'next': self.get_next_link(),
@@ -0,0 +1,199 @@
+import hashlib
+import json
+from contextlib import contextmanager
+from datetime import datetime
+from uuid import uuid4
+
+from django.conf import settings
+from redis.exceptions import ResponseError
+
+from api.constants import get_redis_client
+from api.logger import setup_logger
+from ch_statistic.models import (
+    ADStat,
+    MusicStat,
+    VideoStat,
+    ImageStat,
+    TickerStat
+)
+
+stat_logger = setup_logger('statistic', 'logs/statistic.log')
+
+STAT_MODELS = {
+    'ad': ADStat,
+    'music': MusicStat,
+    'video': VideoStat,
+    'image': ImageStat,
+    'ticker': TickerStat
+}
+STAT_FIELDS = ('file', 'played', 'length')
+BUFFER_KEY = 'statistic:{stat_type}'
+FLUSHING_KEY = 'statistic:{stat_type}:flushing'
+FLUSH_TRIGGER_KEY = 'statistic:flush_scheduled'
+# Пока ключ существует, статистика не записывается в кликхаус
+# (см. ch_statistic.conversion)
+FLUSH_PAUSE_KEY = 'statistic:flush_paused'
+# Отметки идущих записей в таблицы статистики, по одной на запись
+WRITING_KEY = 'statistic:writing:{token}'
+# Отметка упавшей записи пропадает сама, должно быть меньше FLUSH_WAIT
+# (см. ch_statistic.conversion)
+WRITING_TIMEOUT = 30
+
+
+def get_stat_fields(stat_type: str) -> tuple[str, ...]:
+    """Поля строки статистики, которые присылает рабочая станция."""
+    if stat_type == 'ad':
+        return STAT_FIELDS + ('ad_block',)
+    return STAT_FIELDS
+
+
+def get_dedup_key(row: dict) -> tuple:
+    """
+    Ключ дедупликации строки статистики.
+
+    Одна станция не может проиграть один файл дважды в одну и ту же
+    секунду, поэтому повторно присланные (или повторно записанные после
+    сбоя) строки совпадают по всем полям.
+    """
+    return tuple(row.get(field) for field in ('client', *STAT_FIELDS,
+                                              'ad_block'))
+
+
+def get_row_id(row: dict) -> int:
+    """
+    Идентификатор строки статистики по ключу дедупликации.
+
+    Обычно айди генерирует бэкенд при вставке, но тогда повторно
+    записанная пачка отличается от первой и кликхаус её не отбросит.
+    """
+    key = json.dumps(get_dedup_key(row)).encode()
+    digest = hashlib.blake2b(key, digest_size=8).digest()
+    # положительный Int64
+    return int.from_bytes(digest, 'big') >> 1
+
+
+@contextmanager
+def writing_statistic():
+    """
+    Отметка записи в таблицы статистики на время блока.
+
+    Отметка ставится до проверки паузы, а конвертация ставит паузу
+    и ждёт, пока отметок не останется. Поэтому запись, которая паузы
+    не заметила, конвертация всегда дождётся.
+    Внутри блока - False, если запись приостановлена и писать нельзя.
+    """
+    redis = get_redis_client()
+    key = WRITING_KEY.format(token=uuid4().hex)
+    redis.set(key, 1, ex=WRITING_TIMEOUT)
+    try:
+        yield not redis.exists(FLUSH_PAUSE_KEY)
+    finally:
+        redis.delete(key)
+
+
+def push_statistic(stat_type: str, nomenclature_id: str,
+                   stat_list: list[dict]) -> int:
+    """
+    Добавление статистики станции в буфер редиса.
+
+    1. Отбрасываем неизвестные типы и строки без обязательных полей,
+        чтобы одна битая строка не блокировала запись всего буфера.
+    2. Добавляем строки в список своего типа одной командой.
+    3. Если буфер дорос до STATISTIC_FLUSH_SIZE, запускаем запись
+        не дожидаясь расписания (не чаще раза за интервал).
+
+    Возвращает количество принятых строк.
+    """
+    from ch_statistic.tasks import flush_statistic
+
+    # 1
+    if stat_type not in STAT_MODELS:
+        stat_logger.warning(f'Неизвестный тип статистики: {stat_type}')
+        return 0
+    rows = []
+    created = datetime.now().isoformat()
+    for stat_element in stat_list:
+        try:
+            row = {field: stat_element[field]
+                   for field in get_stat_fields(stat_type)}
+        except (KeyError, TypeError):
+            stat_logger.warning(
+                f'Битая строка статистики {stat_type} от '
+                f'{nomenclature_id}: {stat_element}'
+            )
+            continue
+        row['client'] = str(nomenclature_id)
+        row['created'] = created
+        rows.append(json.dumps(row))
+    if not rows:
+        return 0
+    # 2
+    redis = get_redis_client()
+    buffer_size = redis.rpush(BUFFER_KEY.format(stat_type=stat_type), *rows)
+    # 3
+    if buffer_size >= settings.STATISTIC_FLUSH_SIZE and redis.set(
+        FLUSH_TRIGGER_KEY, 1, nx=True,
+        ex=settings.STATISTIC_FLUSH_INTERVAL
+    ):
+        flush_statistic.delay()
+    return len(rows)
+
+
+def flush_buffer(stat_type: str) -> int:
+    """
+    Запись буфера статистики одного типа в кликхаус.
+
+    Семантика at-least-once:
+    1. Переименовываем буфер, новые строки копятся уже в новый список.
+        Если с прошлого раза остался не записанный буфер - пишем его.
+    2. Читаем буфер с начала пачками по STATISTIC_FLUSH_SIZE строк,
+        чтобы не поднимать в память весь буфер (после простоя кликхауса
+        он может быть сколь угодно большим). Дубликаты внутри пачки
+        убираем по ключу дедупликации.
+    3. Записываем пачку и только после этого убираем её из буфера.
+        При сбое между записью и удалением эта же пачка запишется
+        повторно. Айди и время приёма строк хранятся в буфере, поэтому
+        повторная пачка даёт тот же блок, и кликхаус отбрасывает его
+        целиком вместе со вставками в срезы (см. миграцию 0004).
+
+    Пока запись приостановлена, строки просто копятся в буфере. Пауза
+    проверяется перед каждой пачкой, поэтому долгая запись после
+    простоя останавливается на границе пачки, остаток ждёт снятия паузы.
+
+    Возвращает количество записанных строк.
+    """
+    model = STAT_MODELS[stat_type]
+    buffer_key = BUFFER_KEY.format(stat_type=stat_type)
+    flushing_key = FLUSHING_KEY.format(stat_type=stat_type)
+    chunk_size = settings.STATISTIC_FLUSH_SIZE
+    redis = get_redis_client()
+    if redis.exists(FLUSH_PAUSE_KEY):
+        return 0
+    # 1
+    if not redis.exists(flushing_key):
+        try:
+            redis.rename(buffer_key, flushing_key)
+        except ResponseError:
+            # буфер пуст
+            return 0
+    count = 0
+    while True:
+        with writing_statistic() as allowed:
+            if not allowed:
+                break
+            # 2
+            raw_rows = redis.lrange(flushing_key, 0, chunk_size - 1)
+            if not raw_rows:
+                break
+            rows = {}
+            for raw_row in raw_rows:
+                row = json.loads(raw_row)
+                rows[get_dedup_key(row)] = row
+            # 3
+            model.objects.bulk_create([
+                model(id=get_row_id(row), **row) for row in rows.values()
+            ])
+            # пустой после обрезки список редис удаляет сам
+            redis.ltrim(flushing_key, len(raw_rows), -1)
+            count += len(rows)
+    return count
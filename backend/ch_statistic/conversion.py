@@ -0,0 +1,247 @@
+import time
+from typing import NamedTuple
+
+from django.conf import settings
+from django.db import connections
+
+from api.constants import get_redis_client
+from ch_statistic.buffer import (
+    FLUSH_PAUSE_KEY,
+    STAT_MODELS,
+    WRITING_KEY,
+    stat_logger
+)
+from ch_statistic.rollups import create_views, drop_views
+
+# Поля, которые в старых таблицах хранились строками
+UUID_FIELDS = ('client', 'file')
+# Сколько последних вставленных блоков кликхаус помнит для дедупликации
+DEDUPLICATION_WINDOW = 1000
+# Сколько ждать завершения уже начатой записи статистики, в секундах
+FLUSH_WAIT = 60
+# На случай аварийного завершения конвертации пауза снимается сама
+PAUSE_TIMEOUT = 60 * 60
+
+
+class StatTable(NamedTuple):
+    """
+    Таблица статистики в том виде, к которому её надо привести.
+
+    create_sql - DDL с {table} вместо имени таблицы, sorting_key - ключ
+    сортировки так, как его показывает system.tables.
+    """
+
+    name: str
+    create_sql: str
+    sorting_key: str
+
+
+def get_create_table_sql(model) -> str:
+    """DDL таблицы статистики по текущему описанию модели."""
+    connection = connections['clickhouse']
+    with connection.schema_editor(collect_sql=True, atomic=False) as editor:
+        editor.create_model(model)
+        source = editor.quote_name(model._meta.db_table)
+        create_sql = next(
+            sql for sql in editor.collected_sql
+            if sql.lstrip().upper().startswith('CREATE TABLE')
+        )
+    return (
+        create_sql.rstrip(';').replace(source, '{table}')
+        + f' SETTINGS non_replicated_deduplication_window = '
+          f'{DEDUPLICATION_WINDOW}'
+    )
+
+
+def get_model_tables() -> dict[str, StatTable]:
+    """Таблицы статистики по текущему описанию моделей."""
+    return {
+        stat_type: StatTable(
+            model._meta.db_table,
+            get_create_table_sql(model),
+            ', '.join(model._meta.engine.order_by)
+        )
+        for stat_type, model in STAT_MODELS.items()
+    }
+
+
+def is_converted(cursor, table: StatTable) -> bool:
+    """Таблица уже с нужным ключом сортировки и UUID идентификаторами."""
+    cursor.execute(
+        'SELECT engine, sorting_key FROM system.tables '
+        'WHERE database = currentDatabase() AND name = %(table)s',
+        {'table': table.name}
+    )
+    engine = cursor.fetchone()
+    cursor.execute(
+        'SELECT type FROM system.columns '
+        'WHERE database = currentDatabase() AND table = %(table)s '
+        'AND name IN %(fields)s',
+        {'table': table.name, 'fields': UUID_FIELDS}
+    )
+    column_types = {row[0] for row in cursor.fetchall()}
+    return (
+        engine is not None
+        and engine == ('ReplacingMergeTree', table.sorting_key)
+        and column_types == {'UUID'}
+    )
+
+
+def check_ids(cursor, table: str) -> None:
+    """
+    Проверка, что все идентификаторы таблицы приводятся к UUID.
+
+    Битый идентификатор нельзя ни сохранить, ни заменить нулевым
+    (статистика молча потеряет станцию или файл), поэтому конвертация
+    останавливается до каких-либо изменений.
+    """
+    invalid = ' OR '.join(
+        f'isNull(toUUIDOrNull(toString({column})))' for column in UUID_FIELDS
+    )
+    cursor.execute(f'SELECT count() FROM {table} WHERE {invalid}')
+    count = cursor.fetchone()[0]
+    if count:
+        raise ValueError(
+            f'В таблице {table} {count} строк с идентификаторами, которые '
+            f'не приводятся к UUID. Исправьте или удалите их и повторите '
+            f'конвертацию.'
+        )
+
+
+def convert_table(cursor, stat_type: str, table: StatTable) -> bool:
+    """
+    Перенос таблицы статистики на новый движок.
+
+    Запись в таблицу на это время должна быть остановлена
+    (см. convert_stat_tables), тогда набор строк не меняется и срезы,
+    уже посчитанные по ним, остаются верными без пересчёта.
+    1. Проверяем идентификаторы.
+    2. Создаём рядом новую таблицу и копируем в неё все строки.
+        Представлений срезов на ней нет, копия в срезах не считается.
+    3. Снимаем представления срезов со старой таблицы.
+    4. Атомарно меняем таблицы местами, чтение не прерывается.
+    5. Вешаем представления срезов на новую таблицу.
+    6. Удаляем старую таблицу.
+
+    Возвращает False, если таблица уже сконвертирована.
+    """
+    if is_converted(cursor, table):
+        return False
+    new_table = f'{table.name}_converted'
+    # 1
+    check_ids(cursor, table.name)
+    # 2
+    cursor.execute(f'DROP TABLE IF EXISTS {new_table}')
+    cursor.execute(table.create_sql.format(table=new_table))
+    cursor.execute(
+        'SELECT name FROM system.columns '
+        'WHERE database = currentDatabase() AND table = %(table)s '
+        'ORDER BY position',
+        {'table': new_table}
+    )
+    columns = [row[0] for row in cursor.fetchall()]
+    select_columns = ', '.join(
+        f'toUUID(toString({column})) AS {column}'
+        if column in UUID_FIELDS else column
+        for column in columns
+    )
+    cursor.execute(
+        f'INSERT INTO {new_table} ({", ".join(columns)}) '
+        f'SELECT {select_columns} FROM {table.name}'
+    )
+    # 3
+    drop_views(cursor, table.name)
+    # 4
+    cursor.execute(f'EXCHANGE TABLES {table.name} AND {new_table}')
+    # 5
+    create_views(cursor, stat_type, table.name)
+    # 6
+    cursor.execute(f'DROP TABLE {new_table}')
+    return True
+
+
+def has_rows(cursor, tables: dict[str, StatTable]) -> bool:
+    for table in tables.values():
+        cursor.execute(f'SELECT count() FROM {table.name}')
+        if cursor.fetchone()[0]:
+            return True
+    return False
+
+
+def has_running_inserts(cursor, tables: dict[str, StatTable]) -> bool:
+    """Идут ли сейчас вставки в таблицы статистики."""
+    cursor.execute(
+        "SELECT count() FROM system.processes "
+        "WHERE query ILIKE 'INSERT INTO%%' "
+        "AND multiSearchAny(query, %(tables)s)",
+        {'tables': [table.name for table in tables.values()]}
+    )
+    return bool(cursor.fetchone()[0])
+
+
+def pause_ingestion(cursor, tables: dict[str, StatTable]) -> None:
+    """
+    Приостановка записи статистики в кликхаус.
+
+    Станции продолжают присылать статистику: через буфер она копится
+    в редисе, без буфера задачи create_statistic откладываются.
+    Дожидаемся записи, которая уже началась (см. writing_statistic).
+    Если она не закончилась за FLUSH_WAIT, снимаем паузу и отменяем
+    конвертацию: строки, вставленные между копированием и подменой
+    таблицы, потерялись бы.
+    """
+    redis = get_redis_client()
+    redis.set(FLUSH_PAUSE_KEY, 1, ex=PAUSE_TIMEOUT)
+    deadline = time.monotonic() + FLUSH_WAIT
+    while (
+        next(redis.scan_iter(WRITING_KEY.format(token='*')), None)
+        or has_running_inserts(cursor, tables)
+    ):
+        if time.monotonic() >= deadline:
+            resume_ingestion()
+            raise RuntimeError(
+                f'Запись статистики не завершилась за {FLUSH_WAIT} секунд, '
+                f'конвертация отменена. Повторите её позже.'
+            )
+        time.sleep(1)
+
+
+def resume_ingestion() -> None:
+    get_redis_client().delete(FLUSH_PAUSE_KEY)
+
+
+def convert_stat_tables(cursor, tables: dict[str, StatTable]) -> list[str]:
+    """
+    Конвертация таблиц статистики {tables}.
+
+    На время конвертации запись статистики приостанавливается, для этого
+    нужен редис. Без редиса конвертировать можно только пустые таблицы
+    (новая установка), иначе строки, пришедшие во время переключения,
+    потерялись бы или посчитались в срезах дважды.
+
+    Возвращает имена сконвертированных таблиц.
+    """
+    pending = {
+        stat_type: table for stat_type, table in tables.items()
+        if not is_converted(cursor, table)
+    }
+    if not pending:
+        return []
+    pause = bool(settings.REDIS_URL)
+    if not pause and has_rows(cursor, pending):
+        raise RuntimeError(
+            'Для конвертации таблиц статистики с данными нужен редис '
+            '(REDIS_URL), чтобы приостановить запись статистики.'
+        )
+    converted = []
+    if pause:
+        pause_ingestion(cursor, pending)
+    try:
+        for stat_type, table in pending.items():
+            if convert_table(cursor, stat_type, table):
+                stat_logger.info(f'Таблица {table.name} сконвертирована')
+                converted.append(table.name)
+    finally:
+        if pause:
+            resume_ingestion()
+    return converted
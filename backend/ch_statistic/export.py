@@ -0,0 +1,108 @@
+from datetime import date, timedelta as td
+from typing import Iterator
+
+from api.constants import get_clickhouse_client
+from ch_statistic.buffer import STAT_MODELS, stat_logger
+
+# формат запроса: (формат кликхауса, content-type, расширение файла)
+EXPORT_FORMATS = {
+    'csv': ('CSVWithNames', 'text/csv', 'csv'),
+    'parquet': ('Parquet', 'application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('ArrowStream', 'application/vnd.apache.arrow.stream',
+              'arrow'),
+}
+# Размер куска ответа кликхауса, который отдаём клиенту, в байтах
+EXPORT_CHUNK_SIZE = 1024 * 1024
+# Последняя строка CSV, если выгрузка оборвалась после начала ответа.
+# Parquet и Arrow без завершающего блока не читаются и так
+EXPORT_ERROR_TRAILER = b'\n#EXPORT_ERROR: export is incomplete\n'
+EXPORT_COLUMNS = (
+    'client',
+    'file',
+    'played',
+    'length',
+)
+# Рекламный блок хранится секундами от начала суток,
+# в выгрузку отдаём его так же, как в API: ЧЧ:ММ:СС
+AD_BLOCK_COLUMN = (
+    "formatDateTime(toDateTime(ad_block, 'UTC'), '%%T') AS ad_block"
+)
+
+
+def get_export_sql(stat_type: str, client_id=None, file_id=None) -> str:
+    """Запрос выгрузки статистики {stat_type} с фильтрами."""
+    columns = list(EXPORT_COLUMNS)
+    if stat_type == 'ad':
+        columns.append(AD_BLOCK_COLUMN)
+    filters = ['played >= %(date_from)s', 'played < %(date_to)s']
+    if client_id:
+        filters.append('client = %(client)s')
+    if file_id:
+        filters.append('file = %(file)s')
+    return (
+        f'SELECT {", ".join(columns)} '
+        f'FROM {STAT_MODELS[stat_type]._meta.db_table} FINAL '
+        f'WHERE {" AND ".join(filters)} '
+        f'ORDER BY client, played'
+    )
+
+
+class ExportError(Exception):
+    """Кликхаус не смог начать выгрузку."""
+
+
+def stream_statistic(stat_type: str, export_format: str, date_from: date,
+                     date_to: date, client_id=None,
+                     file_id=None) -> Iterator[bytes]:
+    """
+    Выгрузка статистики в одном из форматов кликхауса.
+
+    Ответ кликхауса по HTTP отдаётся клиенту кусками как есть, строки
+    в питоне не разбираются. Даты включительные.
+    1. Кликхаус держит у себя первый кусок ответа, поэтому ошибка
+        в его пределах приходит статусом HTTP, а не посреди тела.
+    2. Первый кусок читаем до того, как отдать ответ: если запрос
+        упал сразу, поднимаем ExportError и клиент получает ошибку,
+        а не 200 с пустым файлом.
+    3. Если выгрузка оборвалась позже, статус 200 уже отправлен,
+        поэтому дописываем в CSV строку-маркер ошибки.
+    Соединение с кликхаусом освобождается и при обрыве клиента.
+    """
+    # 1
+    try:
+        response = get_clickhouse_client().raw_query(
+            get_export_sql(stat_type, client_id, file_id),
+            parameters={
+                'date_from': date_from,
+                'date_to': date_to + td(days=1),
+                'client': str(client_id),
+                'file': str(file_id),
+            },
+            settings={'buffer_size': EXPORT_CHUNK_SIZE},
+            fmt=EXPORT_FORMATS[export_format][0],
+            stream=True
+        )
+    except Exception as error:
+        raise ExportError(str(error)) from error
+    # 2
+    chunks = response.stream(EXPORT_CHUNK_SIZE)
+    try:
+        first_chunk = next(chunks, b'')
+    except Exception as error:
+        response.release_conn()
+        raise ExportError(str(error)) from error
+    return _stream_chunks(response, first_chunk, chunks, export_format)
+
+
+def _stream_chunks(response, first_chunk: bytes, chunks: Iterator[bytes],
+                   export_format: str) -> Iterator[bytes]:
+    try:
+        yield first_chunk
+        yield from chunks
+    except Exception as error:
+        # 3
+        stat_logger.error(f'Выгрузка статистики оборвалась: {error}')
+        if export_format == 'csv':
+            yield EXPORT_ERROR_TRAILER
+    finally:
+        response.release_conn()
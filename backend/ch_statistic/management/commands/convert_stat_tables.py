@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from ch_statistic.conversion import convert_stat_tables, get_model_tables
+
+
+class Command(BaseCommand):
+    help = (
+        'Перенос таблиц статистики на движок из описания моделей '
+        '(партиции, ключ сортировки, UUID идентификаторы) без остановки '
+        'чтения. Запись статистики на это время приостанавливается. '
+        'Уже сконвертированные таблицы пропускаются.'
+    )
+
+    def handle(self, *args, **options):
+        with connections['clickhouse'].cursor() as cursor:
+            converted = convert_stat_tables(cursor, get_model_tables())
+        if converted:
+            self.stdout.write(self.style.SUCCESS(
+                f'Сконвертированы таблицы: {", ".join(converted)}'
+            ))
+        else:
+            self.stdout.write('Все таблицы уже сконвертированы')
@@ -0,0 +1,123 @@
+# Generated by Django 5.0.3 on 2026-10-18 11:40
+
+from django.db import migrations
+
+# DDL зафиксирован на момент миграции и не зависит от ch_statistic.rollups
+STAT_TABLES = {
+    'ad': 'ad_stat',
+    'music': 'music_stat',
+    'video': 'video_stat',
+    'image': 'image_stat',
+    'ticker': 'ticker_stat',
+}
+CREATE_ROLLUP_TABLES_SQL = (
+    """
+    CREATE TABLE IF NOT EXISTS stat_client_hourly (
+        stat_type LowCardinality(String),
+        client String,
+        file String,
+        hour DateTime,
+        plays UInt64,
+        duration UInt64
+    )
+    ENGINE = SummingMergeTree((plays, duration))
+    PARTITION BY toYYYYMM(hour)
+    ORDER BY (client, stat_type, hour, file)
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS stat_file_daily (
+        stat_type LowCardinality(String),
+        file String,
+        client String,
+        day Date,
+        plays UInt64,
+        duration UInt64
+    )
+    ENGINE = SummingMergeTree((plays, duration))
+    PARTITION BY toYYYYMM(day)
+    ORDER BY (file, stat_type, day, client)
+    """,
+)
+ROLLUP_SELECTS = {
+    'stat_client_hourly': """
+        SELECT '{stat_type}' AS stat_type,
+               toString(client) AS client, toString(file) AS file,
+               toStartOfHour(played) AS hour,
+               count() AS plays, sum(length) AS duration
+        FROM {source}
+        {where}
+        GROUP BY client, file, hour
+    """,
+    'stat_file_daily': """
+        SELECT '{stat_type}' AS stat_type,
+               toString(file) AS file, toString(client) AS client,
+               toDate(played) AS day,
+               count() AS plays, sum(length) AS duration
+        FROM {source}
+        {where}
+        GROUP BY file, client, day
+    """,
+}
+
+
+def create_rollups(apps, schema_editor):
+    """
+    1. Создаём таблицы срезов.
+    2. Для каждой таблицы статистики создаём представления, с этого
+        момента новые вставки считаются ими.
+    3. Досчитываем уже имеющиеся строки до границы. Граница - самая
+        поздняя запись таблицы после создания представлений: created
+        выставляет приложение, поэтому и сравнивать его надо с временем
+        приложения, а не с now() кликхауса.
+    """
+    with schema_editor.connection.cursor() as cursor:
+        # 1
+        for create_sql in CREATE_ROLLUP_TABLES_SQL:
+            cursor.execute(create_sql)
+        for stat_type, source in STAT_TABLES.items():
+            # 2
+            for rollup, select_sql in ROLLUP_SELECTS.items():
+                cursor.execute(
+                    f'CREATE MATERIALIZED VIEW IF NOT EXISTS '
+                    f'{source}_{rollup}_mv TO {rollup} AS '
+                    + select_sql.format(stat_type=stat_type, source=source,
+                                        where='')
+                )
+            # 3
+            cursor.execute(f'SELECT count(), max(created) FROM {source}')
+            count, border = cursor.fetchone()
+            if not count:
+                continue
+            for rollup, select_sql in ROLLUP_SELECTS.items():
+                cursor.execute(
+                    f'INSERT INTO {rollup} ' + select_sql.format(
+                        stat_type=stat_type,
+                        source=source,
+                        where='WHERE created <= %(border)s'
+                    ),
+                    {'border': border}
+                )
+
+
+def drop_rollups(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        for source in STAT_TABLES.values():
+            for rollup in ROLLUP_SELECTS:
+                cursor.execute(f'DROP VIEW IF EXISTS {source}_{rollup}_mv')
+        for rollup in ROLLUP_SELECTS:
+            cursor.execute(f'DROP TABLE IF EXISTS {rollup}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ch_statistic', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            create_rollups,
+            drop_rollups,
+            hints={'clickhouse': True}
+        ),
+    ]
@@ -0,0 +1,301 @@
+# Generated by Django 5.0.3 on 2026-10-18 13:05
+
+import time
+
+import clickhouse_backend.models
+from django.db import migrations
+
+# DDL и шаги конвертации зафиксированы на момент миграции и не зависят
+# ни от описания моделей, ни от ch_statistic.conversion
+CREATE_TABLE_SQL = """
+    CREATE TABLE {{table}} (
+        id Int64,
+        created DateTime64(6),
+        played DateTime64(6),
+        file UUID,
+        client UUID,
+        length UInt16,{extra_columns}
+        INDEX {index} (file) TYPE bloom_filter(0.01) GRANULARITY 1
+    )
+    ENGINE = ReplacingMergeTree
+    PARTITION BY toYYYYMM(played)
+    ORDER BY ({sorting_key})
+"""
+# Рекламный блок входит в ключ сортировки: без него выходы одного ролика
+# в разных блоках схлопываются в одну строку
+STAT_TABLES = {
+    'ad': ('ad_stat', 'adstat', '\n        ad_block UInt32,',
+           'client, played, file, ad_block'),
+    'music': ('music_stat', 'musicstat', '', 'client, played, file'),
+    'video': ('video_stat', 'videostat', '', 'client, played, file'),
+    'image': ('image_stat', 'imagestat', '', 'client, played, file'),
+    'ticker': ('ticker_stat', 'tickerstat', '', 'client, played, file'),
+}
+UUID_FIELDS = ('client', 'file')
+ROLLUP_SELECTS = {
+    'stat_client_hourly': """
+        SELECT '{stat_type}' AS stat_type,
+               toString(client) AS client, toString(file) AS file,
+               toStartOfHour(played) AS hour,
+               count() AS plays, sum(length) AS duration
+        FROM {source}
+        GROUP BY client, file, hour
+    """,
+    'stat_file_daily': """
+        SELECT '{stat_type}' AS stat_type,
+               toString(file) AS file, toString(client) AS client,
+               toDate(played) AS day,
+               count() AS plays, sum(length) AS duration
+        FROM {source}
+        GROUP BY file, client, day
+    """,
+}
+# Пауза записи статистики и отметки идущих записей в редисе
+FLUSH_PAUSE_KEY = 'statistic:flush_paused'
+WRITING_KEYS = 'statistic:writing:*'
+FLUSH_WAIT = 60
+PAUSE_TIMEOUT = 60 * 60
+
+
+def is_converted(cursor, table: str, sorting_key: str) -> bool:
+    cursor.execute(
+        'SELECT engine, sorting_key FROM system.tables '
+        'WHERE database = currentDatabase() AND name = %(table)s',
+        {'table': table}
+    )
+    engine = cursor.fetchone()
+    cursor.execute(
+        'SELECT type FROM system.columns '
+        'WHERE database = currentDatabase() AND table = %(table)s '
+        'AND name IN %(fields)s',
+        {'table': table, 'fields': UUID_FIELDS}
+    )
+    column_types = {row[0] for row in cursor.fetchall()}
+    return (
+        engine == ('ReplacingMergeTree', sorting_key)
+        and column_types == {'UUID'}
+    )
+
+
+def convert_table(cursor, stat_type: str, table: str, create_sql: str):
+    """
+    1. Проверяем, что все идентификаторы приводятся к UUID.
+    2. Создаём рядом новую таблицу и копируем в неё все строки.
+    3. Снимаем представления срезов со старой таблицы.
+    4. Атомарно меняем таблицы местами.
+    5. Вешаем представления срезов на новую таблицу.
+    6. Удаляем старую таблицу.
+    """
+    new_table = f'{table}_converted'
+    # 1
+    invalid = ' OR '.join(
+        f'isNull(toUUIDOrNull(toString({column})))' for column in UUID_FIELDS
+    )
+    cursor.execute(f'SELECT count() FROM {table} WHERE {invalid}')
+    count = cursor.fetchone()[0]
+    if count:
+        raise ValueError(
+            f'В таблице {table} {count} строк с идентификаторами, которые '
+            f'не приводятся к UUID. Исправьте или удалите их и повторите '
+            f'миграцию.'
+        )
+    # 2
+    cursor.execute(f'DROP TABLE IF EXISTS {new_table}')
+    cursor.execute(create_sql.format(table=new_table))
+    cursor.execute(
+        'SELECT name FROM system.columns '
+        'WHERE database = currentDatabase() AND table = %(table)s '
+        'ORDER BY position',
+        {'table': new_table}
+    )
+    columns = [row[0] for row in cursor.fetchall()]
+    select_columns = ', '.join(
+        f'toUUID(toString({column})) AS {column}'
+        if column in UUID_FIELDS else column
+        for column in columns
+    )
+    cursor.execute(
+        f'INSERT INTO {new_table} ({", ".join(columns)}) '
+        f'SELECT {select_columns} FROM {table}'
+    )
+    # 3
+    for rollup in ROLLUP_SELECTS:
+        cursor.execute(f'DROP VIEW IF EXISTS {table}_{rollup}_mv')
+    # 4
+    cursor.execute(f'EXCHANGE TABLES {table} AND {new_table}')
+    # 5
+    for rollup, select_sql in ROLLUP_SELECTS.items():
+        cursor.execute(
+            f'CREATE MATERIALIZED VIEW IF NOT EXISTS {table}_{rollup}_mv '
+            f'TO {rollup} AS '
+            + select_sql.format(stat_type=stat_type, source=table)
+        )
+    # 6
+    cursor.execute(f'DROP TABLE {new_table}')
+
+
+def has_writes(cursor, redis, tables) -> bool:
+    """Идёт ли запись статистики: отметки в редисе или вставки."""
+    if next(redis.scan_iter(WRITING_KEYS), None):
+        return True
+    cursor.execute(
+        "SELECT count() FROM system.processes "
+        "WHERE query ILIKE 'INSERT INTO%%' "
+        "AND multiSearchAny(query, %(tables)s)",
+        {'tables': list(tables)}
+    )
+    return bool(cursor.fetchone()[0])
+
+
+def convert_stat_tables(apps, schema_editor):
+    """
+    1. Выбираем ещё не сконвертированные таблицы.
+    2. Без редиса запись не приостановить, поэтому конвертируем только
+        пустые таблицы (новая установка).
+    3. Ставим паузу записи и ждём окончания уже начатой записи.
+        Если она не закончилась за FLUSH_WAIT - снимаем паузу и
+        останавливаем миграцию.
+    4. Конвертируем таблицы и в любом случае снимаем паузу.
+    """
+    from django.conf import settings
+    from api.constants import get_redis_client
+
+    with schema_editor.connection.cursor() as cursor:
+        # 1
+        pending = {}
+        for stat_type, (table, model, extra_columns, sorting_key) in (
+            STAT_TABLES.items()
+        ):
+            if not is_converted(cursor, table, sorting_key):
+                pending[table] = (stat_type, CREATE_TABLE_SQL.format(
+                    extra_columns=extra_columns,
+                    index=f'{model}_file_idx',
+                    sorting_key=sorting_key
+                ))
+        if not pending:
+            return
+        # 2
+        if not settings.REDIS_URL:
+            for table in pending:
+                cursor.execute(f'SELECT count() FROM {table}')
+                if cursor.fetchone()[0]:
+                    raise RuntimeError(
+                        'Для конвертации таблиц статистики с данными нужен '
+                        'редис (REDIS_URL), чтобы приостановить запись '
+                        'статистики.'
+                    )
+            for table, (stat_type, create_sql) in pending.items():
+                convert_table(cursor, stat_type, table, create_sql)
+            return
+        # 3
+        redis = get_redis_client()
+        redis.set(FLUSH_PAUSE_KEY, 1, ex=PAUSE_TIMEOUT)
+        try:
+            deadline = time.monotonic() + FLUSH_WAIT
+            while has_writes(cursor, redis, pending):
+                if time.monotonic() >= deadline:
+                    raise RuntimeError(
+                        f'Запись статистики не завершилась за {FLUSH_WAIT} '
+                        f'секунд. Повторите миграцию позже.'
+                    )
+                time.sleep(1)
+            # 4
+            for table, (stat_type, create_sql) in pending.items():
+                convert_table(cursor, stat_type, table, create_sql)
+        finally:
+            redis.delete(FLUSH_PAUSE_KEY)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ch_statistic', '0002_stat_rollups'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(
+                    convert_stat_tables,
+                    migrations.RunPython.noop,
+                    hints={'clickhouse': True}
+                ),
+            ],
+            state_operations=[
+            migrations.AlterModelOptions(
+                name='adstat',
+                options={'ordering': ('-created',), 'verbose_name': 'Статистика рекламы', 'verbose_name_plural': 'Статистика рекламы'},
+            ),
+            migrations.AlterField(
+                model_name='adstat',
+                name='client',
+                field=clickhouse_backend.models.UUIDField(verbose_name='Идентификатор номенклатуры'),
+            ),
+            migrations.AlterField(
+                model_name='adstat',
+                name='file',
+                field=clickhouse_backend.models.UUIDField(verbose_name='Идентификатор файла'),
+            ),
+            migrations.AddIndex(
+                model_name='adstat',
+                index=clickhouse_backend.models.Index(fields=['file'], granularity=1, name='adstat_file_idx', type=clickhouse_backend.models.BloomFilter(0.01)),
+            ),
+            migrations.AlterField(
+                model_name='imagestat',
+                name='client',
+                field=clickhouse_backend.models.UUIDField(verbose_name='Идентификатор номенклатуры'),
+            ),
+            migrations.AlterField(
+                model_name='imagestat',
+                name='file',
+                field=clickhouse_backend.models.UUIDField(verbose_name='Идентификатор файла'),
+            ),
+            migrations.AddIndex(
+                model_name='imagestat',
+                index=clickhouse_backend.models.Index(fields=['file'], granularity=1, name='imagestat_file_idx', type=clickhouse_backend.models.BloomFilter(0.01)),
+            ),
+            migrations.AlterField(
+                model_name='musicstat',
+                name='client',
+                field=clickhouse_backend.models.UUIDField(verbose_name='Идентификатор номенклатуры'),
+            ),
+            migrations.AlterField(
+                model_name='musicstat',
+                name='file',
+                field=clickhouse_backend.models.UUIDField(verbose_name='Идентификатор файла'),
+            ),
+            migrations.AddIndex(
+                model_name='musicstat',
+                index=clickhouse_backend.models.Index(fields=['file'], granularity=1, name='musicstat_file_idx', type=clickhouse_backend.models.BloomFilter(0.01)),
+            ),
+            migrations.AlterField(
+                model_name='tickerstat',
+                name='client',
+                field=clickhouse_backend.models.UUIDField(verbose_name='Идентификатор номенклатуры'),
+            ),
+            migrations.AlterField(
+                model_name='tickerstat',
+                name='file',
+                field=clickhouse_backend.models.UUIDField(verbose_name='Идентификатор файла'),
+            ),
+            migrations.AddIndex(
+                model_name='tickerstat',
+                index=clickhouse_backend.models.Index(fields=['file'], granularity=1, name='tickerstat_file_idx', type=clickhouse_backend.models.BloomFilter(0.01)),
+            ),
+            migrations.AlterField(
+                model_name='videostat',
+                name='client',
+                field=clickhouse_backend.models.UUIDField(verbose_name='Идентификатор номенклатуры'),
+            ),
+            migrations.AlterField(
+                model_name='videostat',
+                name='file',
+                field=clickhouse_backend.models.UUIDField(verbose_name='Идентификатор файла'),
+            ),
+            migrations.AddIndex(
+                model_name='videostat',
+                index=clickhouse_backend.models.Index(fields=['file'], granularity=1, name='videostat_file_idx', type=clickhouse_backend.models.BloomFilter(0.01)),
+            ),
+            ],
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.0.3 on 2026-10-18 19:10
+
+import datetime
+
+import clickhouse_backend.models
+from django.db import migrations
+
+# Сколько последних вставленных блоков кликхаус помнит для дедупликации
+DEDUPLICATION_WINDOW = 1000
+TABLES = (
+    'ad_stat',
+    'music_stat',
+    'video_stat',
+    'image_stat',
+    'ticker_stat',
+    'stat_client_hourly',
+    'stat_file_daily',
+)
+
+
+def set_deduplication_window(window: int):
+    def _set(apps, schema_editor):
+        with schema_editor.connection.cursor() as cursor:
+            for table in TABLES:
+                cursor.execute(
+                    f'ALTER TABLE {table} MODIFY SETTING '
+                    f'non_replicated_deduplication_window = {window}'
+                )
+    return _set
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ch_statistic', '0003_stat_engines'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            set_deduplication_window(DEDUPLICATION_WINDOW),
+            set_deduplication_window(0),
+            hints={'clickhouse': True}
+        ),
+        # created больше не auto_now_add, в самой таблице ничего не меняется
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='adstat',
+                    name='created',
+                    field=clickhouse_backend.models.DateTimeField(default=datetime.datetime.now, verbose_name='Запись создана'),
+                ),
+                migrations.AlterField(
+                    model_name='imagestat',
+                    name='created',
+                    field=clickhouse_backend.models.DateTimeField(default=datetime.datetime.now, verbose_name='Запись создана'),
+                ),
+                migrations.AlterField(
+                    model_name='musicstat',
+                    name='created',
+                    field=clickhouse_backend.models.DateTimeField(default=datetime.datetime.now, verbose_name='Запись создана'),
+                ),
+                migrations.AlterField(
+                    model_name='tickerstat',
+                    name='created',
+                    field=clickhouse_backend.models.DateTimeField(default=datetime.datetime.now, verbose_name='Запись создана'),
+                ),
+                migrations.AlterField(
+                    model_name='videostat',
+                    name='created',
+                    field=clickhouse_backend.models.DateTimeField(default=datetime.datetime.now, verbose_name='Запись создана'),
+                ),
+            ],
+        ),
+    ]
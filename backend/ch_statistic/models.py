@@ -1,22 +1,25 @@
+from datetime import datetime
+
 from clickhouse_backend import models
 
 
 class Stat(models.ClickhouseModel):
     """Базовая статистика."""
 
+    # время приёма строки сервером. Не auto_now_add: строки из буфера
+    # приходят со своим временем, чтобы повторная запись пачки давала
+    # тот же блок (см. ch_statistic.buffer.flush_buffer)
     created = models.DateTimeField(
-        auto_now_add=True,
+        default=datetime.now,
         verbose_name='Запись создана'
     )
     played = models.DateTimeField(
         verbose_name='Когда было проиграно'
     )
-    file = models.StringField(
-        max_length=36,
+    file = models.UUIDField(
         verbose_name='Идентификатор файла'
     )
-    client = models.StringField(
-        max_length=36,
+    client = models.UUIDField(
         verbose_name='Идентификатор номенклатуры'
     )
     length = models.UInt16Field(
@@ -26,9 +29,25 @@ class Stat(models.ClickhouseModel):
     class Meta:
         abstract = True
         ordering = ('-created',)
+        # Запросы к статистике всегда идут по станции и периоду, поэтому
+        # сортируем по ним, а месячные партиции позволяют отсекать
+        # лишние месяцы и удалять старую статистику целыми партициями.
+        # Повторно записанные строки схлопываются по ключу сортировки
+        engine = models.ReplacingMergeTree(
+            order_by=('client', 'played', 'file'),
+            partition_by=models.toYYYYMM('played'),
+        )
+        indexes = [
+            models.Index(
+                fields=['file'],
+                name='%(class)s_file_idx',
+                type=models.BloomFilter(0.01),
+                granularity=1
+            ),
+        ]
 
     def __str__(self):
-        return self.file
+        return str(self.file)
 
 
 class ADStat(Stat):
@@ -36,8 +55,14 @@ class ADStat(Stat):
 
     ad_block = models.UInt32Field(verbose_name='Рекламный блок')
 
-    class Meta:
+    class Meta(Stat.Meta):
         db_table = 'ad_stat'
+        # Рекламный блок входит в ключ дедупликации буфера, иначе
+        # выходы одного ролика в разных блоках схлопнутся в один
+        engine = models.ReplacingMergeTree(
+            order_by=('client', 'played', 'file', 'ad_block'),
+            partition_by=models.toYYYYMM('played'),
+        )
         verbose_name = 'Статистика рекламы'
         verbose_name_plural = 'Статистика рекламы'
 
@@ -45,7 +70,7 @@ class ADStat(Stat):
 class MusicStat(Stat):
     """Статистика музыки."""
 
-    class Meta:
+    class Meta(Stat.Meta):
         db_table = 'music_stat'
         ordering = ['-played']
         verbose_name = 'Статистика музыки'
@@ -55,7 +80,7 @@ class MusicStat(Stat):
 class ImageStat(Stat):
     """Статистика фоновых картинок."""
 
-    class Meta:
+    class Meta(Stat.Meta):
         db_table = 'image_stat'
         ordering = ['-played']
         verbose_name = 'Статистика изображений'
@@ -65,7 +90,7 @@ class ImageStat(Stat):
 class VideoStat(Stat):
     """Статистика фоновых видео."""
 
-    class Meta:
+    class Meta(Stat.Meta):
         db_table = 'video_stat'
         ordering = ['-played']
         verbose_name = 'Статистика видео'
@@ -75,7 +100,7 @@ class VideoStat(Stat):
 class TickerStat(Stat):
     """Статистика бегущей строки."""
 
-    class Meta:
+    class Meta(Stat.Meta):
         db_table = 'ticker_stat'
         ordering = ['-played']
         verbose_name = 'Статистика бегущей строки'
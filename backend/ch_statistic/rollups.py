@@ -0,0 +1,124 @@
+from datetime import date, timedelta as td
+
+from django.db import connections
+
+CLIENT_ROLLUP_TABLE = 'stat_client_hourly'
+FILE_ROLLUP_TABLE = 'stat_file_daily'
+
+# Предагрегированные срезы статистики (создаются миграцией 0002).
+# SummingMergeTree при слиянии кусков складывает plays и duration у строк
+# с одинаковым ключом сортировки, поэтому при чтении всё равно нужен
+# sum() + GROUP BY. Повторные вставки одного и того же блока в таблицы
+# статистики не попадают в срезы (см. миграцию 0004).
+ROLLUP_SELECTS = {
+    CLIENT_ROLLUP_TABLE: """
+        SELECT '{stat_type}' AS stat_type,
+               toString(client) AS client, toString(file) AS file,
+               toStartOfHour(played) AS hour,
+               count() AS plays, sum(length) AS duration
+        FROM {source}
+        {where}
+        GROUP BY client, file, hour
+    """,
+    FILE_ROLLUP_TABLE: """
+        SELECT '{stat_type}' AS stat_type,
+               toString(file) AS file, toString(client) AS client,
+               toDate(played) AS day,
+               count() AS plays, sum(length) AS duration
+        FROM {source}
+        {where}
+        GROUP BY file, client, day
+    """,
+}
+SUMMARY_PERIODS = {
+    'hour': 'hour',
+    'day': 'toDate(hour)',
+    'month': 'toStartOfMonth(hour)',
+}
+
+
+def get_view_name(source: str, rollup: str) -> str:
+    return f'{source}_{rollup}_mv'
+
+
+def create_views(cursor, stat_type: str, source: str) -> None:
+    """
+    Создание представлений, которые дописывают в срезы каждую новую
+    вставку в таблицу статистики {source}.
+    """
+    for rollup, select_sql in ROLLUP_SELECTS.items():
+        cursor.execute(
+            f'CREATE MATERIALIZED VIEW IF NOT EXISTS '
+            f'{get_view_name(source, rollup)} TO {rollup} AS '
+            + select_sql.format(stat_type=stat_type, source=source, where='')
+        )
+
+
+def drop_views(cursor, source: str) -> None:
+    """Удаление представлений таблицы статистики {source}."""
+    for rollup in ROLLUP_SELECTS:
+        cursor.execute(
+            f'DROP VIEW IF EXISTS {get_view_name(source, rollup)}'
+        )
+
+
+def _fetch_summary(sql: str, params: dict) -> list[dict]:
+    with connections['clickhouse'].cursor() as cursor:
+        cursor.execute(sql, params)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def get_client_summary(client_id: str, date_from: date, date_to: date,
+                       period: str = 'day',
+                       stat_type: str | None = None) -> list[dict]:
+    """
+    Сводка проигрываний на станции по файлам за период.
+
+    Даты включительные, {period} - шаг группировки: hour, day или month.
+    """
+    type_filter = 'AND stat_type = %(stat_type)s' if stat_type else ''
+    sql = f"""
+        SELECT {SUMMARY_PERIODS[period]} AS period, stat_type, file,
+               sum(plays) AS plays, sum(duration) AS duration
+        FROM {CLIENT_ROLLUP_TABLE}
+        WHERE client = %(client)s
+          AND hour >= %(date_from)s AND hour < %(date_to)s
+          {type_filter}
+        GROUP BY period, stat_type, file
+        ORDER BY period, stat_type, file
+    """
+    return _fetch_summary(sql, {
+        'client': str(client_id),
+        'date_from': date_from,
+        'date_to': date_to + td(days=1),
+        'stat_type': stat_type,
+    })
+
+
+def get_file_summary(file_id: str, date_from: date, date_to: date,
+                     period: str = 'day',
+                     stat_type: str | None = None) -> list[dict]:
+    """
+    Сводка проигрываний файла по станциям за период.
+
+    Даты включительные, {period} - шаг группировки: day или month.
+    """
+    type_filter = 'AND stat_type = %(stat_type)s' if stat_type else ''
+    day_period = 'day' if period == 'day' else 'toStartOfMonth(day)'
+    sql = f"""
+        SELECT {day_period} AS period, stat_type, client,
+               sum(plays) AS plays, sum(duration) AS duration
+        FROM {FILE_ROLLUP_TABLE}
+        WHERE file = %(file)s
+          AND day >= %(date_from)s AND day <= %(date_to)s
+          {type_filter}
+        GROUP BY period, stat_type, client
+        ORDER BY period, stat_type, client
+    """
+    return _fetch_summary(sql, {
+        'file': str(file_id),
+        'date_from': date_from,
+        'date_to': date_to,
+        'stat_type': stat_type,
+    })
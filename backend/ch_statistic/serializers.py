@@ -1,5 +1,6 @@
-from datetime import datetime as dt, timedelta as td
+from datetime import datetime as dt
 
+from django.db.models import QuerySet
 from rest_framework import serializers
 
 from ch_statistic.models import (
@@ -11,11 +12,64 @@ from ch_statistic.models import (
 )
 
 
+def format_played(played: dt) -> str:
+    return f'{played:%Y-%m-%d %H:%M:%S}'
+
+
+def format_ad_block(ad_block: int) -> str:
+    """Рекламный блок хранится секундами от начала суток, отдаём ЧЧ:ММ:СС."""
+    minutes, seconds = divmod(ad_block, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f'{hours:02}:{minutes:02}:{seconds:02}'
+
+
+FIELD_FORMATTERS = {
+    'played': format_played,
+    'ad_block': format_ad_block,
+    'file': str,
+    'client': str,
+}
+
+
+def format_rows(fields: tuple[str, ...], rows) -> list[dict]:
+    """Строки статистики (кортежи значений {fields}) в формате ответа."""
+    formatters = [FIELD_FORMATTERS.get(field) for field in fields]
+    return [
+        {
+            field: value if formatter is None else formatter(value)
+            for field, formatter, value in zip(fields, formatters, row)
+        }
+        for row in rows
+    ]
+
+
+class StatisticListSerializer(serializers.ListSerializer):
+    """
+    Сериализация списков статистики.
+
+    Строк статистики бывает очень много, поэтому поля DRF на каждую строку
+    не вызываются: из кверисета забираем только нужные колонки кортежами
+    (values_list), а значения форматируем заранее подобранными функциями.
+    Формат ответа совпадает с сериализацией одного объекта.
+    """
+
+    def to_representation(self, data):
+        fields = self.child.get_output_fields()
+        if isinstance(data, QuerySet):
+            rows = data.values_list(*fields)
+        else:
+            # страница пагинации - уже загруженные объекты
+            rows = ([getattr(obj, field) for field in fields] for obj in data)
+        return format_rows(fields, rows)
+
+
 class StatisticSerializer(serializers.Serializer):
     """Базовый класс сериализации статистики."""
 
     played = serializers.DateTimeField()
     length = serializers.IntegerField()
+    # поля, которые не нужно отдавать в ответе
+    hidden_fields = ()
 
     class Meta:
         fields = (
@@ -26,10 +80,19 @@ class StatisticSerializer(serializers.Serializer):
         )
         abstract = True
 
+    @classmethod
+    def get_output_fields(cls) -> tuple[str, ...]:
+        return tuple(
+            field for field in cls.Meta.fields + ('played',)
+            if field not in cls.hidden_fields
+        )
+
     def to_representation(self, value):
-        representation = super().to_representation(value)
-        representation['played'] = f'{value.played:%Y-%m-%d %H:%M:%S}'
-        return representation
+        fields = self.get_output_fields()
+        return format_rows(
+            fields,
+            [[getattr(value, field) for field in fields]]
+        )[0]
 
 
 class BaseNomenclatureSerializer(StatisticSerializer):
@@ -61,9 +124,12 @@ class NomenclatureAdStatSerializer(
     """Сериализация статистики рекламы из номенклатуры."""
 
     ad_block = serializers.IntegerField()
+    # отдаётся за конкретный день, время проигрывания не нужно
+    hidden_fields = ('played',)
 
     class Meta:
         model = ADStat
+        list_serializer_class = StatisticListSerializer
         fields = BaseNomenclatureSerializer.Meta.fields + ('ad_block',)
         read_only_fields = (
                 BaseNomenclatureSerializer.Meta.
@@ -71,15 +137,6 @@ class NomenclatureAdStatSerializer(
                 ('ad_block',)
         )
 
-    def to_representation(self, value):
-        representation = super().to_representation(value)
-        representation.pop('played')
-        ad_block = f'{td(seconds=value.ad_block)}'
-        representation['ad_block'] = (
-            f'{dt.strptime(ad_block, "%H:%M:%S").time()}'
-        )
-        return representation
-
 
 class NomenclatureMusicStatSerializer(
     BaseNomenclatureSerializer,
@@ -89,6 +146,7 @@ class NomenclatureMusicStatSerializer(
 
     class Meta:
         model = MusicStat
+        list_serializer_class = StatisticListSerializer
         fields = BaseNomenclatureSerializer.Meta.fields
         read_only_fields = BaseNomenclatureSerializer.Meta.read_only_fields
 
@@ -101,6 +159,7 @@ class NomenclatureVideoStatSerializer(
 
     class Meta:
         model = VideoStat
+        list_serializer_class = StatisticListSerializer
         fields = BaseNomenclatureSerializer.Meta.fields
         read_only_fields = BaseNomenclatureSerializer.Meta.read_only_fields
 
@@ -113,6 +172,7 @@ class NomenclatureTickerStatSerializer(
 
     class Meta:
         model = TickerStat
+        list_serializer_class = StatisticListSerializer
         fields = BaseNomenclatureSerializer.Meta.fields
         read_only_fields = BaseNomenclatureSerializer.Meta.read_only_fields
 
@@ -125,6 +185,7 @@ class NomenclatureImageStatSerializer(
 
     class Meta:
         model = ImageStat
+        list_serializer_class = StatisticListSerializer
         fields = BaseNomenclatureSerializer.Meta.fields
         read_only_fields = BaseNomenclatureSerializer.Meta.read_only_fields
 
@@ -139,6 +200,7 @@ class FileAdStatSerializer(
 
     class Meta:
         model = ADStat
+        list_serializer_class = StatisticListSerializer
         fields = BaseFileSerializer.Meta.fields + ('ad_block',)
         read_only_fields = (
                 BaseFileSerializer.Meta.
@@ -146,14 +208,6 @@ class FileAdStatSerializer(
                 ('ad_block',)
         )
 
-    def to_representation(self, value):
-        representation = super().to_representation(value)
-        ad_block = f'{td(seconds=value.ad_block)}'
-        representation['ad_block'] = (
-            f'{dt.strptime(ad_block, "%H:%M:%S").time()}'
-        )
-        return representation
-
 
 class FileMusicStatSerializer(
     BaseFileSerializer,
@@ -163,6 +217,7 @@ class FileMusicStatSerializer(
 
     class Meta:
         model = MusicStat
+        list_serializer_class = StatisticListSerializer
         fields = BaseFileSerializer.Meta.fields
         read_only_fields = BaseFileSerializer.Meta.read_only_fields
 
@@ -175,6 +230,7 @@ class FileVideoStatSerializer(
 
     class Meta:
         model = VideoStat
+        list_serializer_class = StatisticListSerializer
         fields = BaseFileSerializer.Meta.fields
         read_only_fields = BaseFileSerializer.Meta.read_only_fields
 
@@ -187,6 +243,7 @@ class FileTickerStatSerializer(
 
     class Meta:
         model = TickerStat
+        list_serializer_class = StatisticListSerializer
         fields = BaseFileSerializer.Meta.fields
         read_only_fields = BaseFileSerializer.Meta.read_only_fields
 
@@ -199,5 +256,55 @@ class FileImageStatSerializer(
 
     class Meta:
         model = ImageStat
+        list_serializer_class = StatisticListSerializer
         fields = BaseFileSerializer.Meta.fields
         read_only_fields = BaseFileSerializer.Meta.read_only_fields
+
+
+class StatisticSummaryQuerySerializer(serializers.Serializer):
+    """Параметры запроса сводной статистики."""
+
+    date_from = serializers.DateField()
+    date_to = serializers.DateField()
+    period = serializers.ChoiceField(
+        choices=('hour', 'day', 'month'),
+        default='day'
+    )
+    type = serializers.ChoiceField(
+        choices=('ad', 'music', 'video', 'image', 'ticker'),
+        required=False
+    )
+
+    def validate(self, data):
+        if data['date_from'] > data['date_to']:
+            raise serializers.ValidationError(
+                'Дата начала не может быть позже даты окончания.'
+            )
+        return data
+
+
+class StatisticExportQuerySerializer(serializers.Serializer):
+    """Параметры выгрузки статистики."""
+
+    type = serializers.ChoiceField(
+        choices=('ad', 'music', 'video', 'image', 'ticker')
+    )
+    export_format = serializers.ChoiceField(
+        choices=('csv', 'parquet', 'arrow'),
+        default='csv'
+    )
+    date_from = serializers.DateField()
+    date_to = serializers.DateField()
+    client = serializers.UUIDField(required=False)
+    file = serializers.UUIDField(required=False)
+
+    def validate(self, data):
+        if data['date_from'] > data['date_to']:
+            raise serializers.ValidationError(
+                'Дата начала не может быть позже даты окончания.'
+            )
+        if 'client' not in data and 'file' not in data:
+            raise serializers.ValidationError(
+                'Необходимо указать номенклатуру или файл.'
+            )
+        return data
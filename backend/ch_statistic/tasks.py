@@ -1,5 +1,8 @@
 from celery import shared_task
+from celery_singleton import Singleton
+from django.conf import settings
 
+from ch_statistic.buffer import STAT_MODELS, flush_buffer, writing_statistic
 from ch_statistic.models import (
     ADStat,
     MusicStat,
@@ -9,9 +12,18 @@ from ch_statistic.models import (
 )
 
 
-@shared_task
-def create_statistic(stat_type, nomenclature_id, stat_list):
-    """Внесение статистики в базу."""
+# Через сколько секунд повторить запись, приостановленную конвертацией
+PAUSED_RETRY_DELAY = 60
+
+
+@shared_task(bind=True, max_retries=None)
+def create_statistic(self, stat_type, nomenclature_id, stat_list):
+    """
+    Внесение статистики в базу.
+
+    Пока таблицы статистики конвертируются (ch_statistic.conversion),
+    запись откладывается.
+    """
     stat_objects = []
     match stat_type:
         case 'ad':
@@ -44,8 +56,28 @@ def create_statistic(stat_type, nomenclature_id, stat_list):
                     played=stat_element['played'],
                     length=stat_element['length']
                 )]
-        model.objects.bulk_create(stat_objects)
+        if settings.REDIS_URL:
+            with writing_statistic() as allowed:
+                if not allowed:
+                    raise self.retry(countdown=PAUSED_RETRY_DELAY)
+                model.objects.bulk_create(stat_objects)
+        else:
+            model.objects.bulk_create(stat_objects)
         return (
             f'Добавлено {len(stat_objects)} '
             f'записей статистики {stat_type}.'
         )
+
+
+@shared_task(base=Singleton)
+def flush_statistic():
+    """
+    Запись накопленной в редисе статистики в кликхаус.
+
+    Запускается по расписанию раз в STATISTIC_FLUSH_INTERVAL секунд,
+    либо раньше, если буфер дорос до STATISTIC_FLUSH_SIZE строк.
+    """
+    count = 0
+    for stat_type in STAT_MODELS:
+        count += flush_buffer(stat_type)
+    return f'Добавлено {count} записей статистики.'
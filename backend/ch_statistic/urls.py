@@ -0,0 +1,16 @@
+from django.urls import include, path
+from rest_framework.routers import SimpleRouter
+
+from ch_statistic.views import StatisticViewSet
+
+router = SimpleRouter()
+
+router.register(
+    'statistic',
+    StatisticViewSet,
+    basename='statistic'
+)
+
+urlpatterns = [
+    path('', include(router.urls))
+]
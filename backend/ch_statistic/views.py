@@ -0,0 +1,52 @@
+from http import HTTPStatus
+
+from django.http import StreamingHttpResponse
+from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from ch_statistic.export import EXPORT_FORMATS, ExportError, stream_statistic
+from ch_statistic.serializers import StatisticExportQuerySerializer
+from users.permissions import SuperuserDStaffCUAuthRetrieve
+
+
+class StatisticViewSet(viewsets.ViewSet):
+    """Работа со статистикой напрямую из кликхауса."""
+
+    permission_classes = [SuperuserDStaffCUAuthRetrieve]
+
+    @action(detail=False, methods=['GET'], url_path='export')
+    def export(self, request):
+        """
+        Потоковая выгрузка статистики для отчётов рекламодателям.
+
+        Параметры: type (тип статистики), export_format (csv, parquet,
+        arrow), date_from, date_to (включительно), client и/или file.
+        Ответ кликхауса отдаётся клиенту по мере получения. Если
+        выгрузка CSV оборвалась на середине, последняя строка файла -
+        маркер #EXPORT_ERROR.
+        """
+        query = StatisticExportQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        data = query.validated_data
+        _, content_type, extension = EXPORT_FORMATS[data['export_format']]
+        try:
+            chunks = stream_statistic(
+                data['type'],
+                data['export_format'],
+                data['date_from'],
+                data['date_to'],
+                client_id=data.get('client'),
+                file_id=data.get('file')
+            )
+        except ExportError:
+            return Response(
+                {'detail': 'Не удалось выгрузить статистику.'},
+                status=HTTPStatus.BAD_GATEWAY
+            )
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        response['Content-Disposition'] = (
+            f'attachment; filename="{data["type"]}_stat_'
+            f'{data["date_from"]}_{data["date_to"]}.{extension}"'
+        )
+        return response
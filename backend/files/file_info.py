@@ -4,68 +4,29 @@ import subprocess
 import tempfile
 from datetime import timedelta as td
 
+FILE_INFO_CHUNK_SIZE = 1024 * 1024
+
 
 class GetFileInfo:
     """Получение параметров файла."""
 
     @staticmethod
-    def get_md5(file) -> str:
-        """
-        Вычисление md5 хэша.
-
-        1. Ставим курсор в начале файла
-        2. Проходим по файлу отрезками в 8Кб, пока он не закончится
-        3. Возвращаем хеш по всему содержимому файла
-        """
-        hash_md5 = hashlib.md5()
-        file.seek(0)
-        while chunk := file.read(8192):
-            hash_md5.update(chunk)
-        file.seek(0)
-        return hash_md5.hexdigest()
-
-    @staticmethod
-    def get_sha256(file) -> str:
+    def probe_length(path: str) -> str | None:
         """
-        Вычисление sha256 хэша.
+        Продолжительность файла по пути на диске или ссылке {path}.
 
-        1. Ставим курсор в начале файла
-        2. Проходим по файлу отрезками в 8Кб, пока он не закончится
-        3. Возвращаем хеш по всему содержимому файла
-        """
-        hash_sha256 = hashlib.sha256()
-        file.seek(0)
-        while chunk := file.read(8192):
-            hash_sha256.update(chunk)
-        file.seek(0)
-        return hash_sha256.hexdigest()
-
-    @staticmethod
-    def get_length(file) -> str | None:
-        """
-        Вычисление продолжительности файла с помощью ffmpeg.
-
-        1. Из полученных данных создаётся временный файл
-        2. Временный файл проходит команду для вычисления продолжительности
-        3. Результат записывается, временный файл удаляется
-        4. Результат округляется до целых секунд
-        5. При нулевой продолжительности (например у картинок)
+        1. Результат mediainfo округляется до целых секунд
+        2. При нулевой продолжительности (например у картинок)
             возникает ValueError, возвращается None
         """
-        with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-            for chunk in file.chunks():
-                temp_file.write(chunk)
-            temp_file_path = temp_file.name
-
         command = ['mediainfo',
                    '--Inform=General;%Duration%',
-                   temp_file_path]
+                   path]
         result = subprocess.run(
             command,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE
         )
-        os.remove(temp_file_path)
         try:
             microseconds = int(result.stdout.decode().strip())
             duration = td(seconds=round(microseconds/1000))
@@ -74,15 +35,87 @@ class GetFileInfo:
             return None
 
     @staticmethod
-    def get_file_size(file) -> int:
+    def get_local_path(file) -> str | None:
+        """Путь к содержимому файла на диске, если оно уже там лежит."""
+        if hasattr(file, 'temporary_file_path'):
+            return file.temporary_file_path()
+        name = getattr(getattr(file, 'file', None), 'name', None)
+        if isinstance(name, str) and os.path.isabs(name) and \
+                os.path.isfile(name):
+            return name
+        return None
+
+    @staticmethod
+    def hash_chunks(chunks, sink=None) -> dict:
         """
-        Вычисление размера файла.
+        Хеши и размер по отрезкам файла.
+
+        Каждый отрезок сразу идёт в md5, sha256 и в размер,
+        а если передан {sink} - ещё и в него.
+        """
+        hash_md5 = hashlib.md5()
+        hash_sha256 = hashlib.sha256()
+        size = 0
+        for chunk in chunks:
+            hash_md5.update(chunk)
+            hash_sha256.update(chunk)
+            size += len(chunk)
+            if sink is not None:
+                sink.write(chunk)
+        return {
+            'md5hash': hash_md5.hexdigest(),
+            'sha256hash': hash_sha256.hexdigest(),
+            'size': size,
+        }
 
-        1. Ставим курсор в конец файла
-        2. Записываем количество байт, которое прошли
-        3. Возвращаем курсор в начало файла
+    @staticmethod
+    def get_info(file, probe: bool = True) -> dict:
         """
-        file.seek(0, os.SEEK_END)
-        size = file.tell()
-        file.seek(0, os.SEEK_SET)
-        return size
+        Хеши, размер и продолжительность файла за один проход.
+
+        1. Читаем файл один раз отрезками по 1Мб (см. hash_chunks).
+        2. Продолжительность нужна только для медиа ({probe}). Если файл
+            уже лежит на диске (например, загрузка больше
+            FILE_UPLOAD_MAX_MEMORY_SIZE), mediainfo читает его оттуда.
+            Иначе те же отрезки по пути пишутся во временный файл.
+        3. Возвращаем курсор в начало файла.
+        """
+        path = GetFileInfo.get_local_path(file) if probe else None
+        temp_file = None
+        if probe and path is None:
+            temp_file = tempfile.NamedTemporaryFile(delete=False)
+            path = temp_file.name
+        try:
+            # 1
+            file.seek(0)
+            file_info = GetFileInfo.hash_chunks(
+                iter(lambda: file.read(FILE_INFO_CHUNK_SIZE), b''),
+                sink=temp_file
+            )
+            if temp_file is not None:
+                temp_file.close()
+            # 2
+            file_info['length'] = (
+                GetFileInfo.probe_length(path) if probe else None
+            )
+        finally:
+            if temp_file is not None:
+                temp_file.close()
+                os.remove(path)
+        # 3
+        file.seek(0)
+        return file_info
+
+    @staticmethod
+    def get_stream_info(chunks, probe_url: str | None = None) -> dict:
+        """
+        Хеши, размер и продолжительность файла, который уже лежит в облаке.
+
+        Файл читается потоком {chunks} и нигде не сохраняется целиком.
+        mediainfo сам читает нужные ему части файла по ссылке {probe_url}.
+        """
+        file_info = GetFileInfo.hash_chunks(chunks)
+        file_info['length'] = (
+            GetFileInfo.probe_length(probe_url) if probe_url else None
+        )
+        return file_info
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.3 on 2026-10-18 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('files', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='status',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Ожидает обработки'), (1, 'Готов'), (2, 'Ошибка обработки')], default=1, verbose_name='Статус обработки'),
+        ),
+        migrations.AddField(
+            model_name='file',
+            name='processing_error',
+            field=models.CharField(blank=True, max_length=255, null=True, verbose_name='Ошибка обработки'),
+        ),
+        migrations.AlterField(
+            model_name='file',
+            name='hash',
+            field=models.CharField(editable=False, max_length=288, null=True, unique=True),
+        ),
+    ]
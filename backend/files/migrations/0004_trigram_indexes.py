@@ -0,0 +1,24 @@
+# Generated by Django 5.0.3 on 2026-10-18 15:20
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('files', '0003_file_status'),
+        ('nomenclatures', '0004_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='file',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('name'), name='gin_trgm_ops'), name='file_name_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='playlist',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('name'), name='gin_trgm_ops'), name='playlist_name_trgm_idx'),
+        ),
+    ]
@@ -1,9 +1,11 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models.functions import Upper
 from django_minio_backend import MinioBackend
 from rest_framework.exceptions import ValidationError
 
 from api import APIBaseObjectModel
-from api.constants import get_minio_client
+from api.constants import get_minio_client, get_presigned_url
 from files.file_info import GetFileInfo
 
 TYPES = {
@@ -13,6 +15,13 @@ TYPES = {
     3: 'ticker',
     4: 'ad'
 }
+# У этих типов нет продолжительности, mediainfo для них не запускаем
+NO_LENGTH_TYPES = ('image', 'ticker')
+FILE_STATUSES = {
+    0: 'Ожидает обработки',
+    1: 'Готов',
+    2: 'Ошибка обработки'
+}
 
 
 class Tag(models.Model):
@@ -59,7 +68,8 @@ class File(APIBaseObjectModel):
     hash = models.CharField(
         editable=False,
         max_length=288,
-        unique=True
+        unique=True,
+        null=True
     )
     length = models.TimeField(
         editable=False,
@@ -82,12 +92,30 @@ class File(APIBaseObjectModel):
         verbose_name='Тэги',
         blank=True
     )
+    status = models.PositiveSmallIntegerField(
+        choices=FILE_STATUSES,
+        verbose_name='Статус обработки',
+        default=1
+    )
+    processing_error = models.CharField(
+        max_length=255,
+        verbose_name='Ошибка обработки',
+        blank=True,
+        null=True
+    )
 
     class Meta:
         db_table = 'file'
         ordering = ('-created',)
         verbose_name = 'Файл'
         verbose_name_plural = 'Файлы'
+        indexes = [
+            # для фильтров name (icontains)
+            GinIndex(
+                OpClass(Upper('name'), name='gin_trgm_ops'),
+                name='file_name_trgm_idx'
+            )
+        ]
         # добавляем это после фикса в джанге
         # https://github.com/django/django/pull/17723
         # constraints = [
@@ -105,20 +133,24 @@ class File(APIBaseObjectModel):
         #     )
         # ]
 
-    def save(self, *args, **kwargs):
+    def save(self, *args, file_info: dict | None = None, **kwargs):
         """
         Сборка информации о файле при его прогрузке на сервер.
 
         Имя берётся непосредственно с файла.
-        Хэш суммы, размер и продолжительность вычисляются в отдельной функции.
+        Хэш суммы, размер и продолжительность вычисляются за один проход
+        по файлу в отдельной функции.
+        Если файл уже загружен в облако напрямую, информация о нём
+        посчитана заранее и передаётся в {file_info}.
+        Файлы, ожидающие обработки (status=0), только сохраняются,
+        информацию о них считает целери (см. files.tasks).
         Суммированный хэш получается сложением md5 и sha256 хешей.
         """
         from api.constants import get_list_of_file_types
         types = get_list_of_file_types()
         file_type = TYPES[self.type]
         allowed_types: set = types[file_type]
-        file = self.source.file
-        self.name = file.name.split('/')[-1]
+        self.name = self.source.name.split('/')[-1]
         extension = self.name.split('.')[-1]
         if extension not in allowed_types:
             self.delete()
@@ -127,11 +159,17 @@ class File(APIBaseObjectModel):
                 f'Для типа {file_type} допустимы следующие форматы:'
                 f'{allowed_types}'
             )
-        self.md5hash = GetFileInfo.get_md5(file)
-        self.sha256hash = GetFileInfo.get_sha256(file)
-        self.hash = f'{self.md5hash}{self.sha256hash}'
-        self.length = GetFileInfo.get_length(file)
-        self.size = GetFileInfo.get_file_size(file)
+        if file_info is None and self.status != 0:
+            file_info = GetFileInfo.get_info(
+                self.source.file,
+                probe=file_type not in NO_LENGTH_TYPES
+            )
+        if file_info is not None:
+            self.md5hash = file_info['md5hash']
+            self.sha256hash = file_info['sha256hash']
+            self.hash = f'{self.md5hash}{self.sha256hash}'
+            self.length = file_info['length']
+            self.size = file_info['size']
         super().save(*args, **kwargs)
 
     def delete(self, *args, **kwargs):
@@ -139,24 +177,18 @@ class File(APIBaseObjectModel):
         from django.conf import settings
 
         minio_client = get_minio_client()
+        # путь объекта берём из source: загруженные по частям файлы
+        # лежат не в {тип}/{имя}, а в {тип}/{загрузка}/{имя}
         minio_client.remove_object(
             settings.MINIO_MEDIA_FILES_BUCKET,
-            f'{TYPES[self.type]}/{self.name}'
+            self.source.name
         )
         super().delete(*args, **kwargs)
 
     @property
     def url(self):
         """Ссылка для скачивания файла."""
-        from datetime import timedelta as td
-        client = get_minio_client(external=True)
-        url = client.get_presigned_url(
-            'GET',
-            'local-media',
-            f'{self.source}',
-            expires=td(hours=2)
-        )
-        return url
+        return get_presigned_url('local-media', f'{self.source}')
 
 
 class Playlist(APIBaseObjectModel):
@@ -178,6 +210,13 @@ class Playlist(APIBaseObjectModel):
         ordering = ('-created',)
         verbose_name = 'Плейлист'
         verbose_name_plural = 'Плейлисты'
+        indexes = [
+            # для фильтров name (icontains)
+            GinIndex(
+                OpClass(Upper('name'), name='gin_trgm_ops'),
+                name='playlist_name_trgm_idx'
+            )
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['name'],
@@ -4,7 +4,7 @@ from django.core.files.base import ContentFile
 from rest_framework import serializers
 
 from api.constants import Constants
-from files.models import File, Playlist, Tag, TYPES
+from files.models import File, FILE_STATUSES, Playlist, Tag, TYPES
 
 
 class Base64FileField(serializers.FileField):
@@ -111,6 +111,7 @@ class FileSerializer(serializers.ModelSerializer):
         repr_['owner'] = value.owner.full_name
         repr_['hash'] = value.hash
         repr_['type'] = TYPES[value.type]
+        repr_['status'] = FILE_STATUSES[value.status]
         repr_['created'] = f'{value.created:%Y-%m-%d %H:%M:%S}'
         return repr_
 
@@ -142,9 +143,9 @@ class FileListSerializer(serializers.ModelSerializer):
     def to_representation(self, value):
         repr_ = super().to_representation(value)
         repr_['type'] = TYPES[value.type]
-        repr_['tags'] = [
-            tag.name for tag in value.tags.all()
-        ] if value.tags.exists() else None
+        repr_['status'] = FILE_STATUSES[value.status]
+        # теги предзагружены во вьюсете, лишних запросов здесь нет
+        repr_['tags'] = [tag.name for tag in value.tags.all()] or None
         return repr_
 
 
@@ -175,10 +176,16 @@ class PlaylistSerializer(serializers.ModelSerializer):
         model = Playlist
 
     def validate(self, data):
-        """Проверяем, что все файлы в плейлисте одного типа."""
+        """Проверяем, что все файлы в плейлисте одного типа и готовы."""
         if 'files' in self.initial_data:
             files_ids: list = self.initial_data.get('files')
             files = File.objects.filter(id__in=files_ids)
+            not_ready = [str(file.id) for file in files if file.status != 1]
+            if not_ready:
+                raise serializers.ValidationError(
+                    'Плейлист не должен содержать необработанные файлы: '
+                    f'{not_ready}'
+                )
             playlist_files_types = {TYPES[file.type] for file in files}
             if len(playlist_files_types) > 1:
                 raise serializers.ValidationError(
@@ -190,11 +197,12 @@ class PlaylistSerializer(serializers.ModelSerializer):
     def to_representation(self, value):
         repr_ = super().to_representation(value)
         repr_['owner'] = value.owner.full_name
-        repr_['files_count'] = value.files.count()
+        files = value.files.all()
+        repr_['files_count'] = len(files)
         repr_['files'] = [
             {'id': file.id,
              'name': file.name,
-             'url': file.url} for file in value.files.all()
+             'url': file.url} for file in files
         ]
         repr_['created'] = f'{value.created:%Y-%m-%d %H:%M:%S}'
         return repr_
@@ -215,6 +223,49 @@ class PlaylistListSerializer(serializers.ModelSerializer):
     def to_representation(self, value):
         repr_ = super().to_representation(value)
         repr_['owner'] = value.owner.full_name
-        repr_['files_count'] = value.files.count()
+        repr_['files_count'] = value.files_count
         repr_['created'] = f'{value.created:%Y-%m-%d %H:%M:%S}'
         return repr_
+
+
+class FileUploadStartSerializer(serializers.Serializer):
+    """Параметры загрузки файла напрямую в облако."""
+
+    name = serializers.CharField(max_length=255)
+    type = serializers.ChoiceField(choices=list(TYPES))
+    size = serializers.IntegerField(min_value=1)
+    tags = serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        required=False,
+        default=list
+    )
+
+
+class FileUploadTokenSerializer(serializers.Serializer):
+    """Токен начатой загрузки файла."""
+
+    upload_token = serializers.CharField()
+
+
+class FileCheckSerializer(serializers.Serializer):
+    """
+    Проверка наличия файла до загрузки.
+
+    Принимает hash файла, либо md5 и sha256 по отдельности, и размер.
+    """
+
+    hash = serializers.RegexField(r'^[0-9a-fA-F]{96}$', required=False)
+    md5hash = serializers.RegexField(r'^[0-9a-fA-F]{32}$', required=False)
+    sha256hash = serializers.RegexField(r'^[0-9a-fA-F]{64}$', required=False)
+    size = serializers.IntegerField(min_value=1)
+
+    def validate(self, data):
+        if 'hash' not in data:
+            if 'md5hash' not in data or 'sha256hash' not in data:
+                raise serializers.ValidationError(
+                    'Необходимо указать hash, либо md5hash и sha256hash.'
+                )
+            data['hash'] = f'{data["md5hash"]}{data["sha256hash"]}'
+        # hexdigest отдаёт хеши в нижнем регистре
+        data['hash'] = data['hash'].lower()
+        return data
@@ -0,0 +1,97 @@
+from celery import chain, shared_task
+from django.db import IntegrityError, transaction
+
+from api.logger import setup_logger
+from files.models import File, NO_LENGTH_TYPES, TYPES
+from files.uploads import get_object_info
+
+file_logger = setup_logger('files', 'logs/files.log')
+
+
+def start_file_processing(file_ids) -> None:
+    """
+    Запуск обработки загруженных файлов после коммита транзакции.
+
+    Обработка разбита на этапы (см. compute_file_info
+    и finish_file_processing), каждый файл обрабатывается отдельно.
+    """
+    def _on_commit():
+        for file_id in file_ids:
+            chain(
+                compute_file_info.s(str(file_id)),
+                finish_file_processing.s()
+            ).delay()
+
+    transaction.on_commit(_on_commit)
+
+
+def fail_file_processing(file_id: str, error: str) -> None:
+    """
+    Файл не прошёл обработку.
+
+    Запись о файле остаётся, чтобы статус и причину ошибки можно было
+    узнать через files/<id>/status/. Объект в облаке тоже остаётся:
+    запись без объекта ссылалась бы в пустоту, а так файл можно
+    обработать повторно (files/<id>/process/) или удалить целиком.
+    """
+    File.objects.filter(id=file_id).update(status=2, processing_error=error)
+    file_logger.warning(f'Файл {file_id} не прошёл обработку: {error}')
+
+
+@shared_task
+def compute_file_info(file_id: str) -> dict:
+    """
+    Первый этап: хеши, размер и продолжительность.
+
+    Файл читается потоком из облака.
+    """
+    file = File.objects.get(id=file_id)
+    try:
+        file_info = get_object_info(
+            file.source.name,
+            probe=TYPES[file.type] not in NO_LENGTH_TYPES
+        )
+    except Exception as error:
+        fail_file_processing(file_id, f'Не удалось прочитать файл: {error}')
+        raise
+    file_info['file_id'] = file_id
+    return file_info
+
+
+@shared_task
+def finish_file_processing(file_info: dict) -> int:
+    """
+    Второй этап: проверка дубликатов и готовность файла.
+
+    1. Если файл с таким же хешем уже есть, обработка завершается
+        ошибкой со ссылкой на существующий файл.
+    2. Иначе записываем информацию о файле и помечаем его готовым.
+        Уникальность хеша по-прежнему гарантирует база.
+
+    Возвращает статус файла.
+    """
+    file_id = file_info.pop('file_id')
+    file_hash = f'{file_info["md5hash"]}{file_info["sha256hash"]}'
+    # 1
+    duplicate_id = File.objects.filter(
+        hash=file_hash
+    ).exclude(id=file_id).values_list('id', flat=True).first()
+    if duplicate_id is None:
+        # 2
+        try:
+            with transaction.atomic():
+                File.objects.filter(id=file_id).update(
+                    hash=file_hash,
+                    status=1,
+                    **file_info
+                )
+            return 1
+        except IntegrityError:
+            duplicate_id = File.objects.filter(
+                hash=file_hash
+            ).values_list('id', flat=True).first()
+    fail_file_processing(
+        file_id,
+        f'Файл с таким hash уже существует: {duplicate_id}'
+    )
+    return 2
@@ -0,0 +1,283 @@
+from datetime import timedelta as td
+from functools import wraps
+from math import ceil
+from uuid import uuid4
+
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from minio.datatypes import Part
+from minio.error import S3Error
+from rest_framework.exceptions import (
+    NotFound,
+    PermissionDenied,
+    ValidationError
+)
+
+from api.constants import get_list_of_file_types, get_minio_client
+from files.file_info import FILE_INFO_CHUNK_SIZE, GetFileInfo
+from files.models import File, NO_LENGTH_TYPES, TYPES, Tag
+
+# Минимальный размер части в S3 - 5Мб, максимальное количество частей - 10000
+UPLOAD_PART_SIZE = 64 * 1024 * 1024
+UPLOAD_MAX_PARTS = 10000
+# Сколько живут ссылки на загрузку частей и сама загрузка
+UPLOAD_URL_EXPIRES = td(hours=12)
+UPLOAD_MAX_AGE = td(days=1)
+UPLOAD_TOKEN_SALT = 'files.uploads'
+# Для multipart загрузки в minio нет публичных методов, используются
+# _create_multipart_upload, _list_parts, _complete_multipart_upload
+# и _abort_multipart_upload. Их сигнатуры проверены для minio==7.2.5
+# (req.txt), при обновлении minio их надо проверить заново.
+
+# Ошибки облака, которые означают неверный запрос клиента
+UPLOAD_CLIENT_ERRORS = (
+    'InvalidPart',
+    'InvalidPartOrder',
+    'EntityTooSmall',
+)
+
+
+def map_s3_errors(func):
+    """
+    Ошибки облака из-за повторного или неверного запроса клиента
+    отдаются как 404 и 400, а не как ошибка сервера.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        except S3Error as error:
+            if error.code == 'NoSuchUpload':
+                raise NotFound('Загрузка не найдена, завершена или отменена.')
+            if error.code in UPLOAD_CLIENT_ERRORS:
+                raise ValidationError(
+                    f'Части файла загружены неверно: {error.message}'
+                )
+            raise
+    return wrapper
+
+
+def get_part_size(size: int) -> int:
+    return max(UPLOAD_PART_SIZE, ceil(size / UPLOAD_MAX_PARTS))
+
+
+def get_part_urls(upload: dict, part_numbers) -> list[dict]:
+    """Ссылки для загрузки частей файла клиентом напрямую в облако."""
+    client = get_minio_client(external=True)
+    return [
+        {
+            'part_number': part_number,
+            'url': client.get_presigned_url(
+                'PUT',
+                settings.MINIO_MEDIA_FILES_BUCKET,
+                upload['object_name'],
+                expires=UPLOAD_URL_EXPIRES,
+                extra_query_params={
+                    'uploadId': upload['upload_id'],
+                    'partNumber': str(part_number)
+                }
+            )
+        }
+        for part_number in part_numbers
+    ]
+
+
+def load_upload(token: str, user) -> dict:
+    """Данные загрузки из токена, выданного в start_upload."""
+    try:
+        upload = signing.loads(
+            token,
+            salt=UPLOAD_TOKEN_SALT,
+            max_age=UPLOAD_MAX_AGE
+        )
+    except signing.BadSignature:
+        raise ValidationError('Загрузка не найдена или устарела.')
+    if upload['owner'] != str(user.id):
+        raise PermissionDenied('Загрузка начата другим пользователем.')
+    return upload
+
+
+def list_parts(upload: dict) -> list[Part]:
+    """Уже загруженные в облако части файла."""
+    client = get_minio_client()
+    parts = []
+    marker = None
+    while True:
+        result = client._list_parts(
+            settings.MINIO_MEDIA_FILES_BUCKET,
+            upload['object_name'],
+            upload['upload_id'],
+            part_number_marker=marker
+        )
+        parts += result.parts
+        if not result.is_truncated:
+            return parts
+        marker = str(result.next_part_number_marker)
+
+
+def start_upload(user, name: str, file_type: int, size: int,
+                 tags: list[str]) -> dict:
+    """
+    Начало загрузки файла напрямую в облако.
+
+    1. Проверяем расширение и что файла с таким именем ещё нет.
+    2. Создаём в облаке multipart загрузку. Ключ объекта уникален
+        для каждой загрузки: файл с тем же именем, загруженный
+        параллельно, не перезапишет этот объект и наоборот.
+    3. Данные загрузки подписываем и отдаём клиенту токеном, по нему
+        он получает ссылки на части и завершает загрузку. Хранить
+        незавершённые загрузки на сервере не нужно.
+    """
+    # 1
+    extension = name.split('.')[-1]
+    allowed_types = get_list_of_file_types()[TYPES[file_type]]
+    if '/' in name or extension not in allowed_types:
+        raise ValidationError(
+            'Выбранный тип файла не соответствует его формату.\n'
+            f'Для типа {TYPES[file_type]} допустимы следующие форматы:'
+            f'{allowed_types}'
+        )
+    if File.objects.filter(type=file_type, name=name).exists():
+        raise ValidationError('Файл с таким названием уже существует.')
+    # 2
+    object_name = f'{TYPES[file_type]}/{uuid4().hex}/{name}'
+    upload_id = get_minio_client()._create_multipart_upload(
+        settings.MINIO_MEDIA_FILES_BUCKET,
+        object_name,
+        {}
+    )
+    # 3
+    upload = {
+        'upload_id': upload_id,
+        'object_name': object_name,
+        'type': file_type,
+        'size': size,
+        'tags': tags,
+        'owner': str(user.id),
+    }
+    part_size = get_part_size(size)
+    return {
+        'upload_token': signing.dumps(upload, salt=UPLOAD_TOKEN_SALT),
+        'part_size': part_size,
+        'parts': get_part_urls(upload, range(1, ceil(size / part_size) + 1)),
+    }
+
+
+@map_s3_errors
+def get_missing_parts(upload: dict) -> dict:
+    """
+    Продолжение прерванной загрузки.
+
+    Возвращаем уже загруженные части и свежие ссылки на недостающие.
+    """
+    part_size = get_part_size(upload['size'])
+    uploaded = {part.part_number: part.size for part in list_parts(upload)}
+    missing = [
+        part_number
+        for part_number in range(1, ceil(upload['size'] / part_size) + 1)
+        if part_number not in uploaded
+    ]
+    return {
+        'part_size': part_size,
+        'uploaded': [
+            {'part_number': part_number, 'size': size}
+            for part_number, size in sorted(uploaded.items())
+        ],
+        'parts': get_part_urls(upload, missing),
+    }
+
+
+def get_object_info(object_name: str, probe: bool) -> dict:
+    """
+    Хеши, размер и продолжительность файла, лежащего в облаке.
+
+    Файл читается потоком, память не зависит от размера файла.
+    """
+    client = get_minio_client()
+    bucket = settings.MINIO_MEDIA_FILES_BUCKET
+    response = client.get_object(bucket, object_name)
+    try:
+        return GetFileInfo.get_stream_info(
+            response.stream(FILE_INFO_CHUNK_SIZE),
+            probe_url=client.get_presigned_url(
+                'GET', bucket, object_name, expires=td(hours=1)
+            ) if probe else None
+        )
+    finally:
+        response.close()
+        response.release_conn()
+
+
+@map_s3_errors
+def complete_upload(upload: dict) -> File:
+    """
+    Завершение загрузки.
+
+    1. Собираем объект из загруженных частей.
+    2. Считаем информацию о файле по объекту в облаке.
+    3. Создаём файл с тегами одной транзакцией, проверки модели
+        (расширение, уникальность хеша) работают как и при обычной
+        загрузке. Ошибку дубликата отдаёт IntegrityMiddleware.
+
+    Если на шагах 2-3 что-то упало, собранный объект удаляется из облака
+    (он принадлежит только этой загрузке) и ошибка пробрасывается дальше.
+
+    Повторное завершение или завершение отменённой загрузки отдаёт 404.
+
+    При FILE_PROCESSING_ASYNC шаг 2 не выполняется: файл создаётся
+    в статусе 'Ожидает обработки' и считается в целери.
+    """
+    client = get_minio_client()
+    bucket = settings.MINIO_MEDIA_FILES_BUCKET
+    # 1
+    parts = list_parts(upload)
+    if sum(part.size for part in parts) != upload['size']:
+        raise ValidationError('Загружены не все части файла.')
+    client._complete_multipart_upload(
+        bucket,
+        upload['object_name'],
+        upload['upload_id'],
+        [Part(part.part_number, part.etag) for part in parts]
+    )
+    try:
+        # 2
+        file_info = None
+        if not settings.FILE_PROCESSING_ASYNC:
+            file_info = get_object_info(
+                upload['object_name'],
+                probe=TYPES[upload['type']] not in NO_LENGTH_TYPES
+            )
+        # 3
+        instance = File(
+            owner_id=upload['owner'],
+            type=upload['type'],
+            source=upload['object_name'],
+            status=1 if file_info else 0
+        )
+        with transaction.atomic():
+            instance.save(file_info=file_info)
+            if upload['tags']:
+                instance.tags.set([
+                    Tag.objects.get_or_create(name=tag)[0]
+                    for tag in upload['tags']
+                ])
+    except Exception:
+        # записи о файле нет, собранный объект больше никому не нужен
+        client.remove_object(bucket, upload['object_name'])
+        raise
+    if file_info is None:
+        # обработка импортирует этот модуль
+        from files.tasks import start_file_processing
+        start_file_processing([instance.id])
+    return instance
+
+
+@map_s3_errors
+def abort_upload(upload: dict) -> None:
+    """Отмена загрузки, загруженные части удаляются из облака."""
+    get_minio_client()._abort_multipart_upload(
+        settings.MINIO_MEDIA_FILES_BUCKET,
+        upload['object_name'],
+        upload['upload_id']
+    )
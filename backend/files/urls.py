@@ -5,6 +5,7 @@ from rest_framework.routers import SimpleRouter
 
 from files.views import (
     FileViewSet,
+    FileUploadViewSet,
     PlaylistViewSet,
     TagViewSet, UploadFilesViewSet
 )
@@ -31,6 +32,11 @@ router.register(
     UploadFilesViewSet,
     basename='source'
 )
+router.register(
+    'file_uploads',
+    FileUploadViewSet,
+    basename='file_uploads'
+)
 
 urlpatterns = [
     path('', include(router.urls))
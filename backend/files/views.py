@@ -1,7 +1,8 @@
 import copy
 
+from django.conf import settings
 from django.core.exceptions import ValidationError as DjangoValidationError
-from django.db.models import QuerySet
+from django.db.models import Count, QuerySet
 from django_filters.rest_framework import DjangoFilterBackend
 from http import HTTPStatus
 from itertools import chain
@@ -20,7 +21,9 @@ from ch_statistic.models import (
     VideoStat,
     TickerStat
 )
+from ch_statistic.rollups import get_file_summary
 from ch_statistic.serializers import (
+    StatisticSummaryQuerySerializer,
     FileAdStatSerializer,
     FileMusicStatSerializer,
     FileImageStatSerializer,
@@ -34,9 +37,20 @@ from files.serializers import (
     PlaylistListSerializer,
     FileSerializer,
     FileListSerializer,
+    FileCheckSerializer,
+    FileUploadStartSerializer,
+    FileUploadTokenSerializer,
     TagSerializer, FileSourceSerializer
 )
-from files.models import Playlist, File, Tag, TYPES
+from files.uploads import (
+    abort_upload,
+    complete_upload,
+    get_missing_parts,
+    load_upload,
+    start_upload
+)
+from files.models import Playlist, File, Tag, FILE_STATUSES, TYPES
+from files.tasks import start_file_processing
 from orders.models import AdOrder, BgOrder
 from orders.tasks import update_ad_order_task, update_bg_order_task
 from users.permissions import StaffCUDAuthRetrieve, OwnerAndStaffCRUD
@@ -68,7 +82,9 @@ class TagViewSet(NoUpdateViewSet):
 class FileViewSet(NoUpdateViewSet):
     """Работа с файлами."""
 
-    queryset = File.objects.all().select_related('owner')
+    queryset = File.objects.all().select_related(
+        'owner'
+    ).prefetch_related('tags')
     serializer_class = FileSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_class = FileFilter
@@ -88,8 +104,82 @@ class FileViewSet(NoUpdateViewSet):
 
         return serializer(*args, **kwargs)
 
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        if settings.FILE_PROCESSING_ASYNC:
+            # файл сохранён, но ещё обрабатывается
+            response.status_code = HTTPStatus.ACCEPTED
+        return response
+
     def perform_create(self, serializer):
-        serializer.save(owner=self.request.user)
+        """
+        Сохранение файлов.
+
+        При FILE_PROCESSING_ASYNC файлы сохраняются в статусе
+        'Ожидает обработки' и отправляются на обработку в целери.
+        Статус обработки отдаёт эндпоинт files/<id>/status/.
+        """
+        if not settings.FILE_PROCESSING_ASYNC:
+            serializer.save(owner=self.request.user)
+            return
+        instances = serializer.save(owner=self.request.user, status=0)
+        if not isinstance(instances, list):
+            instances = [instances]
+        start_file_processing([instance.id for instance in instances])
+
+    @action(detail=False, methods=['POST'])
+    def check(self, request):
+        """
+        Проверка, загружен ли уже файл с таким содержимым.
+
+        Клиент считает хеши у себя и узнаёт о дубликате до передачи
+        файла. Поиск идёт по уникальному индексу hash, размер
+        дополнительно защищает от совпадения хешей. Удалённые файлы
+        тоже учитываются, повторно загрузить их всё равно нельзя.
+        """
+        serializer = FileCheckSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        file = File.objects.filter(
+            hash=serializer.validated_data['hash'],
+            size=serializer.validated_data['size']
+        ).values('id', 'name', 'is_active').first()
+        return Response({
+            'exists': file is not None,
+            'id': file and file['id'],
+            'name': file and file['name'],
+            'is_active': file and file['is_active'],
+        }, status=HTTPStatus.OK)
+
+    @action(detail=True, methods=['GET'], url_path='status')
+    def get_status(self, request, pk):
+        """Статус обработки файла."""
+        file = get_instance_or_404(File, pk)
+        return Response({
+            'id': file.id,
+            'status': FILE_STATUSES[file.status],
+            'processing_error': file.processing_error,
+            'hash': file.hash,
+        }, status=HTTPStatus.OK)
+
+    @action(detail=True, methods=['POST'])
+    def process(self, request, pk):
+        """
+        Повторная обработка файла, который её не прошёл.
+
+        Объект файла в облаке после ошибки обработки сохраняется,
+        поэтому загружать файл заново не нужно.
+        """
+        file = get_instance_or_404(File, pk)
+        if file.status != 2:
+            raise ValidationError(
+                'Повторно обработать можно только файл с ошибкой обработки.'
+            )
+        File.objects.filter(id=file.id).update(status=0, processing_error=None)
+        start_file_processing([file.id])
+        return Response({
+            'id': file.id,
+            'status': FILE_STATUSES[0],
+        }, status=HTTPStatus.ACCEPTED)
 
     def perform_destroy(self, instance):
         """
@@ -211,17 +301,47 @@ class FileViewSet(NoUpdateViewSet):
 
         return Response(data, status=HTTPStatus.OK)
 
+    @action(detail=True, methods=['GET'], url_path='stat_summary')
+    def get_stat_summary(self, request, pk):
+        """
+        Сводная статистика файла по станциям за период.
+
+        Читается из предагрегированных срезов, а не из сырых таблиц.
+        Параметры: date_from, date_to (включительно), period (day, month),
+        type (тип статистики, по-умолчанию все).
+        """
+        get_instance_or_404(File, pk)
+        query = StatisticSummaryQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        if query.validated_data['period'] == 'hour':
+            raise ValidationError(
+                'Статистика файла доступна с шагом не меньше дня.'
+            )
+        data = get_file_summary(
+            pk,
+            query.validated_data['date_from'],
+            query.validated_data['date_to'],
+            period=query.validated_data['period'],
+            stat_type=query.validated_data.get('type')
+        )
+        return Response(data, status=HTTPStatus.OK)
+
 
 class PlaylistViewSet(viewsets.ModelViewSet):
     """Работа с плейлистами."""
 
-    queryset = Playlist.objects.all().select_related(
-        'owner'
-    ).prefetch_related('files')
+    queryset = Playlist.objects.all().select_related('owner')
     filter_backends = [DjangoFilterBackend]
     filterset_class = PlaylistFilter
     permission_classes = [StaffCUDAuthRetrieve]
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            # В списке нужны не сами файлы, а только их количество
+            return queryset.annotate(files_count=Count('files', distinct=True))
+        return queryset.prefetch_related('files')
+
     def get_serializer(self, *args, **kwargs):
         if self.action == 'list':
             serializer = PlaylistListSerializer
@@ -404,8 +524,8 @@ class PlaylistViewSet(viewsets.ModelViewSet):
         0. Проверяем формат полученных данных.
         1. Проверяем, что объект запроса существует.
         2. Проверяем, что в запросе нет ранее добавленных в плейлист файлов.
-        3. Проверяем, что тип файлов в запросе соответствует типу файлов
-            в плейлисте.
+        3. Проверяем, что файлы обработаны и их тип соответствует типу
+            файлов в плейлисте.
         4. Если всё ок - добавляем файлы в плейлист, иначе
             выбрасываем исключение.
         5. Проверяем наличие активных заказов с данным плейлистом.
@@ -413,6 +533,15 @@ class PlaylistViewSet(viewsets.ModelViewSet):
             соответствущего типа.
         """
 
+        def _validate_files_ready(files: QuerySet) -> None:
+            """Как и в PlaylistSerializer, необработанные файлы нельзя."""
+            not_ready = [str(file.id) for file in files if file.status != 1]
+            if not_ready:
+                raise ValidationError(
+                    'Плейлист не должен содержать необработанные файлы: '
+                    f'{not_ready}'
+                )
+
         def _validate_no_duplicates(files: set, pls_files: set) -> None:
             """Проверяем, что файлы не будут дублироваться."""
             duplicates = pls_files & files
@@ -459,6 +588,7 @@ class PlaylistViewSet(viewsets.ModelViewSet):
         _validate_no_duplicates(set(new_files), playlist_files)
         # 3
         file_objs = File.objects.filter(id__in=new_files)
+        _validate_files_ready(file_objs)
         playlist_type = TYPES[playlist.files.first().type]
         _validate_file_types(file_objs, playlist_type)
         # 4
@@ -525,3 +655,55 @@ class UploadFilesViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
+
+
+class FileUploadViewSet(viewsets.ViewSet):
+    """
+    Загрузка файлов напрямую в облако по частям.
+
+    0. POST file_uploads/ (name, type, size, tags) - начало загрузки.
+        В ответе токен загрузки, размер части и ссылки на загрузку частей.
+    1. Клиент загружает части PUT запросами по ссылкам. Если загрузка
+        прервалась, POST file_uploads/parts/ (upload_token) вернёт
+        загруженные части и свежие ссылки на недостающие.
+    2. POST file_uploads/complete/ (upload_token) - сборка файла
+        в облаке и создание записи о нём.
+    3. POST file_uploads/abort/ (upload_token) - отмена загрузки.
+
+    Содержимое файла через сервер не проходит.
+    """
+
+    permission_classes = [OwnerAndStaffCRUD]
+
+    def _get_upload(self, request) -> dict:
+        serializer = FileUploadTokenSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return load_upload(
+            serializer.validated_data['upload_token'],
+            request.user
+        )
+
+    def create(self, request):
+        serializer = FileUploadStartSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = start_upload(request.user, **serializer.validated_data)
+        return Response(data, status=HTTPStatus.CREATED)
+
+    @action(detail=False, methods=['POST'])
+    def parts(self, request):
+        data = get_missing_parts(self._get_upload(request))
+        return Response(data, status=HTTPStatus.OK)
+
+    @action(detail=False, methods=['POST'])
+    def complete(self, request):
+        instance = complete_upload(self._get_upload(request))
+        return Response(
+            FileSerializer(instance).data,
+            status=(HTTPStatus.ACCEPTED if instance.status == 0
+                    else HTTPStatus.CREATED)
+        )
+
+    @action(detail=False, methods=['POST'])
+    def abort(self, request):
+        abort_upload(self._get_upload(request))
+        return Response(status=HTTPStatus.NO_CONTENT)
@@ -0,0 +1,65 @@
+import json
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.core.serializers.json import DjangoJSONEncoder
+
+from nomenclatures.models import Nomenclature
+from tasks.delivery import get_group_name, get_pending_tasks
+
+# Слой каналов не настроен (нет REDIS_URL): push-доставки нет,
+# станция должна опрашивать pending_tasks
+NO_CHANNEL_LAYER_CLOSE_CODE = 4503
+
+
+class PendingTasksConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Push-доставка ожидающих репликаций на рабочую станцию.
+
+    Альтернатива опросу pending_tasks: станция держит одно соединение,
+    сразу после подключения и при каждом создании репликации для неё
+    получает актуальный список ожидающих репликаций в том же формате,
+    что и в ответе pending_tasks. Статусы выполнения станция по-прежнему
+    присылает в pending_tasks.
+    Без слоя каналов соединение закрывается с кодом
+    NO_CHANNEL_LAYER_CLOSE_CODE.
+    """
+
+    group_name = None
+
+    async def connect(self):
+        if self.channel_layer is None:
+            # до accept код закрытия до станции не дойдёт (403)
+            await self.accept()
+            await self.close(code=NO_CHANNEL_LAYER_CLOSE_CODE)
+            return
+        client_id = self.scope['url_route']['kwargs']['pk']
+        exists = await database_sync_to_async(
+            Nomenclature.objects.filter(pk=client_id, is_active=True).exists
+        )()
+        if not exists:
+            await self.close()
+            return
+        self.client_id = client_id
+        self.group_name = get_group_name(client_id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        await self.send_pending_tasks()
+
+    async def disconnect(self, code):
+        if self.group_name:
+            await self.channel_layer.group_discard(
+                self.group_name,
+                self.channel_name
+            )
+
+    async def pending_tasks_created(self, event):
+        await self.send_pending_tasks()
+
+    async def send_pending_tasks(self):
+        tasks = await database_sync_to_async(get_pending_tasks)(self.client_id)
+        await self.send_json({'tasks': tasks})
+
+    @classmethod
+    async def encode_json(cls, content):
+        return json.dumps(content, cls=DjangoJSONEncoder)
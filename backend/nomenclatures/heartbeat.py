@@ -0,0 +1,106 @@
+from datetime import datetime as dt
+
+from django.conf import settings
+from redis.exceptions import ResponseError
+
+from api.constants import get_redis_client
+from nomenclatures.models import Nomenclature, NomenclatureAvailability
+
+HEARTBEAT_KEY = 'nomenclatures:heartbeats'
+FLUSHING_KEY = 'nomenclatures:heartbeats:flushing'
+
+
+def save_last_answers(last_answers: dict) -> None:
+    """
+    Запись времени последнего ответа станций.
+
+    Один INSERT ... ON CONFLICT на любое количество станций: новым
+    станциям создаётся запись о доступности, остальным обновляется время.
+    """
+    NomenclatureAvailability.objects.bulk_create(
+        [
+            NomenclatureAvailability(client_id=client_id,
+                                     last_answer_date=answer_time)
+            for client_id, answer_time in last_answers.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['client'],
+        update_fields=['last_answer_date']
+    )
+
+
+def record_heartbeat(client_id) -> None:
+    """
+    Фиксация ответа рабочей станции.
+
+    При включённом HEARTBEAT_WRITE_BEHIND время ответа пишется в хэш
+    редиса (повторные ответы одной станции перезаписывают друг друга),
+    иначе - сразу в базу.
+    """
+    answer_time = dt.now()
+    if settings.HEARTBEAT_WRITE_BEHIND:
+        get_redis_client().hset(
+            HEARTBEAT_KEY,
+            str(client_id),
+            answer_time.isoformat()
+        )
+    else:
+        save_last_answers({client_id: answer_time})
+
+
+def save_flushing(redis) -> int:
+    """
+    Запись переименованного буфера ответов в базу.
+
+    1. Отбрасываем ответы станций, удалённых после ответа: иначе запись
+        упадёт на внешнем ключе, буфер никогда не очистится и все станции
+        будут считаться недоступными. Остальные пишем одним запросом.
+    2. Только после успешной записи удаляем буфер.
+
+    Возвращает количество записанных станций.
+    """
+    heartbeats = redis.hgetall(FLUSHING_KEY)
+    # 1
+    existing = {
+        str(client_id)
+        for client_id in Nomenclature.objects.filter(
+            id__in=list(heartbeats)
+        ).values_list('id', flat=True)
+    } if heartbeats else set()
+    last_answers = {
+        client_id: dt.fromisoformat(answer_time)
+        for client_id, answer_time in heartbeats.items()
+        if client_id in existing
+    }
+    if last_answers:
+        save_last_answers(last_answers)
+    # 2
+    redis.delete(FLUSHING_KEY)
+    return len(last_answers)
+
+
+def flush_heartbeats() -> int:
+    """
+    Перенос накопленных ответов из редиса в базу.
+
+    1. Если с прошлого раза остался не записанный буфер (упала запись
+        в базу), сначала дописываем его: ответы в нём старше текущих.
+    2. Переименовываем текущий буфер, чтобы новые ответы копились уже
+        в новый хэш, и записываем его в том же вызове. Сразу после
+        переноса update_nomenclature_status считает доступность, и
+        живые станции не должны ждать следующего цикла.
+
+    Возвращает количество записанных станций.
+    """
+    redis = get_redis_client()
+    count = 0
+    # 1
+    if redis.exists(FLUSHING_KEY):
+        count += save_flushing(redis)
+    # 2
+    try:
+        redis.rename(HEARTBEAT_KEY, FLUSHING_KEY)
+    except ResponseError:
+        # буфер пуст
+        return count
+    return count + save_flushing(redis)
@@ -0,0 +1,84 @@
+import json
+import re
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+
+from tasks.delivery import get_pending_tasks, parse_wait, wait_for_tasks
+
+PENDING_TASKS_PATH = re.compile(
+    r'^/api/nomenclatures/(?P<pk>[0-9a-fA-F-]+)/pending_tasks/$'
+)
+
+
+class LongPollMiddleware:
+    """
+    Long-poll для pending_tasks поверх обычного ответа джанги.
+
+    Запрос с параметром wait целиком обрабатывает вьюха pending_tasks
+    (статистика, статусы, время ответа, проверка параметров). Если она
+    ответила 200 без репликаций, ответ придерживаем и ждём репликаций
+    в цикле событий, не занимая поток (см. tasks.delivery.wait_for_tasks).
+    Остальные запросы проходят в приложение {app} без изменений.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        match = (
+            PENDING_TASKS_PATH.match(scope['path'])
+            if scope['type'] == 'http' else None
+        )
+        query = parse_qs(scope.get('query_string', b'').decode())
+        if match is None or 'wait' not in query:
+            return await self.app(scope, receive, send)
+        messages = []
+
+        async def _capture(message):
+            messages.append(message)
+
+        await self.app(scope, receive, _capture)
+        tasks = await self.get_waited_tasks(
+            match['pk'], query['wait'][0], messages
+        )
+        await self.send_response(send, messages, tasks)
+
+    @staticmethod
+    async def get_waited_tasks(client_id, wait: str, messages) -> list | None:
+        """
+        Репликации после ожидания, None - ответ вьюхи не меняется.
+
+        Ждём, только если вьюха ответила 200 с пустым списком.
+        """
+        start = messages[0]
+        body = b''.join(
+            message.get('body', b'') for message in messages[1:]
+        )
+        if start['status'] != 200 or json.loads(body)['tasks']:
+            return None
+        try:
+            timeout = parse_wait(wait)
+        except ValidationError:
+            return None
+        if not await wait_for_tasks(client_id, timeout):
+            return None
+        return await database_sync_to_async(get_pending_tasks)(client_id)
+
+    @staticmethod
+    async def send_response(send, messages, tasks: list | None) -> None:
+        if tasks is None:
+            for message in messages:
+                await send(message)
+            return
+        body = JSONRenderer().render({'tasks': tasks})
+        start = messages[0]
+        headers = [
+            (name, value) for name, value in start.get('headers', [])
+            if name.lower() != b'content-length'
+        ]
+        headers.append((b'content-length', str(len(body)).encode()))
+        await send({**start, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.3 on 2026-10-18 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nomenclatures', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='nomenclatureavailability',
+            index=models.Index(fields=['status', 'last_answer_date'], name='availability_status_idx'),
+        ),
+    ]
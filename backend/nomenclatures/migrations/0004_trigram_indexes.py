@@ -0,0 +1,25 @@
+# Generated by Django 5.0.3 on 2026-10-18 15:20
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nomenclatures', '0003_nomenclatureavailability_availability_status_idx'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='nomenclature',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('name'), name='gin_trgm_ops'), name='nomenclature_name_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='statushistory',
+            index=models.Index(fields=['client', '-change_time'], name='status_history_client_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+# До перехода на последовательность артикулы выдавались как max + 1,
+# а сама последовательность serial не двигалась. Подтягиваем её
+# к последнему выданному артикулу.
+SYNC_ARTICLE_SEQUENCE_SQL = """
+    SELECT setval(
+        pg_get_serial_sequence('nomenclature', 'article'),
+        COALESCE(MAX(article), 1),
+        MAX(article) IS NOT NULL
+    ) FROM nomenclature
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nomenclatures', '0004_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(SYNC_ARTICLE_SEQUENCE_SQL, migrations.RunSQL.noop),
+    ]
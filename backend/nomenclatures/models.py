@@ -1,7 +1,14 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from django.conf import settings as django_settings
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.contrib.postgres.validators import KeysValidator
 from django.db import models
+from django.db.models.functions import Upper
 
 from api import APIBaseObjectModel, Article
+from nomenclatures.schedule import CompiledSchedule, get_schedule
 
 TIMEZONES = {
     'Etc/GMT+11': 'UTC -11',
@@ -94,6 +101,34 @@ class Nomenclature(APIBaseObjectModel):
                                         'уже существует'
             )
         ]
+        indexes = [
+            # для фильтров name и client__name (icontains)
+            GinIndex(
+                OpClass(Upper('name'), name='gin_trgm_ops'),
+                name='nomenclature_name_trgm_idx'
+            )
+        ]
+
+    @property
+    def schedule(self) -> CompiledSchedule:
+        """
+        Разобранные настройки вещания, см. nomenclatures.schedule.
+
+        Разбор кешируется в get_schedule по самим настройкам, поэтому
+        изменения settings (в том числе на месте) видны сразу.
+        """
+        return get_schedule(self.settings)
+
+    def get_local_time(self, moment: datetime | None = None) -> datetime:
+        """Серверное время {moment} (по-умолчанию текущее) в поясе станции."""
+        moment = moment or datetime.now()
+        return moment.replace(
+            tzinfo=ZoneInfo(django_settings.TIME_ZONE)
+        ).astimezone(ZoneInfo(self.timezone)).replace(tzinfo=None)
+
+    def get_volume(self, moment: datetime | None = None):
+        """Громкость станции в {moment}, None - если станция не работает."""
+        return self.schedule.get_volume(self.get_local_time(moment))
 
 
 class NomenclatureAvailability(models.Model):
@@ -118,6 +153,13 @@ class NomenclatureAvailability(models.Model):
         ordering = ('-last_answer_date',)
         verbose_name = 'Время последнего ответа'
         verbose_name_plural = 'Время последнего ответа'
+        indexes = [
+            # для поиска переходов в update_nomenclature_status
+            models.Index(
+                fields=['status', 'last_answer_date'],
+                name='availability_status_idx'
+            )
+        ]
 
     def __str__(self):
         return f'{self.last_answer_date}'
@@ -146,6 +188,13 @@ class StatusHistory(models.Model):
         ordering = ('-change_time',)
         verbose_name = 'История доступности'
         verbose_name_plural = 'История доступности'
+        indexes = [
+            # история станции читается от последних изменений
+            models.Index(
+                fields=['client', '-change_time'],
+                name='status_history_client_idx'
+            )
+        ]
 
     def __str__(self):
         return (
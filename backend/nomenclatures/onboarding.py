@@ -0,0 +1,123 @@
+import csv
+import io
+import json
+
+from django.db import transaction
+
+from nomenclatures.models import Nomenclature
+from nomenclatures.serializers import NomenclatureImportSerializer
+
+# Сколько станций вставляется одним запросом
+IMPORT_BATCH_SIZE = 1000
+# Колонки CSV, значения которых приходят в JSON
+CSV_JSON_COLUMNS = ('settings',)
+
+
+def parse_rows(content: str, import_format: str) -> list[tuple[int, dict]]:
+    """
+    Строки файла импорта с их номерами.
+
+    Строки, которые не удалось разобрать, возвращаются с ошибкой
+    в ключе __error__ и дальше в отчёт.
+    """
+    rows = []
+    if import_format == 'csv':
+        reader = csv.DictReader(io.StringIO(content))
+        # нумерация с учётом заголовка
+        for number, row in enumerate(reader, start=2):
+            # пустые ячейки - незаполненные поля
+            row = {key: value for key, value in row.items() if value}
+            try:
+                for column in CSV_JSON_COLUMNS:
+                    if row.get(column):
+                        row[column] = json.loads(row[column])
+            except json.JSONDecodeError:
+                row = {'__error__': f'Колонка {column} должна быть в JSON.'}
+            rows.append((number, row))
+        return rows
+    for number, line in enumerate(content.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError:
+            row = None
+        if not isinstance(row, dict):
+            row = {'__error__': 'Строка должна быть JSON объектом.'}
+        rows.append((number, row))
+    return rows
+
+
+def import_nomenclatures(rows: list[tuple[int, dict]], owner) -> dict:
+    """
+    Массовое добавление рабочих станций.
+
+    1. Проверяем каждую строку сериализатором. Расписание по одинаковым
+        настройкам собирается один раз и берётся из кеша get_schedule.
+    2. Названия проверяем на уникальность внутри файла и одним запросом
+        по базе (ограничение unique_nomenclature_name).
+    3. Создаём станции через bulk_create пачками, артикулы выдаёт
+        последовательность базы. Название могли занять параллельно
+        (другой импорт или создание станции), такие строки пропускаются
+        (ignore_conflicts), остальные станции файла создаются.
+    4. Какие станции вставились, узнаём одним запросом по их id,
+        для остальных добавляем ошибку в отчёт.
+
+    Возвращает количество созданных станций и ошибки по номерам строк.
+    """
+    errors = []
+    valid = []
+    # 1
+    for number, row in rows:
+        if '__error__' in row:
+            errors.append({'row': number, 'errors': row['__error__']})
+            continue
+        serializer = NomenclatureImportSerializer(data=row)
+        if not serializer.is_valid():
+            errors.append({'row': number, 'errors': serializer.errors})
+            continue
+        valid.append((number, serializer.validated_data))
+    # 2
+    names = [data['name'] for _, data in valid]
+    taken = set(
+        Nomenclature.objects.filter(name__in=names).values_list(
+            'name', flat=True
+        )
+    )
+    stations = []
+    for number, data in valid:
+        if data['name'] in taken:
+            errors.append({
+                'row': number,
+                'errors': {'name': [
+                    'Номенклатура с таким названием уже существует'
+                ]}
+            })
+            continue
+        taken.add(data['name'])
+        stations.append((number, Nomenclature(owner=owner, **data)))
+    # 3
+    with transaction.atomic():
+        Nomenclature.objects.bulk_create(
+            [station for _, station in stations],
+            batch_size=IMPORT_BATCH_SIZE,
+            ignore_conflicts=True
+        )
+    # 4
+    created = set(
+        Nomenclature.objects.filter(
+            id__in=[station.id for _, station in stations]
+        ).values_list('id', flat=True)
+    )
+    for number, station in stations:
+        if station.id not in created:
+            errors.append({
+                'row': number,
+                'errors': {'name': [
+                    'Номенклатура с таким названием уже существует'
+                ]}
+            })
+    return {
+        'created': len(created),
+        'errors': sorted(errors, key=lambda error: error['row']),
+    }
@@ -0,0 +1,10 @@
+from django.urls import path
+
+from nomenclatures.consumers import PendingTasksConsumer
+
+websocket_urlpatterns = [
+    path(
+        'ws/nomenclatures/<uuid:pk>/pending_tasks/',
+        PendingTasksConsumer.as_asgi()
+    ),
+]
@@ -0,0 +1,197 @@
+import json
+from bisect import bisect_right
+from datetime import datetime
+from functools import lru_cache
+from typing import NamedTuple
+
+# Порядок совпадает с datetime.weekday()
+DAYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+VOLUME_LENGTH = 4
+TIME_LIMITS = (
+    ('часов', 23),
+    ('минут', 59),
+    ('секунд', 59),
+)
+DAY_END = 23 * 3600 + 59 * 60 + 59
+
+
+class ScheduleError(ValueError):
+    """Ошибка в настройках вещания."""
+
+
+class DaySchedule(NamedTuple):
+    """
+    Расписание одного дня в секундах от начала суток.
+
+    Пользовательские интервалы громкости отсортированы по началу:
+    starts[i]-ends[i] - интервал, volumes[i] - его громкость.
+    """
+
+    worktime: tuple[int, int]
+    default_volume: tuple[int, ...]
+    starts: tuple[int, ...] = ()
+    ends: tuple[int, ...] = ()
+    volumes: tuple[tuple[int, ...], ...] = ()
+
+
+def parse_time(value: str) -> int:
+    """Время вида HH:MM:SS в секундах от начала суток."""
+    try:
+        parts = [int(part) for part in value.split(':')]
+    except ValueError:
+        raise ScheduleError('Интервал времени имеет не правильный формат!')
+    if not 1 <= len(parts) <= len(TIME_LIMITS):
+        raise ScheduleError('Интервал времени имеет не правильный формат!')
+    seconds = 0
+    for part, (name, limit), multiplier in zip(parts, TIME_LIMITS,
+                                               (3600, 60, 1)):
+        if not 0 <= part <= limit:
+            raise ScheduleError(
+                f'Количество {name} должно быть в пределах 0..{limit}'
+            )
+        seconds += part * multiplier
+    return seconds
+
+
+def parse_interval(interval: str) -> tuple[int, int]:
+    """Промежуток вида HH:MM:SS-HH:MM:SS в секундах от начала суток."""
+    if not isinstance(interval, str):
+        raise ScheduleError('Интервал времени имеет не правильный формат!')
+    split_interval = interval.split('-')
+    if len(split_interval) != 2:
+        raise ScheduleError(
+            'Интервал времени должен содержать ровно два значения!'
+        )
+    start, end = map(parse_time, split_interval)
+    if not start < end <= DAY_END:
+        raise ScheduleError(
+            'Время начала не может быть больше времени окончания '
+            'и должно быть в промежутке 00:00:00 - 23:59:59'
+        )
+    return start, end
+
+
+def parse_volume(volume) -> tuple[int, ...]:
+    """Настройка громкости: ровно VOLUME_LENGTH значений от 0 до 100."""
+    try:
+        volume = tuple(volume)
+    except TypeError:
+        raise ScheduleError(
+            'Список значений громкости имеет не правильный формат'
+        )
+    if len(volume) != VOLUME_LENGTH:
+        raise ScheduleError(
+            f'Значений громкости должно быть ровно {VOLUME_LENGTH}'
+        )
+    if not all(isinstance(vol, int) for vol in volume):
+        raise ScheduleError(
+            'Громкость должна передаваться целочисленным значением'
+        )
+    if not all(0 <= vol <= 100 for vol in volume):
+        raise ScheduleError('Громкость может быть только от 0 до 100')
+    return volume
+
+
+def compile_day(settings: dict) -> DaySchedule:
+    """
+    Разбор настроек одного дня.
+
+    1. Обязательные worktime и default_volume.
+    2. Опциональные custom_volume, отсортированные по началу интервала.
+        Соседние интервалы не должны пересекаться.
+    """
+    # 1
+    try:
+        worktime = settings['worktime']
+        default_volume = settings['default_volume']
+    except KeyError as ke:
+        raise ScheduleError(f'{ke} не передан')
+    except TypeError:
+        raise ScheduleError('Настройки дня имеют не правильный формат')
+    day = DaySchedule(parse_interval(worktime), parse_volume(default_volume))
+    # 2
+    custom_volume = settings.get('custom_volume')
+    if not custom_volume:
+        return day
+    if not isinstance(custom_volume, dict):
+        raise ScheduleError(
+            'Пользовательские настройки громкости имеют не правильный формат'
+        )
+    intervals = sorted(
+        (*parse_interval(interval), parse_volume(volume))
+        for interval, volume in custom_volume.items()
+    )
+    for (_, end_curr, _), (start_next, _, _) in zip(intervals, intervals[1:]):
+        if end_curr > start_next:
+            raise ScheduleError(
+                'Обнаружено пересечение в часах '
+                'пользовательских настроек громкости'
+            )
+    starts, ends, volumes = zip(*intervals)
+    return day._replace(starts=starts, ends=ends, volumes=volumes)
+
+
+class CompiledSchedule:
+    """
+    Разобранные настройки вещания рабочей станции.
+
+    Строится один раз на вариант настроек (см. get_schedule), дальше
+    время работы и громкость на любой момент находятся без разбора
+    строк: бинарным поиском по началам пользовательских интервалов.
+    Время передаётся локальное для станции.
+    """
+
+    def __init__(self, days: dict[str, DaySchedule]):
+        self.days = days
+
+    @classmethod
+    def compile(cls, settings: dict) -> 'CompiledSchedule':
+        """Разбор и проверка настроек, ошибки - ScheduleError."""
+        if not isinstance(settings, dict):
+            raise ScheduleError('Настройки вещания имеют не правильный формат')
+        return cls({
+            day: compile_day(day_settings)
+            for day, day_settings in settings.items()
+        })
+
+    def get_day(self, moment: datetime) -> DaySchedule | None:
+        return self.days.get(DAYS[moment.weekday()])
+
+    @staticmethod
+    def get_seconds(moment: datetime) -> int:
+        return moment.hour * 3600 + moment.minute * 60 + moment.second
+
+    def is_working(self, moment: datetime) -> bool:
+        """Работает ли станция в {moment}."""
+        day = self.get_day(moment)
+        if day is None:
+            return False
+        start, end = day.worktime
+        return start <= self.get_seconds(moment) < end
+
+    def get_volume(self, moment: datetime) -> tuple[int, ...] | None:
+        """Громкость в {moment}, None - если станция не работает."""
+        if not self.is_working(moment):
+            return None
+        day = self.get_day(moment)
+        seconds = self.get_seconds(moment)
+        index = bisect_right(day.starts, seconds) - 1
+        if index >= 0 and seconds < day.ends[index]:
+            return day.volumes[index]
+        return day.default_volume
+
+
+@lru_cache(maxsize=1024)
+def _compile_schedule(settings_key: str) -> CompiledSchedule:
+    return CompiledSchedule.compile(json.loads(settings_key))
+
+
+def get_schedule(settings: dict) -> CompiledSchedule:
+    """
+    Расписание по настройкам вещания.
+
+    У станций сети настройки чаще всего одинаковые, поэтому
+    разобранное расписание кешируется по самим настройкам и
+    переиспользуется всеми станциями с такими же настройками.
+    """
+    return _compile_schedule(json.dumps(settings, sort_keys=True))
@@ -1,4 +1,3 @@
-from datetime import time
 from rest_framework import serializers
 
 from nomenclatures.models import (
@@ -6,6 +5,7 @@ from nomenclatures.models import (
     StatusHistory,
     TIMEZONES
 )
+from nomenclatures.schedule import ScheduleError, get_schedule
 
 
 class NomenclatureSerializer(serializers.ModelSerializer):
@@ -49,102 +49,14 @@ class NomenclatureSerializer(serializers.ModelSerializer):
         2. Корректность значений этих ключей
         3. При наличии опциональных значений custom_volume - всё то же самое,
             а также они дополнительно преверяются на пересечение
-        """
-        def _translate_error(err):
-            """Это нужно для перевода стандартной ошибки time"""
-            time_val = str()
-            e_list = str(err).split()
-            match e_list[0]:
-                case 'second':
-                    time_val = 'секунд'
-                case 'minute':
-                    time_val = 'минут'
-                case 'hour':
-                    time_val = 'часов'
-            raise serializers.ValidationError(
-                f'Количество {time_val} должно быть '
-                f'в пределах {e_list[-1]}'
-            )
-
-        def _validate_time(interval: str) -> None:
-            """Валидация промежутков времени."""
-            if not isinstance(interval, str):
-                raise serializers.ValidationError(
-                    'Интервал времени имеет не правильный формат!'
-                )
-            split_interval = interval.split('-')
-            if len(split_interval) != 2:
-                raise serializers.ValidationError(
-                    'Интервал времени должен содержать ровно два значения!'
-                )
-            start = list(map(int, split_interval[0].split(':')))
-            end = list(map(int, split_interval[1].split(':')))
-            try:
-                start_time = time(*start)
-                end_time = time(*end)
-            except ValueError as e:
-                if 'must be' in str(e):
-                    _translate_error(e)
-                else:
-                    raise e
-            if not time(0, 0, 0) <= start_time < end_time <= time(23, 59, 59):
-                raise serializers.ValidationError(
-                    'Время начала не может быть больше времени окончания '
-                    'и должно быть в промежутке 00:00:00 - 23:59:59'
-                )
 
-        def _validate_volume(volume: tuple) -> None:
-            """Валидация настроек громкости."""
-            length = 4
-            if len(volume) != length:
-                raise serializers.ValidationError(
-                    f'Значений громкости должно быть ровно {length}'
-                )
-            if not all(isinstance(vol, int) for vol in volume):
-                raise serializers.ValidationError(
-                    'Громкость должна передаваться целочисленным значением'
-                )
-            if not all(0 <= vol <= 100 for vol in volume):
-                raise serializers.ValidationError(
-                    'Громкость может быть только от 0 до 100'
-                )
-
-        def _validate_collision(custom_settings: dict) -> None:
-            """Валидация пересечения временных отрезков для custom_volume."""
-            sorted_settings = sorted(custom_settings)
-            for curr, next_ in zip(sorted_settings, sorted_settings[1:]):
-                split_curr = curr.split('-')
-                end_curr = list(map(int, split_curr[1].split(':')))
-                split_next = next_.split('-')
-                start_next = list(map(int, split_next[0].split(':')))
-                if time(*end_curr) > time(*start_next):
-                    raise serializers.ValidationError(
-                        'Обнаружено пересечение в часах '
-                        'пользовательских настроек громкости'
-                    )
-
-        for day, settings in value.items():
-            # 1
-            try:
-                req_keys = {
-                    'worktime': settings['worktime'],
-                    'default_volume': tuple(settings['default_volume'])
-                }
-            except KeyError as ke:
-                raise serializers.ValidationError(f'{ke} не передан')
-            except TypeError:
-                raise serializers.ValidationError(
-                    'Список значений громкости имеет не правильный формат'
-                )
-            # 2
-            _validate_time(req_keys['worktime'])
-            _validate_volume(req_keys['default_volume'])
-            # 3
-            if 'custom_volume' in settings:
-                for interval, volume in settings['custom_volume'].items():
-                    _validate_time(interval)
-                    _validate_volume(tuple(volume))
-                _validate_collision(settings['custom_volume'])
+        Проверка - это сборка расписания (см. nomenclatures.schedule),
+        собранное расписание кешируется и переиспользуется.
+        """
+        try:
+            get_schedule(value)
+        except ScheduleError as error:
+            raise serializers.ValidationError(str(error))
         return value
 
     def get_status(self, obj):
@@ -236,3 +148,72 @@ class StatusHistorySerializer(serializers.ModelSerializer):
         repr_ = super().to_representation(value)
         repr_['change_time'] = f'{value.change_time:%Y-%m-%d %H:%M:%S}'
         return repr_
+
+
+class NomenclatureImportSerializer(serializers.Serializer):
+    """
+    Одна рабочая станция из файла импорта.
+
+    Проверки настроек те же, что и в NomenclatureSerializer.
+    Уникальность названия проверяется сразу для всего файла в
+    nomenclatures.onboarding, а не запросом на каждую строку.
+    """
+
+    name = serializers.CharField(max_length=255)
+    description = serializers.CharField(
+        required=False,
+        allow_blank=True,
+        allow_null=True
+    )
+    timezone = serializers.ChoiceField(
+        choices=list(TIMEZONES),
+        default='Etc/GMT-7'
+    )
+    settings = serializers.DictField(
+        validators=[Nomenclature.keys_validator]
+    )
+
+    def validate_settings(self, value):
+        """
+        Валидация настроек.
+
+        У станций одной сети настройки чаще всего одинаковые, а собранное
+        расписание кешируется (get_schedule), поэтому каждый вариант
+        настроек на весь файл собирается один раз.
+        """
+        try:
+            get_schedule(value)
+        except ScheduleError as error:
+            raise serializers.ValidationError(str(error))
+        return value
+
+
+class NomenclatureImportQuerySerializer(serializers.Serializer):
+    """
+    Файл импорта рабочих станций: CSV с заголовком, либо JSON Lines.
+
+    Файл передаётся multipart в поле file (размер не ограничен
+    DATA_UPLOAD_MAX_MEMORY_SIZE), либо текстом в поле content.
+    """
+
+    import_format = serializers.ChoiceField(
+        choices=('csv', 'jsonl'),
+        default='jsonl'
+    )
+    content = serializers.CharField(trim_whitespace=False, required=False)
+    file = serializers.FileField(required=False)
+
+    def validate(self, data):
+        """Содержимое файла импорта кладём в content."""
+        if 'file' in data:
+            try:
+                data['content'] = data.pop('file').read().decode('utf-8-sig')
+            except UnicodeDecodeError:
+                raise serializers.ValidationError(
+                    {'file': 'Файл импорта должен быть в кодировке UTF-8.'}
+                )
+        elif 'content' not in data:
+            raise serializers.ValidationError(
+                'Передайте файл импорта в поле file или content.'
+            )
+        return data
\ No newline at end of file
@@ -1,11 +1,14 @@
-from itertools import chain
-
 from celery import shared_task
 from celery_singleton import Singleton
 from datetime import datetime, timedelta
+from django.conf import settings
+from django.db import connection
 
-from nomenclatures.models import NomenclatureAvailability, StatusHistory, Nomenclature
+from nomenclatures.heartbeat import flush_heartbeats
+from nomenclatures.models import Nomenclature
 from orders.models import AdOrder, BgOrder
+from orders.payloads import create_order_tasks
+from tasks.delivery import notify_clients
 from tasks.models import Task
 from users.models import CustomUser
 
@@ -18,131 +21,82 @@ def get_nomenclature(nomenclature_id):
     return Nomenclature.objects.get(pk=nomenclature_id)
 
 
+# Переходы считаются целиком на стороне базы. Условие WHERE отбирает только
+# станции, чей статус разошёлся с порогами по времени последнего ответа,
+# по индексу (status, last_answer_date), поэтому стоимость пропорциональна
+# количеству переходов, а не размеру парка.
+UPDATE_STATUSES_SQL = """
+    WITH changed AS (
+        UPDATE availability
+        SET status = CASE
+            WHEN last_answer_date >= %(offline_5_min)s THEN %(online)s
+            WHEN last_answer_date >= %(offline_1_hour)s THEN %(offline_5)s
+            ELSE %(offline_60)s
+        END
+        WHERE (
+            status = %(online)s
+            AND last_answer_date < %(offline_5_min)s
+        ) OR (
+            status = %(offline_5)s
+            AND (last_answer_date >= %(offline_5_min)s
+                 OR last_answer_date < %(offline_1_hour)s)
+        ) OR (
+            status = %(offline_60)s
+            AND last_answer_date >= %(offline_5_min)s
+        )
+        RETURNING client_id, status
+    )
+    INSERT INTO status_history (client_id, change_time, status)
+    SELECT client_id, %(now)s, status FROM changed
+"""
+
+
 @shared_task(base=Singleton)
 def update_nomenclature_status():
     """
     Обновление статусов доступности номенклатур
     и запись истории их изменения.
+
+    Одним запросом:
+    1. UPDATE ... RETURNING меняет статусы по порогам:
+        ответ не старше 5 минут - онлайн, не старше часа - офлайн 5+ минут,
+        иначе - офлайн 1+ час. Из офлайна 1+ час станция выходит
+        только в онлайн.
+    2. INSERT ... SELECT по результату записывает историю изменений.
+
+    Перед пересчётом в базу переносятся ответы, накопленные в буфере
+    редиса, чтобы статусы считались по актуальному времени ответа.
     """
-    statuses = NomenclatureAvailability.objects.all()
-    statuses_to_update = []
-    status_histories_to_create = []
-    ONLINE = 0
-    OFFLINE_5_MIN = 1
-    OFFLINE_1_HOUR = 2
-
-    for status in statuses:
-        now_time = datetime.now()
-        new_status = ONLINE
-        current_status = status.status
-        last_answer = status.last_answer_date
-        if current_status == ONLINE:
-            if now_time - last_answer > timedelta(hours=1):
-                new_status = OFFLINE_1_HOUR
-            elif now_time - last_answer > timedelta(minutes=5):
-                new_status = OFFLINE_5_MIN
-            if new_status != current_status:
-                status.status = new_status
-                statuses_to_update.append(status)
-                status_histories_to_create.append(
-                    StatusHistory(
-                        status=new_status,
-                        client=status.client
-                    )
-                )
-
-        if current_status == OFFLINE_5_MIN:
-            new_status = OFFLINE_5_MIN
-            if now_time - last_answer > timedelta(hours=1):
-                new_status = OFFLINE_1_HOUR
-            elif now_time - last_answer < timedelta(minutes=5):
-                new_status = ONLINE
-            if new_status != current_status:
-                status.status = new_status
-                statuses_to_update.append(status)
-                status_histories_to_create.append(
-                    StatusHistory(
-                        status=new_status,
-                        client=status.client
-                    )
-                )
-
-        if current_status == OFFLINE_1_HOUR:
-            if now_time - last_answer < timedelta(minutes=5):
-                status.status = ONLINE
-                statuses_to_update.append(status)
-                status_histories_to_create.append(
-                    StatusHistory(
-                        status=new_status,
-                        client=status.client
-                    )
-                )
-
-    NomenclatureAvailability.objects.bulk_update(statuses_to_update, ['status'])
-    StatusHistory.objects.bulk_create(status_histories_to_create)
-
-    return f'Обновлено {len(statuses_to_update)} статусов доступности.'
+    if settings.HEARTBEAT_WRITE_BEHIND:
+        flush_heartbeats()
+    now_time = datetime.now()
+    with connection.cursor() as cursor:
+        cursor.execute(UPDATE_STATUSES_SQL, {
+            'now': now_time,
+            'offline_5_min': now_time - timedelta(minutes=5),
+            'offline_1_hour': now_time - timedelta(hours=1),
+            'online': 0,
+            'offline_5': 1,
+            'offline_60': 2
+        })
+        count = cursor.rowcount
+
+    return f'Обновлено {count} статусов доступности.'
 
 
 @shared_task
 def resend_orders_task(order_ids: list):
     """
-    Переотправка рекламного заказа.
+    Переотправка заказов.
 
-    0. Фильтруем заказы по пришедшему списку айди, собираем в список.
-    1. Проходим по списку заказов. Заполняем параметры репликации,
-        в зависимости от типа заказа.
-    2. Формируем список репликаций для создания.
-    3. Создаём все репликации одной операцией, фиксируем их количество.
+    Рекламные и фоновые заказы из списка отправляются заново,
+    репликации собираются в create_order_tasks.
     """
-    task_list = []
-    AD = 4
-    # 0
-    orders = chain(
+    count = create_order_tasks(
         AdOrder.objects.filter(id__in=order_ids),
         BgOrder.objects.filter(id__in=order_ids)
     )
-    # 1
-    for order in orders:
-        parameters = {
-            'order_id': str(order.id),
-            'broadcast_interval': f'{order.broadcast_interval.lower}-'
-                                  f'{order.broadcast_interval.upper}',
-            'playlist': {
-                'id': str(order.playlist.id),
-                'files': [
-                    {
-                        'id': str(file.id),
-                        'hash': file.hash
-                    } for file in order.playlist.files.all()
-                ]
-            }
-        }
-        if isinstance(order, AdOrder):
-            parameters.update({
-                'order_parameters': order.parameters,
-                'broadcast_type': order.broadcast_type,
-            })
-            parameters['playlist']['slides'] = (
-                order.slides if order.slides else None
-            )
-            task_type = AD
-        else:
-            parameters.update({'type': order.order_type})
-            task_type = order.order_type
-        # 2
-        task_list.append(
-            Task(
-                owner=order.owner,
-                client=order.client,
-                type=task_type,
-                parameters=parameters
-            )
-        )
-    # 3
-    Task.objects.bulk_create(task_list)
-    result = f'Переотправленно заказов: {len(task_list)}.'
-    return result
+    return f'Переотправленно заказов: {count}.'
 
 
 @shared_task
@@ -154,6 +108,7 @@ def reboot_task(nomenclature_id: str, owner_id: str):
         client=nomenclature,
         type=15
     )
+    notify_clients([nomenclature.id])
     return f'Перезагрузка отправлена на {nomenclature.name}'
 
 
@@ -166,6 +121,7 @@ def update_task(nomenclature_id: str, owner_id: str):
         client=nomenclature,
         type=16
     )
+    notify_clients([nomenclature.id])
     return f'Обновление отправлено на {nomenclature.name}'
 
 
@@ -179,6 +135,7 @@ def custom_task(nomenclature_id: str, parameters: str, owner_id: str):
         type=17,
         parameters=parameters
     )
+    notify_clients([nomenclature.id])
     return f'SH команда отправлена на {nomenclature.name}'
 
 
@@ -192,4 +149,5 @@ def settings_task(nomenclature_id: str, settings: dict, owner_id: str):
         type=18,
         parameters=settings
     )
+    notify_clients([nomenclature.id])
     return f'Настройки вещания отправлены на {nomenclature.name}'
@@ -1,8 +1,17 @@
-from datetime import datetime as dt
+from datetime import datetime as dt, timedelta as td
+from django.conf import settings
+from django.db.models import (
+    Case,
+    PositiveSmallIntegerField,
+    Value,
+    When
+)
+from django.http import Http404
 from django_filters.rest_framework import DjangoFilterBackend
 from itertools import chain
 from rest_framework import viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.status import (
@@ -10,7 +19,8 @@ from rest_framework.status import (
     HTTP_201_CREATED
 )
 
-from api.constants import Constants, get_instance_or_404
+from api.constants import Constants, get_instance_or_404, validate_uuid
+from ch_statistic.buffer import push_statistic
 from ch_statistic.models import (
     ADStat,
     MusicStat,
@@ -18,7 +28,9 @@ from ch_statistic.models import (
     ImageStat,
     TickerStat
 )
+from ch_statistic.rollups import get_client_summary
 from ch_statistic.serializers import (
+    StatisticSummaryQuerySerializer,
     NomenclatureAdStatSerializer,
     NomenclatureMusicStatSerializer,
     NomenclatureVideoStatSerializer,
@@ -27,15 +39,15 @@ from ch_statistic.serializers import (
 )
 from ch_statistic.tasks import create_statistic
 from nomenclatures.filters import NomenclatureFilter
+from nomenclatures.onboarding import import_nomenclatures, parse_rows
 from nomenclatures.serializers import (
+    NomenclatureImportQuerySerializer,
     NomenclatureSerializer,
     NomenclatureListSerializer,
     StatusHistorySerializer
 )
-from nomenclatures.models import (
-    Nomenclature,
-    NomenclatureAvailability
-)
+from nomenclatures.heartbeat import record_heartbeat
+from nomenclatures.models import Nomenclature
 from nomenclatures.tasks import (
     resend_orders_task,
     reboot_task,
@@ -43,6 +55,7 @@ from nomenclatures.tasks import (
     custom_task,
     settings_task
 )
+from tasks.delivery import get_pending_tasks, parse_wait
 from tasks.models import Task
 from tasks.serializers import TaskListSerializer
 from users.permissions import SuperuserDStaffCUAuthRetrieve
@@ -57,6 +70,7 @@ class NomenclatureViewSet(viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend]
     filterset_class = NomenclatureFilter
     permission_classes = [SuperuserDStaffCUAuthRetrieve]
+    keyset_pagination = True
 
     def get_serializer(self, *args, **kwargs):
         if self.action == 'list':
@@ -78,6 +92,27 @@ class NomenclatureViewSet(viewsets.ModelViewSet):
         instance.is_active = False
         instance.save(update_fields=['is_active'])
 
+    @action(detail=False, methods=['POST'], url_path='import')
+    def import_stations(self, request):
+        """
+        Массовое добавление рабочих станций.
+
+        Принимает файл импорта - CSV с заголовком (name, description,
+        timezone, settings в JSON), либо JSON Lines с теми же полями,
+        и формат import_format. Файл передаётся multipart в поле file,
+        либо текстом в поле content. В ответ отдаётся количество
+        созданных станций и ошибки по номерам строк. Строки с ошибками
+        пропускаются.
+        """
+        query = NomenclatureImportQuerySerializer(data=request.data)
+        query.is_valid(raise_exception=True)
+        rows = parse_rows(
+            query.validated_data['content'],
+            query.validated_data['import_format']
+        )
+        result = import_nomenclatures(rows, request.user)
+        return Response(result, status=HTTP_201_CREATED)
+
     @action(detail=False, methods=['GET'], url_path='versions')
     def get_versions(self, request):
         versions = Nomenclature.objects.order_by().values_list(
@@ -109,58 +144,93 @@ class NomenclatureViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['POST'], permission_classes=[AllowAny])
     def pending_tasks(self, request, pk):
-        """Отправка задач для клиентов и обработка присылаемых данных."""
-        nomenclature = get_instance_or_404(Nomenclature, pk)
-        nom_update = []
-
-        if 'version' in request.data:
-            nomenclature.version = request.data['version']
-            nom_update.append('version')
-
-        if 'hw_info' in request.data:
-            nomenclature.hw_info = request.data['hw_info']
-            nom_update.append('hw_info')
-
+        """
+        Отправка задач для клиентов и обработка присылаемых данных.
+
+        Эндпоинт опрашивается каждой рабочей станцией с коротким интервалом,
+        поэтому количество запросов в базу не зависит от присланных данных:
+        0. Проверяем pk. Версию ПО и информацию о железе обновляем одним
+            UPDATE, по количеству обновлённых строк понимаем, существует ли
+            номенклатура. Если обновлять нечего - просто проверяем наличие.
+        1. Статистику складываем в буфер редиса (см. STATISTIC_BUFFER),
+            либо отправляем в целери.
+        2. Статусы всех присланных репликаций обновляем одним UPDATE.
+        3. Время последнего ответа пишем одним INSERT ... ON CONFLICT,
+            либо в буфер редиса (см. HEARTBEAT_WRITE_BEHIND).
+        4. Ожидающие репликации забираем через values(), без создания
+            объектов модели.
+        5. Проверяем параметр wait (секунды) для long-poll. Сам запрос
+            здесь не держим: ждать репликаций, не занимая поток воркера,
+            может только ASGI сервер (см. nomenclatures.long_poll).
+            Под WSGI запрос с wait отвечает сразу, как обычный опрос.
+        """
+        # 0
+        validate_uuid(pk)
+        nomenclature = Nomenclature.objects.filter(pk=pk)
+        nom_update = {
+            field: request.data[field]
+            for field in ('version', 'hw_info')
+            if field in request.data
+        }
         if nom_update:
-            nomenclature.save(update_fields=[*nom_update])
-
+            exists = nomenclature.update(**nom_update)
+        else:
+            exists = nomenclature.exists()
+        if not exists:
+            raise Http404
+        # 1
         if 'statistic' in request.data:
             statistics = request.data['statistic']
             for stat_type, stat_list in statistics.items():
-                if len(stat_list) > 0:
+                if len(stat_list) == 0:
+                    continue
+                if settings.STATISTIC_BUFFER:
+                    push_statistic(stat_type, pk, stat_list)
+                else:
                     create_statistic.delay(stat_type, pk, stat_list)
-
-        if 'task_status' in request.data:
-            task_list = list()
+        # 2
+        if request.data.get('task_status'):
+            task_statuses = dict()
             for task in request.data['task_status']:
-                task_id, task_status = task.items()
-                task_instance = Task.objects.get(id=task_id)
-                task_instance.status = task_status
-                task_list.append(task_instance)
-            Task.objects.bulk_update(task_list, ['status'])
-
-        NomenclatureAvailability.objects.update_or_create(
-            client=nomenclature,
-            defaults={'last_answer_date': dt.now()}
-        )
-        pending_tasks = Task.objects.filter(
-            client=pk,
-            status=0
-        )
-        tasks = {'tasks': [
-            {'task_id': task.id,
-             'task_type': task.type,
-             'parameters': task.parameters}
-            for task in pending_tasks]}
-        return Response(tasks, status=HTTP_200_OK)
+                try:
+                    task_statuses[task['task_id']] = task['status']
+                except (KeyError, TypeError):
+                    raise ValidationError(
+                        'Статус репликации должен содержать task_id и status.'
+                    )
+            Task.objects.filter(
+                client=pk,
+                id__in=task_statuses
+            ).update(
+                status=Case(
+                    *[When(id=task_id, then=Value(task_status))
+                      for task_id, task_status in task_statuses.items()],
+                    output_field=PositiveSmallIntegerField()
+                ),
+                updated=dt.now()
+            )
+        # 3
+        record_heartbeat(pk)
+        # 4
+        pending_tasks = get_pending_tasks(pk)
+        # 5
+        if 'wait' in request.query_params:
+            parse_wait(request.query_params['wait'])
+        return Response({'tasks': pending_tasks}, status=HTTP_200_OK)
 
     @action(detail=True, methods=['GET'], url_path='ad_stat')
     def get_ad_stat(self, request, pk):
-        """Отображение статистики рекламы конкретной номенклатуры."""
+        """Отображение статистики рекламы конкретной номенклатуры за день."""
         get_instance_or_404(Nomenclature, pk)
-        date = request.query_params.get('date')
+        try:
+            date = dt.strptime(request.query_params.get('date', ''),
+                               '%Y-%m-%d')
+        except ValueError:
+            raise ValidationError('Дата должна быть в формате ГГГГ-ММ-ДД.')
         statistics = ADStat.objects.filter(
-            client=pk, played__contains=date
+            client=pk,
+            played__gte=date,
+            played__lt=date + td(days=1)
         ).order_by('played')
         serializer = NomenclatureAdStatSerializer(statistics, many=True)
         return Response(serializer.data, status=HTTP_200_OK)
@@ -214,6 +284,27 @@ class NomenclatureViewSet(viewsets.ModelViewSet):
         serializer = NomenclatureTickerStatSerializer(statistics, many=True)
         return Response(serializer.data, status=HTTP_200_OK)
 
+    @action(detail=True, methods=['GET'], url_path='stat_summary')
+    def get_stat_summary(self, request, pk):
+        """
+        Сводная статистика номенклатуры за период.
+
+        Читается из предагрегированных срезов, а не из сырых таблиц.
+        Параметры: date_from, date_to (включительно), period (hour, day,
+        month), type (тип статистики, по-умолчанию все).
+        """
+        get_instance_or_404(Nomenclature, pk)
+        query = StatisticSummaryQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        data = get_client_summary(
+            pk,
+            query.validated_data['date_from'],
+            query.validated_data['date_to'],
+            period=query.validated_data['period'],
+            stat_type=query.validated_data.get('type')
+        )
+        return Response(data, status=HTTP_200_OK)
+
     @action(detail=True, methods=['POST'])
     def resend_orders(self, request, pk):
         """
@@ -5,3 +5,15 @@ class OrdersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'orders'
     verbose_name = 'Заказы'
+
+    def ready(self):
+        """Сброс матрицы эфира при изменении станций и плейлистов."""
+        from django.db.models.signals import post_delete, post_save
+
+        from files.models import Playlist
+        from nomenclatures.models import Nomenclature
+        from orders.on_air import reset_on_air
+
+        for model in (Nomenclature, Playlist):
+            post_save.connect(reset_on_air, sender=model)
+            post_delete.connect(reset_on_air, sender=model)
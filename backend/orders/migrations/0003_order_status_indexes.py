@@ -0,0 +1,30 @@
+# Generated by Django 5.0.3 on 2026-10-18 14:02
+
+import orders.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='adorder',
+            index=models.Index(orders.models.RangeLower('broadcast_interval'), condition=models.Q(('status', 0)), name='adorder_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='adorder',
+            index=models.Index(orders.models.RangeUpper('broadcast_interval'), condition=models.Q(('status', 1)), name='adorder_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bgorder',
+            index=models.Index(orders.models.RangeLower('broadcast_interval'), condition=models.Q(('status', 0)), name='bgorder_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bgorder',
+            index=models.Index(orders.models.RangeUpper('broadcast_interval'), condition=models.Q(('status', 1)), name='bgorder_end_idx'),
+        ),
+    ]
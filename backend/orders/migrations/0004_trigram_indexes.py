@@ -0,0 +1,24 @@
+# Generated by Django 5.0.3 on 2026-10-18 15:20
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nomenclatures', '0004_trigram_indexes'),
+        ('orders', '0003_order_status_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='adorder',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('name'), name='gin_trgm_ops'), name='adorder_name_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bgorder',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('name'), name='gin_trgm_ops'), name='bgorder_name_trgm_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.3 on 2026-10-18 18:40
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='adorder',
+            index=django.contrib.postgres.indexes.GistIndex(condition=models.Q(('status__in', [0, 1])), fields=['broadcast_interval'], name='adorder_interval_gist_idx'),
+        ),
+    ]
@@ -1,5 +1,7 @@
 from django.contrib.postgres.fields import DateTimeRangeField
+from django.contrib.postgres.indexes import GinIndex, GistIndex, OpClass
 from django.db import models
+from django.db.models.functions import Upper
 
 from api import APIBaseObjectModel
 from nomenclatures.models import Nomenclature
@@ -31,6 +33,20 @@ BROADCAST_TYPES = {
 }
 
 
+class RangeLower(models.Func):
+    """Нижняя граница диапазона."""
+
+    function = 'LOWER'
+    output_field = models.DateTimeField()
+
+
+class RangeUpper(models.Func):
+    """Верхняя граница диапазона."""
+
+    function = 'UPPER'
+    output_field = models.DateTimeField()
+
+
 class BaseOrder(APIBaseObjectModel):
     """Заказ."""
 
@@ -65,6 +81,25 @@ class BaseOrder(APIBaseObjectModel):
 
     class Meta:
         abstract = True
+        indexes = [
+            # для поиска переходов в update_order_status: частичные индексы
+            # содержат только ожидающие и идущие заказы, а не всю историю
+            models.Index(
+                RangeLower('broadcast_interval'),
+                condition=models.Q(status=0),
+                name='%(class)s_start_idx'
+            ),
+            models.Index(
+                RangeUpper('broadcast_interval'),
+                condition=models.Q(status=1),
+                name='%(class)s_end_idx'
+            ),
+            # для фильтров name (icontains)
+            GinIndex(
+                OpClass(Upper('name'), name='gin_trgm_ops'),
+                name='%(class)s_name_trgm_idx'
+            )
+        ]
 
     def __str__(self):
         return self.name
@@ -87,11 +122,20 @@ class AdOrder(BaseOrder):
         verbose_name='Параметры заказа'
     )
 
-    class Meta:
+    class Meta(BaseOrder.Meta):
         db_table = 'adorder'
         ordering = ('-created',)
         verbose_name = 'Рекламный заказ'
         verbose_name_plural = 'Рекламные заказы'
+        indexes = [
+            *BaseOrder.Meta.indexes,
+            # для поиска пересекающихся заказов (см. orders.scheduling)
+            GistIndex(
+                fields=['broadcast_interval'],
+                condition=models.Q(status__in=[0, 1]),
+                name='adorder_interval_gist_idx'
+            ),
+        ]
 
 
 class BgOrder(BaseOrder):
@@ -106,7 +150,7 @@ class BgOrder(BaseOrder):
         default=dict
     )
 
-    class Meta:
+    class Meta(BaseOrder.Meta):
         db_table = 'bgorder'
         ordering = ('-created',)
         verbose_name = 'Фоновый заказ'
@@ -0,0 +1,159 @@
+import time
+
+from django.core.cache import cache
+from django.db.models import F
+
+from orders.models import AdOrder, BgOrder
+
+ON_AIR_KEY = 'orders:on_air'
+ON_AIR_GENERATION_KEY = 'orders:on_air:generation'
+# Матрица пересобирается не реже, чем раз в ON_AIR_TIMEOUT секунд
+ON_AIR_TIMEOUT = 60 * 60
+ORDER_MODELS = {'ad': AdOrder, 'bg': BgOrder}
+
+
+def get_entries(**filters) -> dict[str, dict]:
+    """
+    Заказы в эфире в формате матрицы, по айди заказа.
+
+    Идущие заказы выбираются по частичному индексу (status=1),
+    станция и плейлист - джойном в том же запросе. Заказы удалённых
+    (неактуальных) станций в эфир не попадают.
+    """
+    entries = {}
+    for order_type, model in ORDER_MODELS.items():
+        orders = model.objects.filter(
+            status=1, client__is_active=True, **filters
+        ).values(
+            'id',
+            'name',
+            'broadcast_interval',
+            'client_id',
+            'playlist_id',
+            client_name=F('client__name'),
+            playlist_name=F('playlist__name')
+        )
+        for order in orders:
+            entries[str(order['id'])] = {
+                'id': str(order['id']),
+                'name': order['name'],
+                'type': order_type,
+                'broadcast_interval':
+                    f'{order["broadcast_interval"].lower}-'
+                    f'{order["broadcast_interval"].upper}',
+                'client': {
+                    'id': str(order['client_id']),
+                    'name': order['client_name'],
+                },
+                'playlist': {
+                    'id': str(order['playlist_id']),
+                    'name': order['playlist_name'],
+                },
+            }
+    return entries
+
+
+def get_generation() -> int:
+    """
+    Номер текущего состояния заказов в эфире.
+
+    Увеличивается при каждом изменении (см. update_on_air). Если счётчик
+    пропал из кеша, начинается с текущего времени, чтобы номера
+    (а значит и ETag) не повторялись.
+    """
+    cache.add(ON_AIR_GENERATION_KEY, int(time.time() * 1000), None)
+    return cache.get(ON_AIR_GENERATION_KEY)
+
+
+def rebuild_on_air() -> dict:
+    """
+    Сборка матрицы эфира целиком.
+
+    Номер состояния берётся до чтения из базы: если заказы поменялись
+    во время сборки, матрица окажется устаревшей и соберётся заново
+    при следующем запросе.
+    """
+    generation = get_generation()
+    matrix = {'generation': generation, 'orders': get_entries()}
+    cache.set(ON_AIR_KEY, matrix, ON_AIR_TIMEOUT)
+    return matrix
+
+
+def get_on_air() -> dict:
+    """
+    Матрица эфира: номер состояния (для ETag) и заказы в эфире.
+
+    Если матрицы нет в кеше или она отстала от номера состояния -
+    собираем заново.
+    """
+    matrix = cache.get(ON_AIR_KEY)
+    if matrix is None or matrix['generation'] != get_generation():
+        matrix = rebuild_on_air()
+    return matrix
+
+
+def update_on_air(order_ids) -> None:
+    """
+    Точечное обновление матрицы по изменившимся заказам.
+
+    Вызывается после сохранения изменений в базе.
+    1. Увеличиваем номер состояния, после этого любая ранее собранная
+        матрица считается устаревшей.
+    2. Выбираем из базы только {order_ids}: заказы в эфире добавляются
+        или обновляются, остальные убираются из матрицы.
+    3. Обновлённую матрицу сохраняем с новым номером, только если она
+        отставала ровно на это изменение. Иначе (параллельные изменения,
+        матрицы нет в кеше) её соберёт заново первый запрос.
+    """
+    order_ids = [str(order_id) for order_id in order_ids]
+    if not order_ids:
+        return
+    # 1
+    get_generation()
+    generation = cache.incr(ON_AIR_GENERATION_KEY)
+    # 2
+    entries = get_entries(id__in=order_ids)
+    matrix = cache.get(ON_AIR_KEY)
+    # 3
+    if matrix is None or matrix['generation'] != generation - 1:
+        return
+    orders = matrix['orders']
+    for order_id in order_ids:
+        if order_id in entries:
+            orders[order_id] = entries[order_id]
+        else:
+            orders.pop(order_id, None)
+    matrix['generation'] = generation
+    cache.set(ON_AIR_KEY, matrix, ON_AIR_TIMEOUT)
+
+
+def reset_on_air(sender, instance, update_fields=None, **kwargs) -> None:
+    """
+    Сброс матрицы при изменении станции или плейлиста.
+
+    Названия станций и плейлистов хранятся в матрице, поэтому после
+    их изменения или удаления станции увеличиваем номер состояния:
+    матрица соберётся заново при следующем запросе. Сохранения,
+    которые не трогают название и актуальность, матрицу не сбрасывают.
+    """
+    if update_fields is not None and not {'name', 'is_active'} & set(
+        update_fields
+    ):
+        return
+    get_generation()
+    cache.incr(ON_AIR_GENERATION_KEY)
+
+
+def group_by_client(orders, client_id: str | None = None) -> list[dict]:
+    """Матрица в ответе: станции и их заказы в эфире."""
+    clients = {}
+    for order in orders.values():
+        client = order['client']
+        if client_id is not None and client['id'] != client_id:
+            continue
+        if client['id'] not in clients:
+            clients[client['id']] = {**client, 'orders': []}
+        clients[client['id']]['orders'].append({
+            key: value for key, value in order.items() if key != 'client'
+        })
+    return sorted(clients.values(), key=lambda client: client['name'])
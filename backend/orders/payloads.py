@@ -0,0 +1,93 @@
+from django.db.models import Prefetch
+
+from files.models import File
+from orders.models import AdOrder
+from tasks.delivery import notify_clients
+from tasks.models import Task
+
+AD = 4
+# Сколько репликаций вставляется одним запросом
+TASK_BATCH_SIZE = 500
+
+
+def get_orders_for_tasks(queryset):
+    """
+    Заказы со всем, что нужно для репликаций.
+
+    Плейлисты подтягиваются джойном, файлы всех плейлистов - одним
+    запросом и только нужные для репликации поля.
+    """
+    return queryset.select_related('playlist').prefetch_related(
+        Prefetch('playlist__files', queryset=File.objects.only('id', 'hash'))
+    )
+
+
+def get_playlist_payload(playlist, payloads: dict) -> dict:
+    """
+    Плейлист в формате репликации.
+
+    Собирается один раз на плейлист и переиспользуется для всех
+    заказов с этим плейлистом через {payloads}.
+    """
+    if playlist.id not in payloads:
+        payloads[playlist.id] = {
+            'id': str(playlist.id),
+            'files': [
+                {'id': str(file.id), 'hash': file.hash}
+                for file in playlist.files.all()
+            ]
+        }
+    return payloads[playlist.id]
+
+
+def get_order_task(order, payloads: dict) -> Task:
+    """Репликация отправки рекламного или фонового заказа."""
+    parameters = {
+        'order_id': str(order.id),
+        'broadcast_interval': f'{order.broadcast_interval.lower}-'
+                              f'{order.broadcast_interval.upper}',
+    }
+    playlist = get_playlist_payload(order.playlist, payloads)
+    if isinstance(order, AdOrder):
+        parameters.update({
+            'order_parameters': order.parameters,
+            'broadcast_type': order.broadcast_type,
+            'playlist': {**playlist, 'slides': order.slides or None},
+        })
+        task_type = AD
+    else:
+        parameters.update({
+            'type': order.order_type,
+            'playlist': playlist,
+        })
+        task_type = order.order_type
+    return Task(
+        owner_id=order.owner_id,
+        client_id=order.client_id,
+        type=task_type,
+        parameters=parameters
+    )
+
+
+def create_order_tasks(*querysets) -> int:
+    """
+    Создание репликаций отправки заказов.
+
+    1. Выбираем заказы из всех {querysets} вместе с плейлистами и файлами,
+        количество запросов не зависит от количества заказов.
+    2. Собираем репликации, плейлисты переиспользуются между заказами.
+    3. Создаём репликации пачками и оповещаем рабочие станции.
+
+    Возвращает количество созданных репликаций.
+    """
+    payloads = {}
+    # 1, 2
+    task_list = [
+        get_order_task(order, payloads)
+        for queryset in querysets
+        for order in get_orders_for_tasks(queryset)
+    ]
+    # 3
+    Task.objects.bulk_create(task_list, batch_size=TASK_BATCH_SIZE)
+    notify_clients({task.client_id for task in task_list})
+    return len(task_list)
@@ -0,0 +1,254 @@
+from collections import defaultdict
+from datetime import datetime, timedelta as td
+from math import ceil
+from typing import NamedTuple
+
+from nomenclatures.schedule import DAYS, DaySchedule, ScheduleError
+from orders.models import AdOrder
+
+# Заказы со стартом по событию не занимают эфир по расписанию
+EVENT_BROADCAST_TYPE = 6
+# Статусы заказов, которые занимают эфир
+ACTIVE_STATUSES = (0, 1)
+
+
+class OrderLoad(NamedTuple):
+    """Рекламный заказ в расчёте нагрузки на эфир станции."""
+
+    id: str | None
+    lower: datetime
+    upper: datetime
+    broadcast_type: int
+    parameters: dict
+
+
+def naive(moment: datetime) -> datetime:
+    """Границы интервалов сравниваются без часового пояса (USE_TZ=False)."""
+    return moment.replace(tzinfo=None)
+
+
+def to_seconds(time_tuple) -> int:
+    """Время из параметров заказа ([ЧЧ, ММ, СС], минуты и секунды
+    необязательны) в секундах от начала суток."""
+    hours, minutes, seconds = (*time_tuple, 0, 0, 0)[:3]
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def get_daily_window(order: OrderLoad,
+                     day: DaySchedule | None) -> tuple[int, int] | None:
+    """
+    Окно вещания заказа внутри дня в секундах от начала суток.
+
+    Реклама идёт только в рабочее время станции, поэтому окно всегда
+    ограничено временем работы дня {day}. None - заказ в этот день
+    не выходит в эфир по расписанию.
+    """
+    if day is None or order.broadcast_type == EVENT_BROADCAST_TYPE:
+        return None
+    start, end = day.worktime
+    parameters = order.parameters
+    match order.broadcast_type:
+        case 1:
+            start += to_seconds(parameters['timedelta'])
+        case 2:
+            end -= to_seconds(parameters['timedelta'])
+        case 3 | 4 | 5:
+            if 'start_time' in parameters:
+                start = max(start, to_seconds(parameters['start_time']))
+            if 'end_time' in parameters:
+                end = min(end, to_seconds(parameters['end_time']))
+    if start >= end:
+        return None
+    return start, end
+
+
+def get_day_load(orders, day: DaySchedule | None) -> list[int]:
+    """
+    Выходы в час по часам одного дня недели.
+
+    Заказ учитывается во всех часах, которые пересекает его окно
+    вещания, с полным times_in_hour (оценка сверху).
+    """
+    load = [0] * 24
+    for order in orders:
+        window = get_daily_window(order, day)
+        if window is None:
+            continue
+        for hour in range(window[0] // 3600, ceil(window[1] / 3600)):
+            load[hour] += order.parameters['times_in_hour']
+    return load
+
+
+def get_weekdays(lower: datetime, upper: datetime) -> list[int]:
+    """Дни недели, которые задевает промежуток [lower, upper)."""
+    last_day = (upper - td(microseconds=1)).date()
+    days = (last_day - lower.date()).days + 1
+    return sorted({(lower + td(days=day)).weekday() for day in range(min(days, 7))})
+
+
+def sweep_load(orders: list[OrderLoad], schedule_days: dict[str, DaySchedule],
+               lower: datetime, upper: datetime) -> list[dict]:
+    """
+    Нагрузка на эфир станции в промежутке [lower, upper).
+
+    Заметающая прямая по границам интервалов вещания заказов:
+    1. Собираем события начала и конца заказов и сортируем по времени.
+    2. Идём по событиям, поддерживая набор идущих заказов. Между
+        соседними событиями набор не меняется - это отрезок.
+    3. На каждом отрезке нагрузка повторяется по дням недели,
+        поэтому считаем её для каждого задетого дня недели один раз.
+        Одинаковые наборы заказов между отрезками не пересчитываются.
+
+    Сложность - O(N log N) на сортировку событий плюс расчёт по
+    отрезкам, не больше 2N отрезков.
+    Возвращает отрезки с нагрузкой по дням недели и часам.
+    """
+    # 1
+    events = []
+    for order in orders:
+        start, end = max(order.lower, lower), min(order.upper, upper)
+        if start < end:
+            events += [(start, 1, order), (end, -1, order)]
+    events.sort(key=lambda event: (event[0], event[1]))
+    # 2
+    active = {}
+    segments = []
+    day_loads = {}
+    for (moment, change, order), next_event in zip(events, events[1:]):
+        if change > 0:
+            active[order.id] = order
+        else:
+            active.pop(order.id, None)
+        next_moment = next_event[0]
+        if not active or moment == next_moment:
+            continue
+        # 3
+        active_ids = frozenset(active)
+        load = {}
+        for weekday in get_weekdays(moment, next_moment):
+            key = (active_ids, weekday)
+            if key not in day_loads:
+                day_loads[key] = get_day_load(
+                    active.values(),
+                    schedule_days.get(DAYS[weekday])
+                )
+            load[DAYS[weekday]] = day_loads[key]
+        segments.append({
+            'lower': moment,
+            'upper': next_moment,
+            'orders': sorted(
+                order_id for order_id in active_ids if order_id is not None
+            ),
+            'load': load,
+        })
+    return segments
+
+
+def get_station_orders(client_ids, lower: datetime, upper: datetime,
+                       exclude_id=None) -> dict[str, list[OrderLoad]]:
+    """
+    Рекламные заказы станций {client_ids}, пересекающиеся с [lower, upper).
+
+    Заказы всех станций выбираются одним запросом и группируются
+    по айди станции. Пересечение ищется по частичному GiST индексу
+    на broadcast_interval (только ожидающие и идущие заказы).
+    """
+    orders = AdOrder.objects.filter(
+        client_id__in=client_ids,
+        status__in=ACTIVE_STATUSES,
+        broadcast_interval__overlap=(lower, upper)
+    ).exclude(
+        broadcast_type=EVENT_BROADCAST_TYPE
+    ).values_list(
+        'id', 'client_id', 'broadcast_interval', 'broadcast_type', 'parameters'
+    )
+    if exclude_id is not None:
+        orders = orders.exclude(id=exclude_id)
+    stations = defaultdict(list)
+    for order_id, client_id, interval, broadcast_type, parameters in orders:
+        stations[str(client_id)].append(OrderLoad(
+            str(order_id),
+            naive(interval.lower),
+            naive(interval.upper),
+            broadcast_type,
+            parameters
+        ))
+    return stations
+
+
+def find_overbooking(segments: list[dict], limit: int) -> list[dict]:
+    """Часы, в которых выходов рекламы больше {limit}."""
+    return [
+        {
+            'lower': f'{segment["lower"]:%Y-%m-%d %H:%M:%S}',
+            'upper': f'{segment["upper"]:%Y-%m-%d %H:%M:%S}',
+            'day': day,
+            'hour': hour,
+            'times_in_hour': count,
+        }
+        for segment in segments
+        for day, load in segment['load'].items()
+        for hour, count in enumerate(load)
+        if count > limit
+    ]
+
+
+def get_order_load(nomenclature, order: OrderLoad,
+                   orders: list[OrderLoad] | None = None) -> list[dict]:
+    """
+    Нагрузка на эфир станции {nomenclature} на время заказа {order}.
+
+    Заказ может быть ещё не сохранён (id=None), тогда он добавляется
+    к сохранённым заказам станции. Все отрезки лежат внутри интервала
+    заказа, поэтому в каждом из них идёт и он сам. Заказы станции
+    {orders} можно передать уже выбранными (см. check_ad_load).
+
+    ScheduleError - в настройках вещания станции ошибка.
+    """
+    if orders is None:
+        orders = get_station_orders(
+            [nomenclature.id], order.lower, order.upper, exclude_id=order.id
+        )[str(nomenclature.id)]
+    return sweep_load(
+        [*orders, order],
+        nomenclature.schedule.days,
+        order.lower,
+        order.upper
+    )
+
+
+def check_ad_load(nomenclatures, order: OrderLoad,
+                  limit: int) -> tuple[dict[str, list[dict]], dict[str, str]]:
+    """
+    Проверка переполнения эфира станций новым заказом {order}.
+
+    1. Заказы всех станций выбираем одним запросом.
+    2. Считаем нагрузку по каждой станции. Станции с ошибкой
+        в настройках вещания проверить нельзя, их собираем отдельно.
+
+    Возвращает переполненные часы по названиям станций (станции
+    без переполнения не попадают в результат) и ошибки настроек
+    по названиям станций.
+    """
+    nomenclatures = list(nomenclatures)
+    # 1
+    station_orders = get_station_orders(
+        [nomenclature.id for nomenclature in nomenclatures],
+        order.lower,
+        order.upper,
+        exclude_id=order.id
+    )
+    # 2
+    overbooked, invalid = {}, {}
+    for nomenclature in nomenclatures:
+        try:
+            segments = get_order_load(
+                nomenclature, order, station_orders[str(nomenclature.id)]
+            )
+        except ScheduleError as error:
+            invalid[nomenclature.name] = str(error)
+            continue
+        hours = find_overbooking(segments, limit)
+        if hours:
+            overbooked[nomenclature.name] = hours
+    return overbooked, invalid
@@ -1,10 +1,12 @@
 from datetime import time, datetime as dt
+from django.conf import settings
 from rest_framework import serializers
 
 from api.constants import Constants
 from files.models import File, Playlist
 from nomenclatures.models import Nomenclature
 from orders.models import AdOrder, BgOrder
+from orders.scheduling import OrderLoad, check_ad_load
 
 
 class DateTimeTZRangeField(serializers.DictField):
@@ -113,7 +115,11 @@ class AdOrderSerializer(serializers.ModelSerializer):
             изымаем (.pop()) из данных, чтобы отбор прошли только необходимые
             для указанного типа заказа.
         3. Валидируем слайды, если они были указаны.
-        4. Если данные проходят валидацию, возвращаем их.
+        4. При создании проверяем, что заказ не переполнит эфир станций
+            сверх AD_HOURLY_LIMIT выходов в час (см. orders.scheduling).
+            Заказы одного запроса проверяются по отдельности. Станции
+            с ошибкой в настройках вещания перечисляем в ошибке.
+        5. Если данные проходят валидацию, возвращаем их.
         """
 
         def _translate_error(err):
@@ -366,6 +372,35 @@ class AdOrderSerializer(serializers.ModelSerializer):
             validate_slides(slides_json, bool(self.instance))
         # 4
         validated_data.update({**data})
+        limit = settings.AD_HOURLY_LIMIT
+        if limit and not self.instance:
+            interval = validated_data['broadcast_interval']
+            overbooked, invalid = check_ad_load(
+                Nomenclature.objects.filter(
+                    id__in=validated_data.get('clients', [])
+                ).only('id', 'name', 'settings'),
+                OrderLoad(
+                    None,
+                    interval.lower,
+                    interval.upper,
+                    brc_type or 0,
+                    validated_data['parameters']
+                ),
+                limit
+            )
+            if invalid:
+                raise serializers.ValidationError({
+                    'settings': invalid,
+                    'detail': 'Нагрузку на эфир не проверить: в настройках '
+                              'вещания станций ошибка.'
+                })
+            if overbooked:
+                raise serializers.ValidationError({
+                    'overbooked': overbooked,
+                    'detail': 'Заказ превысит допустимое количество '
+                              f'выходов рекламы в час ({limit}).'
+                })
+        # 5
         return validated_data
 
     def create(self, validated_data):
@@ -380,7 +415,14 @@ class AdOrderSerializer(serializers.ModelSerializer):
         return saved_orders
 
     def to_representation(self, value):
-        """Десериализация с поддержкой списка объектов."""
+        """
+        Десериализация с поддержкой списка объектов.
+
+        Заказы, созданные одним запросом, ссылаются на один плейлист,
+        поэтому количество файлов считаем один раз на плейлист.
+        """
+        files_counts = {}
+
         def _serialize_order(obj):
             repr_ = super(self.__class__, self).to_representation(obj)
             repr_['owner'] = obj.owner.full_name
@@ -388,10 +430,12 @@ class AdOrderSerializer(serializers.ModelSerializer):
                 'id': obj.client.id,
                 'name': obj.client.name
             }
+            if obj.playlist_id not in files_counts:
+                files_counts[obj.playlist_id] = obj.playlist.files.count()
             repr_['playlist'] = {
                 'id': obj.playlist.id,
                 'name': obj.playlist.name,
-                'files_count': obj.playlist.files.count()
+                'files_count': files_counts[obj.playlist_id]
             }
             repr_['slides'] = obj.slides if obj.slides else None
             repr_['created'] = f'{obj.created:%Y-%m-%d %H:%M:%S}'
@@ -430,7 +474,7 @@ class AdOrderListSerializer(serializers.ModelSerializer):
         repr_['playlist'] = {
             'id': value.playlist.id,
             'name': value.playlist.name,
-            'files_count': value.playlist.files.count()
+            'files_count': value.playlist_files_count
         }
         return repr_
 
@@ -523,7 +567,14 @@ class BgOrderSerializer(serializers.ModelSerializer):
         return saved_orders
 
     def to_representation(self, value):
-        """Десериализация с поддержкой списка объектов."""
+        """
+        Десериализация с поддержкой списка объектов.
+
+        Заказы, созданные одним запросом, ссылаются на один плейлист,
+        поэтому количество файлов считаем один раз на плейлист.
+        """
+        files_counts = {}
+
         def _serialize_order(obj):
             repr_ = super(self.__class__, self).to_representation(obj)
             repr_['owner'] = obj.owner.full_name
@@ -531,10 +582,12 @@ class BgOrderSerializer(serializers.ModelSerializer):
                 'id': obj.client.id,
                 'name': obj.client.name
             }
+            if obj.playlist_id not in files_counts:
+                files_counts[obj.playlist_id] = obj.playlist.files.count()
             repr_['playlist'] = {
                 'id': obj.playlist.id,
                 'name': obj.playlist.name,
-                'files_count': obj.playlist.files.count()
+                'files_count': files_counts[obj.playlist_id]
             }
             repr_['created'] = f'{obj.created:%Y-%m-%d %H:%M:%S}'
             return repr_
@@ -572,6 +625,6 @@ class BgOrderListSerializer(serializers.ModelSerializer):
         repr_['playlist'] = {
             'id': value.playlist.id,
             'name': value.playlist.name,
-            'files_count': value.playlist.files.count()
+            'files_count': value.playlist_files_count
         }
         return repr_
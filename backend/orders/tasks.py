@@ -1,67 +1,98 @@
 from datetime import datetime as dt
+from itertools import chain
 
 from celery import shared_task
 from celery_singleton import Singleton
+from django.db import connection
 
 from api.constants import get_bg_task_type
 from api.logger import setup_logger
 from orders.models import AdOrder, BgOrder
+from orders.on_air import update_on_air
+from orders.payloads import create_order_tasks
+from tasks.delivery import notify_clients
 from tasks.models import Task
 
 ad_logger = setup_logger('ad_orders', 'logs/ad_orders.log')
 bg_logger = setup_logger('bg_orders', 'logs/bg_orders.log')
 
 
-@shared_task(base=Singleton)
-def update_order_status():
+# Переход одного статуса в другой по границе интервала работы заказа.
+# Условие совпадает с частичными индексами BaseOrder.Meta.indexes,
+# поэтому просматриваются только заказы, которые пора перевести.
+ORDER_TRANSITION_SQL = """
+    UPDATE {table}
+    SET status = {to_status}
+    WHERE status = {from_status} AND {bound}(broadcast_interval) <= %(now)s
+    RETURNING id
+"""
+WAITING = 0
+ON_AIR = 1
+COMPLETED = 2
+
+
+def transition_orders(cursor, model, from_status: int, to_status: int,
+                      bound: str, now: dt) -> list:
+    """
+    Перевод заказов {model} из {from_status} в {to_status}, если граница
+    интервала работы {bound} (LOWER или UPPER) уже наступила.
+
+    Возвращает айди переведённых заказов.
     """
-    Обновление статусов доступности номенклатур
-    и запись истории их изменения.
+    cursor.execute(
+        ORDER_TRANSITION_SQL.format(
+            table=model._meta.db_table,
+            from_status=from_status,
+            to_status=to_status,
+            bound=bound
+        ),
+        {'now': now}
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def update_order_statuses(now: dt) -> dict[str, list]:
+    """
+    Перевод заказов по статусам на момент {now}.
+
+    1. Ожидающие эфира заказы, у которых наступило начало интервала,
+        переходят в эфир.
+    2. Заказы в эфире, у которых наступил конец интервала, завершаются.
+        Шаг выполняется после первого, так что заказ, интервал которого
+        целиком прошёл, завершается за один запуск.
+
+    Стоимость пропорциональна количеству переходов, а не истории заказов.
+    Возвращает айди заказов по каждому переходу.
     """
-    waiting_adorders = AdOrder.objects.filter(status=0)
-    waiting_bgorders = BgOrder.objects.filter(status=0)
-    ending_adorders = AdOrder.objects.filter(status=1)
-    ending_bgorders = BgOrder.objects.filter(status=1)
-    adorders_started = []
-    bgorders_started = []
-    adorders_ended = []
-    bgorders_ended = []
-    count = 0
-    ON_AIR = 1
-    COMPLETED = 2
-
-    for order in waiting_adorders:
-        order_start = order.broadcast_interval.lower
-        if order_start <= dt.now():
-            order.status = ON_AIR
-            adorders_started.append(order)
-    count += len(adorders_started)
-    AdOrder.objects.bulk_update(adorders_started, fields=['status'])
-
-    for order in ending_adorders:
-        order_end = order.broadcast_interval.upper
-        if order_end <= dt.now():
-            order.status = COMPLETED
-            adorders_ended.append(order)
-    count += len(adorders_ended)
-    AdOrder.objects.bulk_update(adorders_ended, fields=['status'])
-
-    for order in waiting_bgorders:
-        order_start = order.broadcast_interval.lower
-        if order_start <= dt.now():
-            order.status = ON_AIR
-            bgorders_started.append(order)
-    count += len(bgorders_started)
-    BgOrder.objects.bulk_update(bgorders_started, fields=['status'])
-
-    for order in ending_bgorders:
-        order_end = order.broadcast_interval.upper
-        if order_end <= dt.now():
-            order.status = COMPLETED
-            bgorders_ended.append(order)
-    count += len(bgorders_ended)
-    BgOrder.objects.bulk_update(bgorders_ended, fields=['status'])
+    with connection.cursor() as cursor:
+        return {
+            # 1
+            'adorders_started': transition_orders(
+                cursor, AdOrder, WAITING, ON_AIR, 'LOWER', now
+            ),
+            'bgorders_started': transition_orders(
+                cursor, BgOrder, WAITING, ON_AIR, 'LOWER', now
+            ),
+            # 2
+            'adorders_ended': transition_orders(
+                cursor, AdOrder, ON_AIR, COMPLETED, 'UPPER', now
+            ),
+            'bgorders_ended': transition_orders(
+                cursor, BgOrder, ON_AIR, COMPLETED, 'UPPER', now
+            ),
+        }
 
+
+@shared_task(base=Singleton)
+def update_order_status():
+    """Обновление статусов заказов по интервалам их работы."""
+    changes = update_order_statuses(dt.now())
+    update_on_air(chain.from_iterable(changes.values()))
+    for change, order_ids in changes.items():
+        if order_ids:
+            logger = ad_logger if change.startswith('ad') else bg_logger
+            logger.info(f'{change}: {", ".join(map(str, order_ids))}')
+    count = sum(len(order_ids) for order_ids in changes.values())
     return f"Обновлено {count} статусов заказов."
 
 
@@ -70,46 +101,11 @@ def create_ad_order_task(orders_ids: list):
     """
     Отправка рекламного заказа.
 
-    0. Фильтруем заказы по полученному списку.
-    1. Проходим по получившемуся списку.
-    2. Заполняем список репликаций на отмену, берём нужную инфу с заказа.
-    3. Создаём все репликации одной операцией, фиксируем количество.
+    Репликации собираются в create_order_tasks
+    одной выборкой заказов с плейлистами и файлами.
     """
-    task_list = []
-    AD = 4
-    # 0
-    orders = AdOrder.objects.filter(pk__in=orders_ids)
-    # 1
-    for order in orders:
-        # 2
-        task_list.append(
-            Task(
-                owner=order.owner,
-                client=order.client,
-                type=AD,
-                parameters={
-                    'order_id': str(order.id),
-                    'order_parameters': order.parameters,
-                    'broadcast_type': order.broadcast_type,
-                    'broadcast_interval': f'{order.broadcast_interval.lower}-'
-                                          f'{order.broadcast_interval.upper}',
-                    'playlist': {
-                        'id': str(order.playlist.id),
-                        'files': [
-                            {
-                                'id': str(file.id),
-                                'hash': file.hash
-                            } for file in order.playlist.files.all()
-                        ],
-                        'slides': order.slides if order.slides else None
-                    }
-                }
-            )
-        )
-    # 3
-    Task.objects.bulk_create(task_list)
-    result = f'Отправленно заказов: {len(task_list)}.'
-    return result
+    count = create_order_tasks(AdOrder.objects.filter(pk__in=orders_ids))
+    return f'Отправленно заказов: {count}.'
 
 
 @shared_task
@@ -151,6 +147,7 @@ def update_ad_order_task(
         )
     # 2
     Task.objects.bulk_create(task_list)
+    notify_clients({task.client_id for task in task_list})
     # 3
     return f'Обновлено заказов: {len(task_list)}'
 
@@ -176,9 +173,11 @@ def cancel_ad_order_task(order_id: str):
         type=CANCEL_AD,
         parameters={'order_id': order_id}
     )
+    notify_clients([order.client_id])
     # 2
     order.status = CANCEL
     order.save(update_fields=['status'])
+    update_on_air([order_id])
     # 3
     return f'Отменён заказ: {order_id}.'
 
@@ -188,51 +187,11 @@ def create_bg_order_task(orders_ids: list):
     """
     Отправка фонового заказа.
 
-    0. Фильтруем заказы по полученному списку.
-    1. Проходим по получившемуся списку.
-    2. Заполняем список репликаций на отмену, берём нужную инфу с заказа.
-    3. Создаём все репликации одной операцией, фиксируем количество.
+    Репликации собираются в create_order_tasks
+    одной выборкой заказов с плейлистами и файлами.
     """
-    # 0
-    orders = BgOrder.objects.filter(pk__in=orders_ids)
-    task_list = []
-    # 1
-    for order in orders:
-        # 2
-        task_list.append(
-            Task(
-                owner=order.owner,
-                client=order.client,
-                type=order.order_type,
-                parameters={
-                    'order_id': str(order.id),
-                    'type': order.order_type,
-                    'broadcast_interval': f'{order.broadcast_interval.lower}-'
-                                          f'{order.broadcast_interval.upper}',
-                    'playlist': {
-                        'id': str(order.playlist.id),
-                        # TODO протестировать разницу по времени выполнения
-                        # 100+ заказов в текущем исполнении и в таком:
-                        # 'files': list(
-                        #     map(lambda f: {'id': str(f.id), 'hash': f.hash},
-                        #         order.playlist.files.all())
-                        # )
-                        # сейчас каждый файл плейлиста индивидуально приводится к типу,
-                        # а во втором варианте файлы обрабатываются сразу скопом
-                        'files': [
-                            {
-                                'id': str(file.id),
-                                'hash': file.hash
-                            } for file in order.playlist.files.all()
-                        ]
-                    }
-                }
-            )
-        )
-    # 3
-    Task.objects.bulk_create(task_list)
-    result = f'Создано заказов: {len(task_list)}.'
-    return result
+    count = create_order_tasks(BgOrder.objects.filter(pk__in=orders_ids))
+    return f'Создано заказов: {count}.'
 
 
 @shared_task
@@ -277,6 +236,7 @@ def update_bg_order_task(
         )
     # 3
     Task.objects.bulk_create(task_list)
+    notify_clients({task.client_id for task in task_list})
     # 4
     return f'Репликаций создано: {len(task_list)}'
 
@@ -298,15 +258,17 @@ def cancel_bg_order_task(order_id: str):
     # 1
     task_type = get_bg_task_type(order.order_type, action='cancel')
     # 2
-    Task.objects.bulk_create(
+    Task.objects.create(
         owner=order.owner,
         client=order.client,
         type=task_type,
         parameters={'order_id': order_id}
     )
+    notify_clients([order.client_id])
     # 3
     order.status = CANCEL
     order.save(update_fields=['status'])
+    update_on_air([order_id])
     # 4
     result = f'Отменено заказов: {order_id}.'
     return result
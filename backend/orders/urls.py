@@ -1,7 +1,7 @@
 from django.urls import include, path
 from rest_framework.routers import SimpleRouter
 
-from orders.views import AdOrderViewSet, BgOrderViewSet
+from orders.views import AdOrderViewSet, BgOrderViewSet, OnAirViewSet
 
 router = SimpleRouter()
 
@@ -15,6 +15,11 @@ router.register(
     BgOrderViewSet,
     basename='bgorders'
 )
+router.register(
+    'on_air',
+    OnAirViewSet,
+    basename='on_air'
+)
 
 urlpatterns = [
     path('', include(router.urls))
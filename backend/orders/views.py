@@ -1,10 +1,15 @@
+from django.conf import settings
+from django.db.models import Count
+from django.utils.http import parse_etags
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets, mixins
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from rest_framework.status import HTTP_200_OK
+from rest_framework.status import HTTP_200_OK, HTTP_304_NOT_MODIFIED
 
-from api.constants import restricted_update
+from api.constants import restricted_update, validate_uuid
+from nomenclatures.schedule import ScheduleError
 from orders.filters import AdOrderFilter, BgOrderFilter
 from orders.serializers import (
     AdOrderSerializer,
@@ -13,6 +18,13 @@ from orders.serializers import (
     BgOrderListSerializer
 )
 from orders.models import AdOrder, BgOrder
+from orders.on_air import get_on_air, group_by_client, update_on_air
+from orders.scheduling import (
+    OrderLoad,
+    find_overbooking,
+    get_order_load,
+    naive
+)
 from orders.tasks import (
     create_ad_order_task,
     cancel_ad_order_task,
@@ -29,6 +41,16 @@ class NoDeleteViewSet(mixins.CreateModelMixin,
                       viewsets.GenericViewSet):
     """Вьюсет без поддержки метода DELETE."""
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            # Количество файлов в плейлисте считаем в том же запросе,
+            # а не отдельным COUNT на каждый заказ
+            queryset = queryset.annotate(
+                playlist_files_count=Count('playlist__files', distinct=True)
+            )
+        return queryset
+
 
 class AdOrderViewSet(NoDeleteViewSet):
     """Работа с рекламными заказами."""
@@ -39,6 +61,7 @@ class AdOrderViewSet(NoDeleteViewSet):
     filter_backends = [DjangoFilterBackend]
     filterset_class = AdOrderFilter
     permission_classes = [StaffCUDAuthRetrieve]
+    keyset_pagination = True
 
     def perform_create(self, serializer):
         """
@@ -77,6 +100,8 @@ class AdOrderViewSet(NoDeleteViewSet):
         kwargs.update(updatable_fields=updatable_fields,
                       error_message=error_message)
         response = restricted_update(self, request, *args, **kwargs)
+        if response.status_code == HTTP_200_OK:
+            update_on_air([kwargs['pk']])
         return response
 
     @action(detail=True, methods=['DELETE'])
@@ -86,6 +111,48 @@ class AdOrderViewSet(NoDeleteViewSet):
         result_text = f'Запрос на отмену заказа принят.'
         return Response(data=result_text, status=HTTP_200_OK)
 
+    @action(detail=True, methods=['GET'])
+    def load(self, request, pk):
+        """
+        Нагрузка на эфир станции на время заказа.
+
+        Выходы рекламы в час по отрезкам интервала вещания и дням недели,
+        часы сверх AD_HOURLY_LIMIT отдельно в overbooked. Если в настройках
+        вещания станции ошибка - 400 с названием станции.
+        """
+        order = self.get_object()
+        try:
+            segments = get_order_load(
+                order.client,
+                OrderLoad(
+                    str(order.id),
+                    naive(order.broadcast_interval.lower),
+                    naive(order.broadcast_interval.upper),
+                    order.broadcast_type,
+                    order.parameters
+                )
+            )
+        except ScheduleError as error:
+            raise ValidationError({
+                'settings': {order.client.name: str(error)},
+                'detail': 'Нагрузку на эфир не посчитать: в настройках '
+                          'вещания станции ошибка.'
+            })
+        limit = settings.AD_HOURLY_LIMIT
+        data = {
+            'limit': limit or None,
+            'segments': [
+                {
+                    **segment,
+                    'lower': f'{segment["lower"]:%Y-%m-%d %H:%M:%S}',
+                    'upper': f'{segment["upper"]:%Y-%m-%d %H:%M:%S}',
+                }
+                for segment in segments
+            ],
+            'overbooked': find_overbooking(segments, limit) if limit else [],
+        }
+        return Response(data=data, status=HTTP_200_OK)
+
     def get_serializer(self, *args, **kwargs):
         if self.action == 'list':
             serializer = AdOrderListSerializer
@@ -109,6 +176,7 @@ class BgOrderViewSet(NoDeleteViewSet):
     filter_backends = [DjangoFilterBackend]
     filterset_class = BgOrderFilter
     permission_classes = [StaffCUDAuthRetrieve]
+    keyset_pagination = True
 
     def perform_create(self, serializer):
         """
@@ -146,6 +214,8 @@ class BgOrderViewSet(NoDeleteViewSet):
         kwargs.update(updatable_fields=updatable_fields,
                       error_message=error_message)
         response = restricted_update(self, request, *args, **kwargs)
+        if response.status_code == HTTP_200_OK:
+            update_on_air([kwargs['pk']])
         return response
 
     @action(detail=True, methods=['DELETE'])
@@ -167,3 +237,34 @@ class BgOrderViewSet(NoDeleteViewSet):
                 kwargs['many'] = True
 
         return serializer(*args, **kwargs)
+
+
+class OnAirViewSet(viewsets.ViewSet):
+    """
+    Что сейчас в эфире: станции и их идущие заказы с плейлистами.
+
+    Матрица держится в кеше и обновляется точечно при смене статусов
+    заказов, их изменении и отмене (см. orders.on_air). Ответ отдаётся
+    с ETag, на запрос с совпадающим If-None-Match отвечаем 304 без тела.
+    Параметр client оставляет в ответе одну станцию.
+    """
+
+    permission_classes = [StaffCUDAuthRetrieve]
+
+    def list(self, request):
+        matrix = get_on_air()
+        etag = f'"{matrix["generation"]}"'
+        if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+        if etag in if_none_match or '*' in if_none_match:
+            return Response(
+                status=HTTP_304_NOT_MODIFIED,
+                headers={'ETag': etag}
+            )
+        client_id = request.query_params.get('client')
+        if client_id is not None:
+            validate_uuid(client_id)
+        return Response(
+            {'clients': group_by_client(matrix['orders'], client_id)},
+            status=HTTP_200_OK,
+            headers={'ETag': etag}
+        )
@@ -13,4 +13,15 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'rmc_rest_api.settings')
 
-application = get_asgi_application()
+django_asgi_app = get_asgi_application()
+
+# импорты после инициализации джанги, иначе модели не загрузятся
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+
+from nomenclatures.long_poll import LongPollMiddleware  # noqa: E402
+from nomenclatures.routing import websocket_urlpatterns  # noqa: E402
+
+application = ProtocolTypeRouter({
+    'http': LongPollMiddleware(django_asgi_app),
+    'websocket': URLRouter(websocket_urlpatterns),
+})
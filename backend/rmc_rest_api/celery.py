@@ -20,5 +20,9 @@ app.conf.beat_schedule = {
     'update_order_statuses_30_sec': {
             'task': 'orders.tasks.update_order_status',
             'schedule': 30.0,
-        }
+        },
+    'flush_statistic': {
+        'task': 'ch_statistic.tasks.flush_statistic',
+        'schedule': float(settings.STATISTIC_FLUSH_INTERVAL),
+    }
 }
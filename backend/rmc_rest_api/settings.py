@@ -70,6 +70,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'rmc_rest_api.wsgi.application'
+ASGI_APPLICATION = 'rmc_rest_api.asgi.application'
 
 DATABASES = {
     'default': {
@@ -87,8 +88,17 @@ DATABASES = {
         'USER': os.environ.get('CLICKHOUSE_USER'),
         'PORT': os.environ.get('CLICKHOUSE_PORT'),
         'PASSWORD': os.environ.get('CLICKHOUSE_PASSWORD'),
+        'OPTIONS': {
+            'settings': {
+                # повторно вставленный блок статистики отбрасывается
+                # и в срезах тоже (см. ch_statistic.buffer)
+                'deduplicate_blocks_in_dependent_materialized_views': 1,
+            },
+        },
     }
 }
+# HTTP интерфейс кликхауса, через него идут выгрузки статистики
+CLICKHOUSE_HTTP_PORT = int(os.environ.get('CLICKHOUSE_HTTP_PORT', 8123))
 
 DATABASE_ROUTERS = ['rmc_rest_api.dbrouters.ClickHouseRouter']
 
@@ -135,6 +145,10 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 25,
 }
 
+# сколько выходов рекламы в час выдерживает эфир станции. Новые рекламные
+# заказы сверх лимита отклоняются (см. orders.scheduling), 0 - без проверки
+AD_HOURLY_LIMIT = int(os.environ.get('AD_HOURLY_LIMIT', 0))
+
 # ---------------------------------- MINIO ---------------------------------- #
 
 MINIO_REGION = os.environ.get('MINIO_REGION')
@@ -150,6 +164,11 @@ MINIO_PRIVATE_BUCKETS = [
 ]
 MINIO_MEDIA_FILES_BUCKET = 'local-media'
 MINIO_STATIC_FILES_BUCKET = 'local-static'
+# загруженные файлы сохраняются сразу, а хеши, продолжительность
+# и проверка дубликатов считаются в целери (см. files.tasks)
+FILE_PROCESSING_ASYNC = os.environ.get(
+    'FILE_PROCESSING_ASYNC', 'false'
+).lower() == 'true'
 STORAGES = {
     'default': {
         'BACKEND': 'django_minio_backend.models.MinioBackend'
@@ -166,6 +185,47 @@ CELERY_RESULT_BACKEND = os.environ.get('CELERY_BACKEND')
 CELERY_SINGLETON_BACKEND_URL = CELERY_RESULT_BACKEND
 CELERY_TIMEZONE = TIME_ZONE
 
+# --------------------------------- REDIS ----------------------------------- #
+
+REDIS_URL = os.environ.get('REDIS_URL')
+
+# без редиса long-poll и push-доставка репликаций просто отключаются
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels_redis.core.RedisChannelLayer',
+        'CONFIG': {
+            'hosts': [REDIS_URL],
+        },
+    },
+} if REDIS_URL else {}
+
+# общий для всех процессов кеш (счётчики пагинации, матрица эфира).
+# Без редиса - кеш в памяти процесса
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    },
+} if REDIS_URL else {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+# время последнего ответа станций копится в редисе и пишется в базу
+# одним запросом перед каждым пересчётом статусов доступности
+HEARTBEAT_WRITE_BEHIND = bool(REDIS_URL) and os.environ.get(
+    'HEARTBEAT_WRITE_BEHIND', 'false'
+).lower() == 'true'
+
+# статистика станций копится в редисе и пишется в кликхаус крупными
+# пачками: по расписанию или при достижении размера буфера
+STATISTIC_BUFFER = bool(REDIS_URL) and os.environ.get(
+    'STATISTIC_BUFFER', 'false'
+).lower() == 'true'
+STATISTIC_FLUSH_INTERVAL = 10
+STATISTIC_FLUSH_SIZE = 50000
+
 # -------------------------------- SECURITY --------------------------------- #
 
 CORS_ALLOW_ALL_ORIGINS = DEBUG
@@ -19,6 +19,7 @@ urlpatterns = [
     path('api/', include('files.urls')),
     path('api/', include('orders.urls')),
     path('api/', include('tasks.urls')),
+    path('api/', include('ch_statistic.urls')),
     path('auth/', include('djoser.urls')),
     path('auth/', include('djoser.urls.jwt')),
     path('auth/logout/', logout, name='logout'),
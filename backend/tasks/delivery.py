@@ -0,0 +1,113 @@
+import asyncio
+import math
+
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.db.models import F
+from rest_framework.exceptions import ValidationError
+
+from tasks.models import Task
+
+# Сколько максимум можно держать запрос рабочей станции, в секундах.
+# Должно быть заметно меньше proxy_read_timeout nginx (60 секунд)
+MAX_WAIT = 30
+PENDING_TASKS_EVENT = 'pending_tasks.created'
+
+
+def get_group_name(client_id) -> str:
+    """Группа слоя каналов, в которой ждёт репликации рабочая станция."""
+    return f'pending_tasks_{client_id}'
+
+
+def get_pending_tasks(client_id) -> list[dict]:
+    """Ожидающие репликации рабочей станции в формате ответа клиенту."""
+    pending_tasks = Task.objects.filter(
+        client=client_id,
+        status=0
+    ).values(
+        'parameters',
+        task_id=F('id'),
+        task_type=F('type')
+    )
+    return list(pending_tasks)
+
+
+def notify_clients(client_ids) -> None:
+    """
+    Оповещение рабочих станций о новых репликациях.
+
+    Сообщение уходит только в группы затронутых станций и только после
+    коммита транзакции, в которой репликации были созданы, чтобы
+    проснувшийся клиент гарантированно их увидел.
+    Если слой каналов не настроен, ничего не делаем.
+    """
+    groups = {get_group_name(client_id) for client_id in client_ids}
+    if not groups:
+        return
+
+    async def _send(channel_layer):
+        await asyncio.gather(*[
+            channel_layer.group_send(group, {'type': PENDING_TASKS_EVENT})
+            for group in groups
+        ])
+
+    def _on_commit():
+        channel_layer = get_channel_layer()
+        if channel_layer is not None:
+            async_to_sync(_send)(channel_layer)
+
+    transaction.on_commit(_on_commit)
+
+
+def parse_wait(value: str) -> float:
+    """Время ожидания long-poll из параметра wait, в секундах."""
+    try:
+        timeout = float(value)
+    except ValueError:
+        timeout = math.nan
+    # nan и inf float() пропускает
+    if not math.isfinite(timeout):
+        raise ValidationError('Время ожидания должно быть числом.')
+    return timeout
+
+
+async def wait_for_tasks(client_id, timeout: float) -> bool:
+    """
+    Ожидание новых репликаций для long-poll запроса.
+
+    Ждёт в цикле событий ASGI сервера (см. nomenclatures.long_poll),
+    поток при этом не занимается, поэтому ожидающих запросов может быть
+    сколько угодно. Если слой каналов не настроен, отвечаем сразу.
+    1. Подписываемся на группу рабочей станции.
+    2. Уже после подписки проверяем, не появились ли репликации, чтобы
+        не пропустить созданные между ответом клиенту и подпиской.
+    3. Ждём сообщения, но не дольше {timeout} (и не дольше MAX_WAIT).
+    4. Отписываемся в любом случае.
+
+    Возвращает True, если репликации появились.
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is None or timeout <= 0:
+        return False
+    group = get_group_name(client_id)
+    has_pending = Task.objects.filter(client=client_id, status=0).exists
+    channel = await channel_layer.new_channel()
+    # 1
+    await channel_layer.group_add(group, channel)
+    try:
+        # 2
+        if await database_sync_to_async(has_pending)():
+            return True
+        # 3
+        await asyncio.wait_for(
+            channel_layer.receive(channel),
+            min(timeout, MAX_WAIT)
+        )
+        return True
+    except asyncio.TimeoutError:
+        return False
+    finally:
+        # 4
+        await channel_layer.group_discard(group, channel)
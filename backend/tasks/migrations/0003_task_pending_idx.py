@@ -0,0 +1,17 @@
+# Generated by Django 5.0.3 on 2026-10-18 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('status', 0)), fields=['client'], name='task_pending_idx'),
+        ),
+    ]
@@ -4,7 +4,9 @@ from django.db.models import (
     ForeignKey,
     JSONField,
     Model,
-    PositiveSmallIntegerField
+    Index,
+    PositiveSmallIntegerField,
+    Q
 )
 
 from api import UUIDPKField
@@ -95,6 +97,14 @@ class Task(Model):
         ordering = ('-created',)
         verbose_name = 'Репликация'
         verbose_name_plural = 'Репликации'
+        indexes = [
+            # ожидающие репликации станции запрашиваются при каждом опросе
+            Index(
+                fields=['client'],
+                condition=Q(status=0),
+                name='task_pending_idx'
+            )
+        ]
 
     def __str__(self):
         return TASK_TYPES[int(self.type)]
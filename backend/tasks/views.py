@@ -2,6 +2,7 @@ from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets, mixins
 from rest_framework.response import Response
 
+from tasks.delivery import notify_clients
 from tasks.filters import TaskFilter
 from tasks.serializers import TaskSerializer, TaskListSerializer
 from tasks.models import Task, STATUSES
@@ -27,9 +28,14 @@ class TaskViewSet(
     filter_backends = [DjangoFilterBackend]
     filterset_class = TaskFilter
     permission_classes = [OnlyStaffCRUD]
+    keyset_pagination = True
 
     def perform_create(self, serializer):
-        serializer.save(owner=self.request.user)
+        instance = serializer.save(owner=self.request.user)
+        if isinstance(instance, list):
+            notify_clients({task.client_id for task in instance})
+        else:
+            notify_clients([instance.client_id])
 
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
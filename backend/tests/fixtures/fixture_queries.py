@@ -0,0 +1,95 @@
+from http import HTTPStatus
+
+import pytest
+
+
+@pytest.fixture
+def clone_objects():
+    """
+    Копии объекта {instance} в базе, count штук.
+
+    Копируются все поля, кроме первичного ключа, {overrides} заменяют
+    отдельные поля копий.
+    """
+    def _clone(instance, count: int = 1, **overrides) -> list:
+        model = type(instance)
+        data = {
+            field.attname: getattr(instance, field.attname)
+            for field in model._meta.concrete_fields
+            if not field.primary_key
+        }
+        return model.objects.bulk_create([
+            model(**{**data, **overrides}) for _ in range(count)
+        ])
+    return _clone
+
+
+@pytest.fixture
+def assert_constant_queries():
+    """
+    Проверка, что количество запросов не растёт с объёмом данных.
+
+    Для каждого размера из {sizes} вызывается prepare(size) (подготовка
+    данных, не считается), затем считаются запросы action(size).
+    Возвращает результаты action по размерам.
+    """
+    def _assert(action, sizes: tuple[int, int], prepare=None,
+                message: str = 'Количество запросов растёт с объёмом данных'):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        queries = []
+        results = []
+        for size in sizes:
+            if prepare is not None:
+                prepare(size)
+            with CaptureQueriesContext(connection) as context:
+                results.append(action(size))
+            queries.append(len(context.captured_queries))
+        assert queries[0] == queries[1], (
+            f'{message}: {queries[0]} != {queries[1]}.'
+        )
+        return results
+    return _assert
+
+
+@pytest.fixture
+def assert_constant_page_queries(assert_constant_queries):
+    """
+    Проверка, что количество запросов на страницу списка {url}
+    не зависит от её размера. Возвращает ответ на последнюю страницу.
+    """
+    def _assert(client, url: str, limits: tuple[int, int]):
+        def get_page(limit):
+            response = client.get(f'{url}?limit={limit}')
+            assert response.status_code == HTTPStatus.OK, (
+                f'Код статуса в ответе != 200. Страница {url}.'
+            )
+            return response
+
+        return assert_constant_queries(
+            get_page,
+            limits,
+            message=f'Количество запросов к {url} растёт с размером страницы'
+        )[-1]
+    return _assert
+
+
+@pytest.fixture
+def assert_index_used():
+    """
+    Проверка, что план запроса {queryset} использует индекс {index}.
+
+    В тестовой базе всего несколько строк, и планировщик выбрал бы
+    последовательное чтение, поэтому до конца теста оно отключается.
+    """
+    def _assert(queryset, index: str):
+        from django.db import connection
+
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = queryset.explain()
+        assert index in plan, (
+            f'Запрос не использует индекс {index}.\nПлан: {plan}'
+        )
+    return _assert
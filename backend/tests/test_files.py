@@ -15,6 +15,8 @@ class TestFiles:
     file_detail_url = '/api/files/{file_id}/'
     file_add_tags = '/api/files/{file_id}/add_tags/'
     file_remove_tags = '/api/files/{file_id}/remove_tags/'
+    file_status_url = '/api/files/{file_id}/status/'
+    file_check_url = '/api/files/check/'
     playlists_url = '/api/playlists/'
     playlist_detail_url = '/api/playlists/{playlist_id}/'
     playlist_add_files_url = '/api/playlists/{playlist_id}/add_files/'
@@ -262,6 +264,61 @@ class TestFiles:
                 'датой создания файла в базе'
             )
 
+    def test_get_file_status(self, user_client, anon_client, file_1):
+        url = self.file_status_url.format(file_id=file_1.id)
+        response = anon_client.get(url)
+        assert response.status_code == HTTPStatus.UNAUTHORIZED, (
+            'Не авторизованный пользователь видит статус обработки файла.'
+        )
+        response = user_client.get(url)
+        response_data = response.json()
+        assert response.status_code == HTTPStatus.OK, (
+            f'Не удалось получить статус обработки файла.\n'
+            f'Ответ: {response_data}'
+        )
+        assert response_data['status'] == 'Готов', (
+            'Загруженный синхронно файл не помечен готовым.'
+        )
+        assert response_data['hash'] == file_1.hash, (
+            'Хэш файла в ответе не совпадает с хэшем файла в базе'
+        )
+
+    def test_check_file(self, user_client, file_1):
+        data = {'hash': file_1.hash, 'size': file_1.size}
+        response = user_client.post(self.file_check_url, data=data, format='json')
+        response_data = response.json()
+        assert response.status_code == HTTPStatus.OK, (
+            f'Не удалось проверить наличие файла.\nОтвет: {response_data}'
+        )
+        assert response_data['exists'] is True, (
+            'Загруженный файл не найден по хешу.'
+        )
+        assert response_data['id'] == str(file_1.id), (
+            'Айди найденного файла не совпадает с айди файла в базе'
+        )
+        data = {
+            'md5hash': file_1.md5hash,
+            'sha256hash': file_1.sha256hash,
+            'size': file_1.size
+        }
+        response = user_client.post(self.file_check_url, data=data, format='json')
+        assert response.json()['id'] == str(file_1.id), (
+            'Файл не найден по отдельным md5 и sha256 хешам.'
+        )
+        data = {'hash': file_1.hash, 'size': file_1.size + 1}
+        response = user_client.post(self.file_check_url, data=data, format='json')
+        assert response.json()['exists'] is False, (
+            'Найден файл с тем же хешем, но другим размером.'
+        )
+        response = user_client.post(
+            self.file_check_url,
+            data={'md5hash': file_1.md5hash, 'size': file_1.size},
+            format='json'
+        )
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            'Проверка прошла без полного хеша файла.'
+        )
+
     def test_get_playlist_list_auth(
         self,
         admin_client,
@@ -1109,6 +1166,27 @@ class TestFiles:
                 f'Код статуса в ответе != 400.\nДанные: {data}.\nОтвет: {response.json()}'
             )
 
+    def test_add_not_ready_files_playlist(
+        self,
+        admin_client,
+        playlist_1,
+        file_5
+    ):
+        url = self.playlist_add_files_url.format(playlist_id=playlist_1.id)
+        for status in (0, 2):
+            File.objects.filter(id=file_5.id).update(status=status)
+            response = admin_client.post(
+                url,
+                data={'files': [str(file_5.id)]},
+                format='json'
+            )
+            assert response.status_code == HTTPStatus.BAD_REQUEST, (
+                f'В плейлист добавлен файл в статусе {status}.'
+            )
+        assert not playlist_1.files.filter(id=file_5.id).exists(), (
+            'Необработанный файл попал в плейлист.'
+        )
+
     def test_valid_remove_files_playlist_admin(
         self,
         admin_client,
@@ -1816,3 +1894,356 @@ class TestMockCeleryTasks:
         )
         check_task_type = get_bg_task_type(bgorder.order_type, 'update')
         assert task.type == check_task_type, 'Репликация имеет не правильный тип'
+
+
+@pytest.mark.django_db
+class TestListQueries:
+    """Количество запросов на страницу списка не зависит от её размера."""
+
+    def test_file_list_queries(
+        self,
+        admin_client,
+        file_1,
+        file_2,
+        file_3,
+        assert_constant_page_queries
+    ):
+        response = assert_constant_page_queries(
+            admin_client,
+            TestFiles.files_url,
+            (1, 3)
+        )
+        files_tags = {
+            file['id']: file['tags'] for file in response.json()['results']
+        }
+        assert sorted(files_tags[str(file_1.id)]) == ['ololo', 'test'], (
+            'Неверные теги файла.'
+        )
+        assert files_tags[str(file_2.id)] is None, (
+            'У файла без тегов должно возвращаться None.'
+        )
+
+    def test_playlist_list_queries(
+        self,
+        admin_client,
+        playlist_1,
+        playlist_2,
+        playlist_3,
+        playlist_5,
+        assert_constant_page_queries
+    ):
+        response = assert_constant_page_queries(
+            admin_client,
+            TestFiles.playlists_url,
+            (1, 4)
+        )
+        files_counts = {
+            playlist['id']: playlist['files_count']
+            for playlist in response.json()['results']
+        }
+        assert files_counts[str(playlist_5.id)] == 2, (
+            'Неверное количество файлов в плейлисте.'
+        )
+
+    def test_name_filter_indexes(self, file_1, playlist_1, assert_index_used):
+        assert_index_used(
+            File.objects.filter(name__icontains='test'),
+            'file_name_trgm_idx'
+        )
+        assert_index_used(
+            Playlist.objects.filter(name__icontains='test'),
+            'playlist_name_trgm_idx'
+        )
+
+
+class TestFileInfo:
+
+    def test_get_info_single_pass(self):
+        import hashlib
+        from io import BytesIO
+        from django.core.files.base import ContentFile
+        from files.file_info import FILE_INFO_CHUNK_SIZE, GetFileInfo
+
+        content = b'0123456789' * FILE_INFO_CHUNK_SIZE
+        expected = {
+            'md5hash': hashlib.md5(content).hexdigest(),
+            'sha256hash': hashlib.sha256(content).hexdigest(),
+            'size': len(content),
+        }
+        file = ContentFile(content, name='test.txt')
+        assert GetFileInfo.get_info(file, probe=False) == {
+            **expected,
+            'length': None,
+        }, 'Информация о файле не совпадает с посчитанной по содержимому.'
+        assert file.tell() == 0, 'Курсор файла не вернулся в начало.'
+        sink = BytesIO()
+        assert GetFileInfo.hash_chunks(
+            [content[:7], content[7:]], sink=sink
+        ) == expected, 'Хеши зависят от разбиения файла на отрезки.'
+        assert sink.getvalue() == content, (
+            'Отрезки файла не дошли до приёмника целиком.'
+        )
+
+
+@pytest.mark.django_db
+class TestFileProcessing:
+    """Обработка файлов в целери (FILE_PROCESSING_ASYNC)."""
+
+    files_url = '/api/files/'
+    file_status_url = '/api/files/{file_id}/status/'
+    file_process_url = '/api/files/{file_id}/process/'
+
+    @staticmethod
+    def get_ticker_data() -> dict:
+        with open('/app/tests/fixtures/test_ticker.txt', 'r') as file:
+            source = 'data:processing.txt;base64,' + file.read()
+        return {'source': source, 'type': 3, 'tags': []}
+
+    @staticmethod
+    def process(file_id) -> int:
+        """Этапы обработки по очереди, как их запускает chain."""
+        from files.tasks import compute_file_info, finish_file_processing
+
+        return finish_file_processing(compute_file_info(str(file_id)))
+
+    def test_async_processing(self, admin_client, settings):
+        from api.constants import get_minio_client
+
+        settings.FILE_PROCESSING_ASYNC = True
+        # вне транзакционного теста on_commit не срабатывает,
+        # поэтому задачи запускаем вручную
+        response = admin_client.post(
+            self.files_url, data=self.get_ticker_data(), format='json'
+        )
+        assert response.status_code == HTTPStatus.ACCEPTED, (
+            'Файл на асинхронную обработку должен приниматься с кодом 202.'
+        )
+        file = File.objects.get(id=response.json()['id'])
+        assert file.status == 0, 'Новый файл не ожидает обработки.'
+        assert self.process(file.id) == 1, 'Файл не прошёл обработку.'
+        file.refresh_from_db()
+        assert file.hash and file.size, 'Информация о файле не записана.'
+        response = admin_client.get(
+            self.file_status_url.format(file_id=file.id)
+        )
+        assert response.json()['status'] == 'Готов', (
+            'Обработанный файл не помечен готовым.'
+        )
+        # тот же файл загружен повторно
+        response = admin_client.post(
+            self.files_url, data=self.get_ticker_data(), format='json'
+        )
+        duplicate = File.objects.get(id=response.json()['id'])
+        assert self.process(duplicate.id) == 2, (
+            'Дубликат файла прошёл обработку.'
+        )
+        duplicate.refresh_from_db()
+        assert str(file.id) in duplicate.processing_error, (
+            'В ошибке обработки нет ссылки на существующий файл.'
+        )
+        get_minio_client().stat_object(
+            settings.MINIO_MEDIA_FILES_BUCKET,
+            duplicate.source.name
+        )
+        response = admin_client.post(
+            self.file_process_url.format(file_id=duplicate.id)
+        )
+        assert response.status_code == HTTPStatus.ACCEPTED, (
+            'Файл с ошибкой не отправлен на повторную обработку.'
+        )
+        duplicate.refresh_from_db()
+        assert duplicate.status == 0 and not duplicate.processing_error, (
+            'Статус файла не сброшен перед повторной обработкой.'
+        )
+        response = admin_client.post(
+            self.file_process_url.format(file_id=file.id)
+        )
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            'Готовый файл не должен обрабатываться повторно.'
+        )
+
+
+class TestPresignedUrls:
+
+    @pytest.fixture(autouse=True)
+    def clear_cache(self):
+        from api.constants import _presigned_urls
+
+        _presigned_urls.clear()
+        yield
+        _presigned_urls.clear()
+
+    def test_minio_client_is_shared(self):
+        from api.constants import get_minio_client
+
+        assert get_minio_client() is get_minio_client(False), (
+            'Вызов без аргумента и с external=False создали разные клиенты.'
+        )
+        assert get_minio_client(external=True) is get_minio_client(1), (
+            'Внешний клиент не переиспользуется.'
+        )
+        assert get_minio_client() is not get_minio_client(True), (
+            'Внешний и внутренний клиенты должны различаться.'
+        )
+
+    def test_cached_url(self):
+        from datetime import datetime
+        from api.constants import _presigned_urls, get_presigned_url
+
+        url = get_presigned_url('local-media', 'music/test.mp3')
+        assert 'X-Amz-Signature' in url, 'Ссылка на скачивание не подписана.'
+        assert get_presigned_url('local-media', 'music/test.mp3') is url, (
+            'Повторный запрос ссылки не взят из кеша.'
+        )
+        assert get_presigned_url('local-media', 'music/other.mp3') != url, (
+            'Разные объекты получили одну ссылку.'
+        )
+        # срок хранения в кеше истёк
+        key = ('local-media', 'music/test.mp3')
+        _presigned_urls[key] = ('expired', datetime.now())
+        assert get_presigned_url(*key) != 'expired', (
+            'Просроченная ссылка отдана из кеша.'
+        )
+        assert _presigned_urls[key][1] > datetime.now(), (
+            'Новая ссылка не сохранена в кеш.'
+        )
+
+    def test_cache_is_bounded(self):
+        from datetime import datetime, timedelta
+        from api.constants import (
+            PRESIGNED_URL_CACHE_SIZE,
+            _presigned_urls,
+            get_presigned_url
+        )
+
+        expires = datetime.now() + timedelta(hours=1)
+        _presigned_urls.update(
+            {('local-media', str(index)): ('url', expires)
+             for index in range(PRESIGNED_URL_CACHE_SIZE)}
+        )
+        get_presigned_url('local-media', 'music/test.mp3')
+        assert list(_presigned_urls) == [('local-media', 'music/test.mp3')], (
+            'Переполненный кеш ссылок не очищен.'
+        )
+
+
+@pytest.mark.django_db
+class TestFileUploads:
+
+    uploads_url = '/api/file_uploads/'
+
+    def test_start_upload_invalid(self, user_client, anon_client):
+        data = {'name': 'test.txt', 'type': 0, 'size': 1024}
+        response = anon_client.post(self.uploads_url, data=data, format='json')
+        assert response.status_code == HTTPStatus.UNAUTHORIZED, (
+            'Не авторизованный пользователь может начать загрузку.'
+        )
+        response = user_client.post(self.uploads_url, data=data, format='json')
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            'Удалось начать загрузку файла с неподходящим расширением.'
+        )
+        for url in ('parts/', 'complete/', 'abort/'):
+            response = user_client.post(
+                f'{self.uploads_url}{url}',
+                data={'upload_token': 'invalid'},
+                format='json'
+            )
+            assert response.status_code == HTTPStatus.BAD_REQUEST, (
+                f'Неверный токен загрузки принят на {url}.'
+            )
+
+    def test_upload_file(self, user_client, settings):
+        from uuid import uuid4
+        from django.core import signing
+        from api.constants import get_minio_client
+        from files.uploads import UPLOAD_TOKEN_SALT
+
+        settings.FILE_PROCESSING_ASYNC = False
+        content = f'Бегущая строка {uuid4()}'.encode()
+        response = user_client.post(
+            self.uploads_url,
+            data={'name': 'upload_test.txt', 'type': 3, 'size': len(content)},
+            format='json'
+        )
+        assert response.status_code == HTTPStatus.CREATED, (
+            'Не удалось начать загрузку файла.'
+        )
+        token = response.json()['upload_token']
+        assert len(response.json()['parts']) == 1, (
+            'Неверное количество частей для маленького файла.'
+        )
+        upload = signing.loads(token, salt=UPLOAD_TOKEN_SALT)
+        get_minio_client()._upload_part(
+            settings.MINIO_MEDIA_FILES_BUCKET,
+            upload['object_name'],
+            content,
+            None,
+            upload['upload_id'],
+            1
+        )
+        response = user_client.post(
+            f'{self.uploads_url}complete/',
+            data={'upload_token': token},
+            format='json'
+        )
+        assert response.status_code == HTTPStatus.CREATED, (
+            'Загруженный файл не создан.'
+        )
+        file = File.objects.get(id=response.json()['id'])
+        try:
+            assert file.name == 'upload_test.txt', 'Неверное имя файла.'
+            assert file.size == len(content), 'Неверный размер файла.'
+            assert file.source.name == upload['object_name'], (
+                'Файл не ссылается на собранный объект.'
+            )
+            for url in ('complete/', 'abort/'):
+                response = user_client.post(
+                    f'{self.uploads_url}{url}',
+                    data={'upload_token': token},
+                    format='json'
+                )
+                assert response.status_code == HTTPStatus.NOT_FOUND, (
+                    f'Повтор {url} завершённой загрузки должен отдавать 404.'
+                )
+        finally:
+            file.delete()
+
+    def test_complete_upload_error(self, user_client, settings, monkeypatch):
+        from uuid import uuid4
+        from django.core import signing
+        from minio.error import S3Error
+        from api.constants import get_minio_client
+        from files import uploads
+
+        def _broken_info(*args, **kwargs):
+            raise RuntimeError('Облако недоступно')
+
+        settings.FILE_PROCESSING_ASYNC = False
+        monkeypatch.setattr(uploads, 'get_object_info', _broken_info)
+        content = f'Бегущая строка {uuid4()}'.encode()
+        response = user_client.post(
+            self.uploads_url,
+            data={'name': 'upload_test.txt', 'type': 3, 'size': len(content)},
+            format='json'
+        )
+        upload = signing.loads(
+            response.json()['upload_token'], salt=uploads.UPLOAD_TOKEN_SALT
+        )
+        client = get_minio_client()
+        client._upload_part(
+            settings.MINIO_MEDIA_FILES_BUCKET,
+            upload['object_name'],
+            content,
+            None,
+            upload['upload_id'],
+            1
+        )
+        with pytest.raises(RuntimeError):
+            uploads.complete_upload(upload)
+        assert not File.objects.filter(source=upload['object_name']).exists(), (
+            'Файл создан, хотя завершение загрузки упало.'
+        )
+        with pytest.raises(S3Error):
+            client.stat_object(
+                settings.MINIO_MEDIA_FILES_BUCKET, upload['object_name']
+            )
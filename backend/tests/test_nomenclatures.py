@@ -1,4 +1,8 @@
 import copy
+import json
+import os
+import threading
+import time
 import pytest
 from http import HTTPStatus
 
@@ -36,6 +40,12 @@ class TestNomenclatures:
             'Не авторизованный пользователь имеет доступ к странице.'
         )
 
+    def test_name_filter_index(self, nomenclature, assert_index_used):
+        assert_index_used(
+            Nomenclature.objects.filter(name__icontains='станц'),
+            'nomenclature_name_trgm_idx'
+        )
+
     def test_get_status_history_staff(
         self,
         admin_client,
@@ -783,6 +793,415 @@ class TestNomenclatureStatistic:
                 f'Не авторизованный пользователь может запросить статистику {url}.'
             )
 
+    def test_get_ad_statistics_format(
+        self,
+        user_client,
+        nomenclature,
+        ad_stat
+    ):
+        nomenclature_id = str(nomenclature.id)
+        date = self.dt.today().date()
+        response = user_client.get(
+            self.ad_stat_url.format(nomenclature_id=nomenclature_id, date=date),
+            follow=True
+        )
+        assert response.status_code == HTTPStatus.OK, (
+            'Авторизованный пользователь не может запросить статистику рекламы.'
+        )
+        assert response.json() == [{
+            'length': ad_stat.length,
+            'file': str(ad_stat.file),
+            'ad_block': f'00:00:{ad_stat.ad_block:02}',
+        }], 'Неверный формат статистики рекламы.'
+
+    def test_get_statistics_summary(
+        self,
+        user_client,
+        nomenclature,
+        ad_stat,
+        music_stat
+    ):
+        nomenclature_id = str(nomenclature.id)
+        date = self.dt.today().date()
+        url = (
+            f'/api/nomenclatures/{nomenclature_id}/stat_summary/'
+            f'?date_from={date}&date_to={date}'
+        )
+        response = user_client.get(url)
+        assert response.status_code == HTTPStatus.OK, (
+            'Авторизованный пользователь не может запросить сводную статистику.'
+        )
+        response_data = response.json()
+        assert {row['stat_type'] for row in response_data} == {'ad', 'music'}, (
+            'В сводке должны быть все типы статистики станции.'
+        )
+        for row in response_data:
+            for key in ('period', 'file', 'plays', 'duration'):
+                assert key in row, f'В ответе нет обязательного ключа {key}'
+            assert row['plays'] == 1, 'Неверное количество проигрываний.'
+        response = user_client.get(f'{url}&type=music')
+        assert [row['stat_type'] for row in response.json()] == ['music'], (
+            'Фильтр по типу статистики не работает.'
+        )
+        response = user_client.get(
+            f'/api/nomenclatures/{nomenclature_id}/stat_summary/'
+            f'?date_from={date}&date_to=2000-01-01'
+        )
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            'Дата начала позже даты окончания должна возвращать 400.'
+        )
+
+    def test_export_statistics(
+        self,
+        user_client,
+        anon_client,
+        nomenclature,
+        ad_stat
+    ):
+        nomenclature_id = str(nomenclature.id)
+        date = self.dt.today().date()
+        url = (
+            f'/api/statistic/export/?type=ad&date_from={date}'
+            f'&date_to={date}&client={nomenclature_id}'
+        )
+        response = anon_client.get(url)
+        assert response.status_code == HTTPStatus.UNAUTHORIZED, (
+            'Не авторизованный пользователь может выгрузить статистику.'
+        )
+        response = user_client.get(url)
+        assert response.status_code == HTTPStatus.OK, (
+            'Авторизованный пользователь не может выгрузить статистику.'
+        )
+        assert response['Content-Type'] == 'text/csv', (
+            'По-умолчанию статистика должна выгружаться в CSV.'
+        )
+        rows = b''.join(response.streaming_content).decode().splitlines()
+        assert rows[0] == '"client","file","played","length","ad_block"', (
+            'В выгрузке нет заголовка с названиями колонок.'
+        )
+        assert len(rows) == 2, 'Неверное количество строк в выгрузке.'
+        response = user_client.get(
+            f'/api/statistic/export/?type=ad&date_from={date}&date_to={date}'
+        )
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            'Выгрузка без номенклатуры и файла должна возвращать 400.'
+        )
+
+    def test_export_collapses_resent_rows(
+        self,
+        user_client,
+        nomenclature,
+        ad_stat
+    ):
+        from ch_statistic.models import ADStat
+
+        # та же строка пришла от станции повторно отдельной вставкой
+        ADStat.objects.create(
+            played=ad_stat.played,
+            file=ad_stat.file,
+            client=ad_stat.client,
+            length=ad_stat.length,
+            ad_block=ad_stat.ad_block
+        )
+        date = self.dt.today().date()
+        response = user_client.get(
+            f'/api/statistic/export/?type=ad&date_from={date}'
+            f'&date_to={date}&client={nomenclature.id}'
+        )
+        rows = b''.join(response.streaming_content).decode().splitlines()
+        assert len(rows) == 2, (
+            'Повторно присланная строка попала в выгрузку дважды.'
+        )
+
+    def test_export_marks_broken_stream(self):
+        from ch_statistic.export import EXPORT_ERROR_TRAILER, _stream_chunks
+
+        class BrokenResponse:
+            released = False
+
+            def release_conn(self):
+                self.released = True
+
+        def chunks():
+            yield b'"client","file"\n'
+            raise ConnectionError('кликхаус оборвал соединение')
+
+        response = BrokenResponse()
+        body = b''.join(_stream_chunks(response, b'', chunks(), 'csv'))
+        assert body.endswith(EXPORT_ERROR_TRAILER), (
+            'Оборванная выгрузка CSV должна заканчиваться маркером ошибки.'
+        )
+        assert response.released, 'Соединение с кликхаусом не освобождено.'
+
+
+@pytest.mark.skipif(
+    not os.environ.get('REDIS_URL'),
+    reason='Буфер статистики хранится в редисе (REDIS_URL).'
+)
+@pytest.mark.django_db(databases=['clickhouse', 'default'])
+class TestStatisticBuffer:
+
+    @pytest.fixture
+    def redis(self, settings):
+        from api.constants import get_redis_client
+        from ch_statistic.buffer import (
+            BUFFER_KEY,
+            FLUSH_TRIGGER_KEY,
+            FLUSHING_KEY
+        )
+
+        keys = (
+            BUFFER_KEY.format(stat_type='ad'),
+            FLUSHING_KEY.format(stat_type='ad'),
+            FLUSH_TRIGGER_KEY
+        )
+        settings.STATISTIC_BUFFER = True
+        redis = get_redis_client()
+        redis.delete(*keys)
+        yield redis
+        redis.delete(*keys)
+
+    @staticmethod
+    def get_rows(file_id, count: int) -> list[dict]:
+        return [
+            {
+                'file': str(file_id),
+                'played': f'2026-01-01 12:00:{second:02}',
+                'length': 10,
+                'ad_block': 1
+            }
+            for second in range(count)
+        ]
+
+    def test_push_statistic(self, redis, nomenclature, file_3):
+        from ch_statistic.buffer import BUFFER_KEY, push_statistic
+
+        rows = self.get_rows(file_3.id, 3)
+        broken = [{'file': str(file_3.id)}, 'not a row']
+        accepted = push_statistic('ad', str(nomenclature.id), rows + broken)
+        assert accepted == len(rows), (
+            'Строки без обязательных полей должны отбрасываться.'
+        )
+        assert redis.llen(BUFFER_KEY.format(stat_type='ad')) == len(rows), (
+            'Принятые строки не попали в буфер.'
+        )
+        assert push_statistic('unknown', str(nomenclature.id), rows) == 0, (
+            'Статистика неизвестного типа не должна попадать в буфер.'
+        )
+
+    def test_flush_buffer_in_chunks(self, redis, settings, nomenclature, file_3):
+        from ch_statistic.buffer import (
+            BUFFER_KEY,
+            FLUSHING_KEY,
+            flush_buffer,
+            push_statistic
+        )
+        from ch_statistic.models import ADStat
+
+        rows = self.get_rows(file_3.id, 5)
+        # последняя строка пришла повторно
+        push_statistic('ad', str(nomenclature.id), rows + rows[-1:])
+        settings.STATISTIC_FLUSH_SIZE = 2
+        assert flush_buffer('ad') == len(rows), (
+            'Повторная строка внутри пачки должна записываться один раз.'
+        )
+        assert not redis.exists(BUFFER_KEY.format(stat_type='ad')), (
+            'Буфер не переименован перед записью.'
+        )
+        assert not redis.exists(FLUSHING_KEY.format(stat_type='ad')), (
+            'Записанный буфер не очищен.'
+        )
+        assert ADStat.objects.filter(
+            client=nomenclature.id
+        ).count() == len(rows), 'В кликхаус записаны не все строки буфера.'
+        assert flush_buffer('ad') == 0, (
+            'Пустой буфер не должен ничего записывать.'
+        )
+
+    def test_retried_flush_is_deduplicated(self, redis, nomenclature, file_3):
+        from datetime import date
+        from ch_statistic.buffer import (
+            BUFFER_KEY,
+            FLUSHING_KEY,
+            flush_buffer,
+            push_statistic
+        )
+        from ch_statistic.models import ADStat
+        from ch_statistic.rollups import get_client_summary
+
+        rows = self.get_rows(file_3.id, 3)
+        push_statistic('ad', str(nomenclature.id), rows)
+        raw_rows = redis.lrange(BUFFER_KEY.format(stat_type='ad'), 0, -1)
+        flush_buffer('ad')
+        # запись прошла, но пачка не успела удалиться из буфера
+        redis.rpush(FLUSHING_KEY.format(stat_type='ad'), *raw_rows)
+        flush_buffer('ad')
+        assert ADStat.objects.filter(
+            client=nomenclature.id
+        ).count() == len(rows), 'Повторно записанная пачка не отброшена.'
+        summary = get_client_summary(
+            str(nomenclature.id), date(2026, 1, 1), date(2026, 1, 1),
+            stat_type='ad'
+        )
+        assert sum(row['plays'] for row in summary) == len(rows), (
+            'Повторно записанная пачка посчитана в срезах дважды.'
+        )
+
+    def test_paused_flush(self, redis, monkeypatch, nomenclature, file_3):
+        from django.db import connections
+        from ch_statistic import conversion
+        from ch_statistic.buffer import (
+            BUFFER_KEY,
+            FLUSH_PAUSE_KEY,
+            flush_buffer,
+            push_statistic,
+            writing_statistic
+        )
+
+        rows = self.get_rows(file_3.id, 3)
+        push_statistic('ad', str(nomenclature.id), rows)
+        redis.set(FLUSH_PAUSE_KEY, 1)
+        try:
+            assert flush_buffer('ad') == 0, (
+                'Статистика записана во время паузы.'
+            )
+            with writing_statistic() as allowed:
+                assert not allowed, 'Запись разрешена во время паузы.'
+        finally:
+            redis.delete(FLUSH_PAUSE_KEY)
+        assert redis.llen(BUFFER_KEY.format(stat_type='ad')) == len(rows), (
+            'Строки, пришедшие во время паузы, потерялись.'
+        )
+
+        monkeypatch.setattr(conversion, 'FLUSH_WAIT', 1)
+        with writing_statistic(), connections['clickhouse'].cursor() as cursor:
+            with pytest.raises(RuntimeError):
+                conversion.pause_ingestion(
+                    cursor, conversion.get_model_tables()
+                )
+        assert not redis.exists(FLUSH_PAUSE_KEY), (
+            'Пауза не снята после отмены конвертации.'
+        )
+
+
+@pytest.mark.django_db(databases=['clickhouse', 'default'])
+class TestStatisticConversion:
+
+    table = 'conversion_test_stat'
+    sorting_key = 'client, played, file'
+    create_sql = f"""
+        CREATE TABLE {{table}} (
+            id Int64,
+            created DateTime64(6),
+            played DateTime64(6),
+            file UUID,
+            client UUID,
+            length UInt16
+        )
+        ENGINE = ReplacingMergeTree
+        PARTITION BY toYYYYMM(played)
+        ORDER BY ({sorting_key})
+    """
+
+    @pytest.fixture
+    def cursor(self):
+        from django.db import connections
+        from ch_statistic.rollups import drop_views
+
+        with connections['clickhouse'].cursor() as cursor:
+            yield cursor
+            drop_views(cursor, self.table)
+            cursor.execute(f'DROP TABLE IF EXISTS {self.table}')
+            cursor.execute(f'DROP TABLE IF EXISTS {self.table}_converted')
+
+    @pytest.fixture
+    def legacy_table(self, cursor):
+        """Таблица в виде до конвертации: строковые идентификаторы."""
+        from ch_statistic.rollups import create_views
+
+        cursor.execute(
+            f'CREATE TABLE {self.table} ('
+            f'id Int64, created DateTime64(6), played DateTime64(6), '
+            f'file String, client String, length UInt16'
+            f') ENGINE = MergeTree ORDER BY id'
+        )
+        create_views(cursor, 'test', self.table)
+        return self.table
+
+    @staticmethod
+    def insert_row(cursor, table: str, row_id: int, client, file) -> None:
+        cursor.execute(
+            f"INSERT INTO {table} (id, created, played, file, client, length) "
+            f"SELECT {row_id}, now(), now(), '{file}', '{client}', 10"
+        )
+
+    @staticmethod
+    def get_plays(cursor, client) -> int:
+        cursor.execute(
+            "SELECT sum(plays) FROM stat_client_hourly "
+            "WHERE stat_type = 'test' AND client = %(client)s",
+            {'client': str(client)}
+        )
+        return cursor.fetchone()[0]
+
+    def get_stat_table(self):
+        from ch_statistic.conversion import StatTable
+
+        return StatTable(self.table, self.create_sql, self.sorting_key)
+
+    def test_convert_table(self, cursor, legacy_table):
+        from uuid import uuid4
+        from ch_statistic.conversion import convert_table
+
+        client, file = uuid4(), uuid4()
+        for row_id in (1, 2):
+            self.insert_row(cursor, legacy_table, row_id, client, file)
+        assert convert_table(cursor, 'test', self.get_stat_table()), (
+            'Таблица со строковыми идентификаторами не сконвертирована.'
+        )
+        cursor.execute(
+            'SELECT name, type FROM system.columns '
+            'WHERE database = currentDatabase() AND table = %(table)s '
+            "AND name IN ('client', 'file')",
+            {'table': legacy_table}
+        )
+        assert {column_type for _, column_type in cursor.fetchall()} == {
+            'UUID'
+        }, 'Идентификаторы не приведены к UUID.'
+        cursor.execute(f'SELECT count() FROM {legacy_table}')
+        assert cursor.fetchone()[0] == 2, 'При конвертации потеряны строки.'
+        assert self.get_plays(cursor, client) == 2, (
+            'Скопированные строки посчитаны в срезах повторно.'
+        )
+        self.insert_row(cursor, legacy_table, 3, client, file)
+        assert self.get_plays(cursor, client) == 3, (
+            'Представления срезов не перенесены на новую таблицу.'
+        )
+        assert not convert_table(cursor, 'test', self.get_stat_table()), (
+            'Сконвертированная таблица не должна конвертироваться повторно.'
+        )
+
+    def test_invalid_ids_stop_conversion(self, cursor, legacy_table):
+        from uuid import uuid4
+        from ch_statistic.conversion import convert_table
+
+        self.insert_row(cursor, legacy_table, 1, uuid4(), 'not-a-uuid')
+        with pytest.raises(ValueError):
+            convert_table(cursor, 'test', self.get_stat_table())
+        cursor.execute(
+            'SELECT type FROM system.columns '
+            'WHERE database = currentDatabase() AND table = %(table)s '
+            "AND name = 'file'",
+            {'table': legacy_table}
+        )
+        assert cursor.fetchone()[0] == 'String', (
+            'Таблица с битыми идентификаторами не должна меняться.'
+        )
+        cursor.execute(f'SELECT count() FROM {legacy_table}')
+        assert cursor.fetchone()[0] == 1, (
+            'Строки с битыми идентификаторами не должны теряться.'
+        )
+
 
 @pytest.mark.django_db
 class TestPendingTasks:
@@ -809,4 +1228,608 @@ class TestPendingTasks:
         assert NomenclatureAvailability.objects.last().last_answer_date > dt.now()-td(seconds=5), (
             'Время последнего выхода в доступ номенклатуры встало неправильно. '
             f'{NomenclatureAvailability.objects.last().last_answer_date.strftime("%Y-%m-%d %H:%M:%S")}'
-        )
\ No newline at end of file
+        )
+
+    def test_pending_tasks_query_budget(
+        self,
+        client,
+        user,
+        nomenclature,
+        django_assert_max_num_queries
+    ):
+        from tasks.models import Task
+        url = self.pending_tasks_url.format(nomenclature_id=str(nomenclature.id))
+        tasks = Task.objects.bulk_create([
+            Task(client=nomenclature, owner=user, type=17, parameters='test')
+            for _ in range(10)
+        ])
+        done_tasks, pending = tasks[:-1], tasks[-1]
+        data = {
+            'version': '2.0.0',
+            'hw_info': {'cpu': 'test'},
+            'task_status': [
+                {'status': 2, 'task_id': str(task.id)} for task in done_tasks
+            ]
+        }
+        with django_assert_max_num_queries(4):
+            response = client.post(
+                url,
+                data=data,
+                content_type='application/json'
+            )
+        assert response.status_code == HTTPStatus.OK, (
+            'Код статуса в ответе != 200.'
+        )
+        assert Task.objects.filter(id__in=[task.id for task in done_tasks],
+                                   status=2).count() == len(done_tasks), (
+            'Статусы репликаций не обновились.'
+        )
+        response_tasks = response.json()['tasks']
+        assert [task['task_id'] for task in response_tasks] == [str(pending.id)], (
+            'В ответе должна быть только не выполненная репликация.'
+        )
+        for key in ('task_id', 'task_type', 'parameters'):
+            assert key in response_tasks[0], (
+                f'В ответе нет обязательного ключа {key}.'
+            )
+        nomenclature.refresh_from_db()
+        assert nomenclature.version == '2.0.0', 'Версия ПО не обновилась.'
+        assert NomenclatureAvailability.objects.filter(
+            client=nomenclature
+        ).count() == 1, 'Запись о доступности должна быть одна.'
+
+    def test_pending_tasks_unknown_nomenclature(self, client):
+        from uuid import uuid4
+        url = self.pending_tasks_url.format(nomenclature_id=str(uuid4()))
+        response = client.post(url, data={})
+        assert response.status_code == HTTPStatus.NOT_FOUND, (
+            'Код статуса в ответе != 404.'
+        )
+
+    def test_pending_tasks_long_poll(self, client, task, nomenclature):
+        url = self.pending_tasks_url.format(nomenclature_id=str(nomenclature.id))
+        response = client.post(f'{url}?wait=5', data={})
+        assert response.status_code == HTTPStatus.OK, (
+            'Код статуса в ответе != 200.'
+        )
+        assert response.json()['tasks'][0]['task_id'] == str(task.id), (
+            'При наличии ожидающих репликаций запрос не должен ждать.'
+        )
+        for wait in ('soon', 'nan', 'inf'):
+            response = client.post(f'{url}?wait={wait}', data={})
+            assert response.status_code == HTTPStatus.BAD_REQUEST, (
+                f'Время ожидания {wait} должно возвращать 400.'
+            )
+
+
+@pytest.mark.skipif(
+    not os.environ.get('REDIS_URL'),
+    reason='Long-poll работает через слой каналов в редисе (REDIS_URL).'
+)
+@pytest.mark.django_db(transaction=True)
+class TestPendingTasksLongPoll:
+
+    pending_tasks_url = '/api/nomenclatures/{nomenclature_id}/pending_tasks/'
+
+    @staticmethod
+    def create_task_later(user, nomenclature, delay: float) -> threading.Timer:
+        """Создание репликации из другого потока во время ожидания."""
+        from django.db import connection
+        from tasks.delivery import notify_clients
+        from tasks.models import Task
+
+        def _create():
+            try:
+                Task.objects.create(
+                    client=nomenclature,
+                    owner=user,
+                    parameters='test',
+                    type=17
+                )
+                notify_clients([nomenclature.id])
+            finally:
+                connection.close()
+
+        timer = threading.Timer(delay, _create)
+        timer.start()
+        return timer
+
+    @staticmethod
+    def post_asgi(url: str, timeout: float) -> dict:
+        """POST запрос через ASGI приложение, как его обслуживает uvicorn."""
+        from asgiref.sync import async_to_sync
+        from channels.testing import HttpCommunicator
+        from rmc_rest_api.asgi import application
+
+        communicator = HttpCommunicator(
+            application,
+            'POST',
+            url,
+            body=b'{}',
+            headers=[(b'content-type', b'application/json')]
+        )
+        return async_to_sync(communicator.get_response)(timeout=timeout)
+
+    def test_long_poll_wakes_on_new_task(self, user, nomenclature):
+        url = self.pending_tasks_url.format(nomenclature_id=str(nomenclature.id))
+        timer = self.create_task_later(user, nomenclature, 1)
+        started = time.monotonic()
+        response = self.post_asgi(f'{url}?wait=20', 30)
+        elapsed = time.monotonic() - started
+        timer.join()
+        assert response['status'] == HTTPStatus.OK, (
+            'Код статуса в ответе != 200.'
+        )
+        assert len(json.loads(response['body'])['tasks']) == 1, (
+            'Созданная во время ожидания репликация не пришла в ответе.'
+        )
+        assert elapsed < 10, (
+            'Запрос не проснулся при создании репликации.'
+        )
+
+    def test_long_poll_many_waiters(self, user, nomenclature):
+        from concurrent.futures import ThreadPoolExecutor
+
+        url = self.pending_tasks_url.format(nomenclature_id=str(nomenclature.id))
+        waiters = 20
+        timer = self.create_task_later(user, nomenclature, 2)
+        with ThreadPoolExecutor(waiters) as executor:
+            responses = list(executor.map(
+                lambda _: self.post_asgi(f'{url}?wait=20', 30),
+                range(waiters)
+            ))
+        timer.join()
+        assert all(
+            len(json.loads(response['body'])['tasks']) == 1
+            for response in responses
+        ), 'Не все ожидающие запросы получили новую репликацию.'
+
+    def test_wsgi_does_not_wait(self, client, nomenclature):
+        url = self.pending_tasks_url.format(nomenclature_id=str(nomenclature.id))
+        started = time.monotonic()
+        response = client.post(f'{url}?wait=20', data={})
+        elapsed = time.monotonic() - started
+        assert response.status_code == HTTPStatus.OK, (
+            'Код статуса в ответе != 200.'
+        )
+        assert elapsed < 5, (
+            'Под WSGI запрос с wait должен отвечать сразу.'
+        )
+
+
+class TestPendingTasksWebsocket:
+
+    def test_websocket_without_channel_layer(self, settings):
+        from uuid import uuid4
+
+        from asgiref.sync import async_to_sync
+        from channels.testing import WebsocketCommunicator
+        from nomenclatures.consumers import NO_CHANNEL_LAYER_CLOSE_CODE
+        from rmc_rest_api.asgi import application
+
+        settings.CHANNEL_LAYERS = {}
+
+        async def _connect():
+            communicator = WebsocketCommunicator(
+                application,
+                f'/ws/nomenclatures/{uuid4()}/pending_tasks/'
+            )
+            await communicator.connect()
+            message = await communicator.receive_output()
+            await communicator.disconnect()
+            return message
+
+        message = async_to_sync(_connect)()
+        assert message['type'] == 'websocket.close', (
+            'Без слоя каналов соединение должно закрываться.'
+        )
+        assert message['code'] == NO_CHANNEL_LAYER_CLOSE_CODE, (
+            'Без слоя каналов соединение закрыто не с тем кодом.'
+        )
+
+
+@pytest.mark.skipif(
+    not os.environ.get('REDIS_URL'),
+    reason='Буфер ответов станций хранится в редисе (REDIS_URL).'
+)
+@pytest.mark.django_db
+class TestHeartbeatBuffer:
+
+    @pytest.fixture
+    def redis(self, settings):
+        from api.constants import get_redis_client
+        from nomenclatures.heartbeat import FLUSHING_KEY, HEARTBEAT_KEY
+
+        settings.HEARTBEAT_WRITE_BEHIND = True
+        redis = get_redis_client()
+        redis.delete(HEARTBEAT_KEY, FLUSHING_KEY)
+        yield redis
+        redis.delete(HEARTBEAT_KEY, FLUSHING_KEY)
+
+    def test_record_and_flush(self, redis, nomenclature):
+        from nomenclatures.heartbeat import flush_heartbeats, record_heartbeat
+
+        NomenclatureAvailability.objects.filter(client=nomenclature).delete()
+        record_heartbeat(nomenclature.id)
+        assert not NomenclatureAvailability.objects.filter(
+            client=nomenclature
+        ).exists(), 'Время ответа записано в базу в обход буфера.'
+        assert flush_heartbeats() == 1, (
+            'Из буфера должна быть записана одна станция.'
+        )
+        assert NomenclatureAvailability.objects.filter(
+            client=nomenclature
+        ).exists(), 'Время ответа из буфера не записано в базу.'
+        assert flush_heartbeats() == 0, (
+            'Пустой буфер не должен ничего записывать.'
+        )
+
+    def test_flush_leftover_with_deleted_station(
+        self,
+        redis,
+        nomenclature,
+        nomenclature_1
+    ):
+        import uuid
+        from datetime import datetime as dt
+        from nomenclatures.heartbeat import (
+            FLUSHING_KEY,
+            HEARTBEAT_KEY,
+            flush_heartbeats
+        )
+
+        answer_time = dt(2026, 1, 1, 12, 0, 0)
+        # буфер остался от упавшей записи, в нём удалённая станция
+        redis.hset(FLUSHING_KEY, mapping={
+            str(nomenclature.id): answer_time.isoformat(),
+            str(uuid.uuid4()): answer_time.isoformat(),
+        })
+        redis.hset(HEARTBEAT_KEY, str(nomenclature_1.id),
+                   answer_time.isoformat())
+        assert flush_heartbeats() == 2, (
+            'Оставшийся буфер (без удалённой станции) и текущий должны '
+            'записываться за один перенос.'
+        )
+        assert not redis.exists(FLUSHING_KEY), (
+            'Оставшийся буфер не очищен после записи.'
+        )
+        assert not redis.exists(HEARTBEAT_KEY), (
+            'Текущий буфер не перенесён вместе с оставшимся.'
+        )
+        assert NomenclatureAvailability.objects.get(
+            client=nomenclature
+        ).last_answer_date == answer_time, (
+            'Время ответа из оставшегося буфера не записано.'
+        )
+        assert NomenclatureAvailability.objects.get(
+            client=nomenclature_1
+        ).last_answer_date == answer_time, (
+            'Время ответа из текущего буфера ждёт следующего переноса.'
+        )
+
+
+@pytest.mark.django_db
+class TestNomenclatureStatus:
+
+    def test_update_nomenclature_status(
+        self,
+        user,
+        nomenclature,
+        nomenclature_1,
+        django_assert_num_queries
+    ):
+        from datetime import datetime as dt, timedelta as td
+        from nomenclatures.models import StatusHistory
+        from nomenclatures.tasks import update_nomenclature_status
+        nomenclature_2 = Nomenclature.objects.create(
+            name='Test Nomenclature 3',
+            owner=user,
+            settings=nomenclature.settings
+        )
+        now = dt.now()
+        cases = {
+            # станция: (статус, время ответа, ожидаемый статус)
+            nomenclature: (0, now - td(minutes=10), 1),
+            nomenclature_1: (2, now - td(seconds=10), 0),
+            nomenclature_2: (0, now - td(seconds=10), 0),
+        }
+        for client, (status, last_answer, _) in cases.items():
+            NomenclatureAvailability.objects.create(
+                client=client,
+                status=status,
+                last_answer_date=last_answer
+            )
+        with django_assert_num_queries(1):
+            update_nomenclature_status()
+        for client, (_, _, expected) in cases.items():
+            assert NomenclatureAvailability.objects.get(
+                client=client
+            ).status == expected, (
+                f'Статус {client.name} должен был стать {expected}.'
+            )
+        history = StatusHistory.objects.values_list('client', 'status')
+        assert set(history) == {(nomenclature.id, 1), (nomenclature_1.id, 0)}, (
+            'История должна записываться только для изменившихся статусов.'
+        )
+
+
+@pytest.mark.django_db
+class TestNomenclatureArticle:
+
+    def test_article_from_sequence(
+        self,
+        user,
+        nomenclature,
+        django_assert_num_queries
+    ):
+        assert nomenclature.article is not None, (
+            'Артикул не вернулся из базы после создания номенклатуры.'
+        )
+        with django_assert_num_queries(1):
+            created = Nomenclature.objects.bulk_create([
+                Nomenclature(
+                    name=f'Bulk Nomenclature {number}',
+                    owner=user,
+                    settings=nomenclature.settings
+                )
+                for number in range(5)
+            ])
+        articles = [instance.article for instance in created]
+        assert None not in articles, (
+            'bulk_create не вернул артикулы созданных номенклатур.'
+        )
+        assert len(set(articles)) == len(articles), (
+            'Артикулы номенклатур повторяются.'
+        )
+        assert min(articles) > nomenclature.article, (
+            'Артикулы выдаются не по возрастанию.'
+        )
+        assert sorted(
+            Nomenclature.objects.filter(
+                id__in=[instance.id for instance in created]
+            ).values_list('article', flat=True)
+        ) == sorted(articles), 'Артикулы в базе не совпадают с выданными.'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_article_does_not_block(self, user, nomenclature):
+        from django.db import connection, transaction
+
+        result = {}
+
+        def create_in_other_connection():
+            # у потока своё соединение с базой
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute("SET lock_timeout = '2s'")
+                result['article'] = Nomenclature.objects.create(
+                    name='Concurrent Nomenclature',
+                    owner=user,
+                    settings=nomenclature.settings
+                ).article
+            except Exception as error:
+                result['error'] = error
+            finally:
+                connection.close()
+
+        with transaction.atomic():
+            # первая транзакция выдала артикул и ещё не завершилась
+            first = Nomenclature.objects.create(
+                name='Open Transaction Nomenclature',
+                owner=user,
+                settings=nomenclature.settings
+            )
+            thread = threading.Thread(target=create_in_other_connection)
+            thread.start()
+            thread.join(timeout=10)
+            assert not thread.is_alive(), (
+                'Создание номенклатуры ждёт чужую открытую транзакцию.'
+            )
+        assert 'error' not in result, (
+            f'Создание номенклатуры заблокировано: {result.get("error")}'
+        )
+        assert result['article'] != first.article, (
+            'Параллельные транзакции получили одинаковый артикул.'
+        )
+
+
+@pytest.mark.django_db
+class TestNomenclatureImport:
+
+    import_url = '/api/nomenclatures/import/'
+
+    def test_import_nomenclatures(self, admin_client, user_client, nomenclature):
+        import csv
+        import io
+        import json
+
+        settings = json.dumps(nomenclature.settings)
+        invalid_settings = json.dumps({'mon': nomenclature.settings['mon']})
+        content = io.StringIO()
+        csv.writer(content, lineterminator='\n').writerows([
+            ('name', 'timezone', 'settings'),
+            ('Imported 1', 'Etc/GMT-3', settings),
+            ('Imported 2', '', settings),
+            (nomenclature.name, '', settings),
+            ('Imported 1', '', settings),
+            ('Imported 3', '', invalid_settings),
+            ('Imported 4', '', 'not json'),
+        ])
+        content = content.getvalue()
+        data = {'import_format': 'csv', 'content': content}
+        response = user_client.post(self.import_url, data=data, format='json')
+        assert response.status_code == HTTPStatus.FORBIDDEN, (
+            'Пользователь без прав смог импортировать рабочие станции.'
+        )
+        response = admin_client.post(self.import_url, data=data, format='json')
+        response_data = response.json()
+        assert response.status_code == HTTPStatus.CREATED, (
+            f'Импорт рабочих станций не удался.\nОтвет: {response_data}'
+        )
+        assert response_data['created'] == 2, (
+            'Количество созданных станций не совпадает с корректными строками.'
+        )
+        assert [error['row'] for error in response_data['errors']] == [
+            4, 5, 6, 7
+        ], 'Ошибки указаны не для тех строк файла.'
+        assert set(Nomenclature.objects.filter(
+            name__startswith='Imported'
+        ).values_list('name', flat=True)) == {'Imported 1', 'Imported 2'}, (
+            'В базе не те рабочие станции.'
+        )
+
+        content = '\n'.join([
+            json.dumps({'name': 'Imported 5', 'settings': nomenclature.settings}),
+            '',
+            '[1, 2]',
+        ])
+        response = admin_client.post(
+            self.import_url,
+            data={'content': content},
+            format='json'
+        )
+        response_data = response.json()
+        assert response_data['created'] == 1, (
+            'Станция из JSON Lines не создана.'
+        )
+        assert [error['row'] for error in response_data['errors']] == [3], (
+            'Ошибка в JSON Lines указана не для той строки.'
+        )
+
+    def test_import_file_upload(self, admin_client, nomenclature):
+        import json
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        # 10 000 станций - несколько мегабайт,
+        # больше DATA_UPLOAD_MAX_MEMORY_SIZE (2.5Мб)
+        content = '\n'.join(
+            json.dumps({
+                'name': f'Uploaded {number}',
+                'description': 'Описание станции',
+                'settings': nomenclature.settings
+            })
+            for number in range(10000)
+        ).encode()
+        response = admin_client.post(
+            self.import_url,
+            data={'file': SimpleUploadedFile('stations.jsonl', content)},
+            format='multipart'
+        )
+        response_data = response.json()
+        assert response.status_code == HTTPStatus.CREATED, (
+            f'Импорт файлом не удался.\nОтвет: {response_data}'
+        )
+        assert response_data['created'] == 10000, (
+            'Созданы не все станции из загруженного файла.'
+        )
+        response = admin_client.post(self.import_url, data={}, format='json')
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            'Импорт без файла должен возвращать 400.'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_import_name_taken_concurrently(self, user, nomenclature):
+        from django.db import connection, transaction
+        from nomenclatures.onboarding import import_nomenclatures
+
+        rows = [
+            (2, {'name': 'Raced', 'settings': nomenclature.settings}),
+            (3, {'name': 'Not Raced', 'settings': nomenclature.settings}),
+        ]
+        result = {}
+
+        def run_import():
+            # у потока своё соединение с базой
+            try:
+                result.update(import_nomenclatures(rows, user))
+            finally:
+                connection.close()
+
+        with transaction.atomic():
+            # та же станция создаётся параллельно и ещё не закоммичена:
+            # проверка названий импорта её не видит
+            Nomenclature.objects.create(
+                name='Raced',
+                owner=user,
+                settings=nomenclature.settings
+            )
+            thread = threading.Thread(target=run_import)
+            thread.start()
+            time.sleep(1)
+        thread.join(timeout=10)
+        assert result, 'Импорт упал на занятом параллельно названии.'
+        assert result['created'] == 1, (
+            'Из-за одного занятого названия не создались остальные станции.'
+        )
+        assert [error['row'] for error in result['errors']] == [2], (
+            'Ошибка занятого названия указана не для той строки.'
+        )
+
+
+class TestNomenclatureSchedule:
+
+    def test_compiled_schedule(self):
+        from datetime import datetime as dt
+        from nomenclatures.schedule import DAYS, ScheduleError, get_schedule
+
+        day_settings = {
+            'worktime': '09:00:00-20:00:00',
+            'default_volume': [50, 50, 50, 50],
+            'custom_volume': {
+                '12:00:00-13:00:00': [10, 10, 10, 10],
+                '9:00:00-10:00:00': [20, 20, 20, 20]
+            }
+        }
+        schedule = get_schedule({day: day_settings for day in DAYS})
+        assert schedule is get_schedule({day: day_settings for day in DAYS}), (
+            'Одинаковые настройки разбираются повторно.'
+        )
+        monday = dt(2024, 11, 18)
+        cases = {
+            monday.replace(hour=8): None,
+            monday.replace(hour=9, minute=30): (20, 20, 20, 20),
+            monday.replace(hour=12, minute=59): (10, 10, 10, 10),
+            monday.replace(hour=13): (50, 50, 50, 50),
+            monday.replace(hour=20): None,
+        }
+        for moment, volume in cases.items():
+            assert schedule.get_volume(moment) == volume, (
+                f'Неверная громкость в {moment:%H:%M}.'
+            )
+        invalid_settings = {
+            day: {
+                **day_settings,
+                'custom_volume': {
+                    '09:00:00-12:00:00': [50] * 4,
+                    '10:00:00-14:00:00': [50] * 4
+                }
+            } for day in DAYS
+        }
+        with pytest.raises(ScheduleError):
+            get_schedule(invalid_settings)
+
+    def test_nomenclature_schedule_cache(self):
+        from datetime import datetime as dt
+        from nomenclatures.schedule import DAYS
+
+        def day_settings(volume):
+            return {
+                day: {
+                    'worktime': '09:00:00-20:00:00',
+                    'default_volume': [volume] * 4
+                } for day in DAYS
+            }
+
+        moment = dt(2024, 11, 18, 12)
+        nomenclature = Nomenclature(name='Schedule', settings=day_settings(50))
+        schedule = nomenclature.schedule
+        assert nomenclature.schedule is schedule, (
+            'Расписание станции разбирается при каждом обращении.'
+        )
+        nomenclature.settings = day_settings(30)
+        assert nomenclature.schedule.get_volume(moment) == (30, 30, 30, 30), (
+            'Громкость посчитана по старым настройкам.'
+        )
+        nomenclature.settings['mon']['default_volume'] = [20] * 4
+        assert nomenclature.schedule.get_volume(moment) == (20, 20, 20, 20), (
+            'Изменение настроек на месте не попало в расписание.'
+        )
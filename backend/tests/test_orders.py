@@ -1382,3 +1382,413 @@ class TestCeleryTasks:
         assert response.status_code == HTTPStatus.UNAUTHORIZED, (
             f'Код статуса в ответе != 401.\nОтвет:{response.json()}.'
         )
+
+
+@pytest.mark.django_db
+class TestOrderStatuses:
+    """Смена статусов заказов по расписанию (orders.tasks)."""
+
+    def test_update_order_statuses(self, adorder, bgorder):
+        from orders.tasks import update_order_statuses
+
+        start = dt.combine(dt.today().date(), dt.min.time())
+        changes = update_order_statuses(start)
+        assert not any(changes.values()), (
+            'Переведены заказы, интервал работы которых ещё не начался.'
+        )
+        changes = update_order_statuses(start + td(hours=10))
+        assert changes['adorders_started'] == [adorder.id], (
+            'Начавшийся рекламный заказ не переведён в эфир.'
+        )
+        assert changes['bgorders_started'] == [bgorder.id], (
+            'Начавшийся фоновый заказ не переведён в эфир.'
+        )
+        changes = update_order_statuses(start + td(days=2))
+        assert changes['adorders_ended'] == [adorder.id], (
+            'Закончившийся рекламный заказ не завершён.'
+        )
+        adorder.refresh_from_db()
+        bgorder.refresh_from_db()
+        assert (adorder.status, bgorder.status) == (2, 2), (
+            'Статусы закончившихся заказов не обновились в базе.'
+        )
+
+
+@pytest.mark.django_db
+class TestOrderListQueries:
+    """Количество запросов на страницу списка не зависит от её размера."""
+
+    def test_order_list_queries(
+        self,
+        admin_client,
+        adorder,
+        bgorder,
+        playlist_5,
+        clone_objects,
+        assert_constant_page_queries
+    ):
+        for order in (adorder, bgorder):
+            clone_objects(order, 3)
+            clone_objects(order, 3, playlist_id=playlist_5.id)
+        for url in (TestOrders.ad_list_url, TestOrders.bg_list_url):
+            assert_constant_page_queries(admin_client, url, (1, 7))
+        response_data = admin_client.get(f'{TestOrders.ad_list_url}?limit=7').json()
+        files_counts = {
+            order['playlist']['id']: order['playlist']['files_count']
+            for order in response_data['results']
+        }
+        assert files_counts == {
+            str(adorder.playlist_id): 1,
+            str(playlist_5.id): 2
+        }, 'Неверное количество файлов в плейлисте заказа.'
+
+    def test_name_filter_indexes(self, adorder, bgorder, assert_index_used):
+        for model in (AdOrder, BgOrder):
+            table = model._meta.db_table
+            assert_index_used(
+                model.objects.filter(name__icontains='заказ'),
+                f'{table}_name_trgm_idx'
+            )
+            # фильтр по названию станции (client__name)
+            assert_index_used(
+                model.objects.filter(client__name__icontains='станц'),
+                'nomenclature_name_trgm_idx'
+            )
+
+    def test_order_tasks_queries(
+        self,
+        adorder,
+        bgorder,
+        playlist_5,
+        clone_objects,
+        assert_constant_queries
+    ):
+        from orders.payloads import create_order_tasks
+        from tasks.models import Task
+
+        def add_orders(copies):
+            for order in (adorder, bgorder):
+                clone_objects(order, copies, playlist_id=playlist_5.id)
+            Task.objects.all().delete()
+
+        def send_orders(_):
+            count = create_order_tasks(
+                AdOrder.objects.all(),
+                BgOrder.objects.all()
+            )
+            assert count == Task.objects.count(), (
+                'Количество созданных репликаций не совпадает с ответом.'
+            )
+
+        assert_constant_queries(
+            send_orders,
+            (1, 5),
+            prepare=add_orders,
+            message='Количество запросов при отправке заказов растёт с их '
+                    'количеством'
+        )
+        playlist_files = sorted(
+            str(file.id) for file in playlist_5.files.all()
+        )
+        for task in Task.objects.filter(parameters__playlist__id=str(playlist_5.id)):
+            assert sorted(
+                file['id'] for file in task.parameters['playlist']['files']
+            ) == playlist_files, 'Файлы плейлиста в репликации не совпадают.'
+
+
+@pytest.mark.django_db
+class TestOnAir:
+
+    on_air_url = '/api/on_air/'
+
+    def test_on_air_matrix(self, admin_client, anon_client, adorder, bgorder):
+        from django.core.cache import cache
+        from orders.on_air import update_on_air
+        from orders.tasks import update_order_statuses
+
+        cache.clear()
+        response = anon_client.get(self.on_air_url)
+        assert response.status_code == HTTPStatus.UNAUTHORIZED, (
+            'Не авторизованный пользователь видит заказы в эфире.'
+        )
+        response = admin_client.get(self.on_air_url)
+        assert response.status_code == HTTPStatus.OK, (
+            'Код статуса в ответе != 200.'
+        )
+        assert response.json()['clients'] == [], (
+            'В эфире не должно быть заказов до начала их интервала.'
+        )
+        etag = response['ETag']
+        response = admin_client.get(self.on_air_url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.NOT_MODIFIED, (
+            'Не изменившаяся матрица эфира должна отдаваться с кодом 304.'
+        )
+
+        start = dt.combine(dt.today().date(), dt.min.time())
+        changes = update_order_statuses(start + td(hours=10))
+        update_on_air([*changes['adorders_started'], *changes['bgorders_started']])
+        response = admin_client.get(self.on_air_url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.OK, (
+            'После смены статусов заказов матрица эфира не обновилась.'
+        )
+        clients = response.json()['clients']
+        assert [client['id'] for client in clients] == [str(adorder.client_id)], (
+            'В матрице эфира не та станция.'
+        )
+        assert {
+            (order['id'], order['type'], order['playlist']['id'])
+            for order in clients[0]['orders']
+        } == {
+            (str(adorder.id), 'ad', str(adorder.playlist_id)),
+            (str(bgorder.id), 'bg', str(bgorder.playlist_id))
+        }, 'В матрице эфира не те заказы.'
+
+        AdOrder.objects.filter(id=adorder.id).update(status=3)
+        update_on_air([adorder.id])
+        orders = admin_client.get(self.on_air_url).json()['clients'][0]['orders']
+        assert [order['id'] for order in orders] == [str(bgorder.id)], (
+            'Отменённый заказ остался в матрице эфира.'
+        )
+
+    def test_on_air_names(self, admin_client, adorder, bgorder, nomenclature,
+                          playlist_1):
+        from django.core.cache import cache
+
+        cache.clear()
+        AdOrder.objects.filter(id=adorder.id).update(status=1)
+        BgOrder.objects.filter(id=bgorder.id).update(status=1)
+        response = admin_client.get(self.on_air_url)
+        etag = response['ETag']
+
+        nomenclature.name = 'on_air_renamed'
+        nomenclature.save(update_fields=['name'])
+        playlist_1.name = 'on_air_playlist_renamed'
+        playlist_1.save()
+        response = admin_client.get(self.on_air_url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.OK, (
+            'После переименования станции матрица эфира не обновилась.'
+        )
+        client = response.json()['clients'][0]
+        assert client['name'] == 'on_air_renamed', (
+            'В матрице эфира старое название станции.'
+        )
+        assert {order['playlist']['name'] for order in client['orders']} == {
+            'on_air_playlist_renamed'
+        }, 'В матрице эфира старое название плейлиста.'
+
+        response = admin_client.delete(f'/api/nomenclatures/{nomenclature.id}/')
+        assert response.status_code == HTTPStatus.NO_CONTENT, (
+            'Код статуса в ответе != 204.'
+        )
+        assert admin_client.get(self.on_air_url).json()['clients'] == [], (
+            'Удалённая станция осталась в матрице эфира.'
+        )
+
+
+@pytest.mark.django_db
+class TestAdLoad:
+
+    ad_list_url = '/api/adorders/'
+    ad_load_url = '/api/adorders/{adorder}/load/'
+
+    @staticmethod
+    def get_adorder_data(nomenclature_id, playlist_id, times_in_hour) -> list:
+        return [{
+            'name': 'test_load',
+            'broadcast_interval': {
+                'lower': TestOrders.get_today_date(),
+                'upper': TestOrders.get_tomorrow_date()
+            },
+            'clients': [nomenclature_id],
+            'playlist': playlist_id,
+            'broadcast_type': 3,
+            'parameters': {'times_in_hour': times_in_hour,
+                           'daily_start_time': '12:00:00',
+                           'daily_end_time': '16:00:00'}
+        }]
+
+    def test_sweep_load(self):
+        from nomenclatures.schedule import get_schedule
+        from orders.scheduling import OrderLoad, find_overbooking, sweep_load
+
+        day = {'worktime': '09:00:00-21:00:00',
+               'default_volume': [50, 50, 50, 50]}
+        schedule = get_schedule({'mon': day, 'tue': day})
+        # понедельник
+        monday = dt(2026, 10, 19)
+        orders = [
+            OrderLoad('a', monday, monday + td(days=7), 0,
+                      {'times_in_hour': 6}),
+            OrderLoad('b', monday + td(days=1), monday + td(days=3), 1,
+                      {'times_in_hour': 4, 'timedelta': [11, 0, 0]}),
+            OrderLoad(None, monday + td(days=1), monday + td(days=2), 3,
+                      {'times_in_hour': 12, 'start_time': [10, 30],
+                       'end_time': [12, 0, 0]}),
+        ]
+        segments = sweep_load(
+            orders, schedule.days, monday, monday + td(days=7)
+        )
+        assert [
+            (segment['lower'], segment['upper'], segment['orders'])
+            for segment in segments
+        ] == [
+            (monday, monday + td(days=1), ['a']),
+            (monday + td(days=1), monday + td(days=2), ['a', 'b']),
+            (monday + td(days=2), monday + td(days=3), ['a', 'b']),
+            (monday + td(days=3), monday + td(days=7), ['a']),
+        ], 'Не правильно разбит интервал на отрезки.'
+        tuesday = segments[1]['load']['tue']
+        assert (tuesday[9], tuesday[10], tuesday[11], tuesday[20]) == (
+            6, 18, 18, 10
+        ), 'Не правильно посчитана нагрузка по часам.'
+        assert sum(segments[3]['load'].get('sat', [])) == 0, (
+            'В нерабочие дни нагрузки быть не должно.'
+        )
+        assert [
+            (hour['day'], hour['hour'])
+            for hour in find_overbooking(segments, 12)
+        ] == [('tue', 10), ('tue', 11)], 'Не найдены переполненные часы.'
+
+    def test_create_overbooked_adorder(
+        self,
+        admin_client,
+        settings,
+        adorder,
+        nomenclature,
+        playlist_1
+    ):
+        from nomenclatures.schedule import DAYS
+
+        settings.AD_HOURLY_LIMIT = 12
+        nomenclature_id = str(nomenclature.id)
+        playlist_id = str(playlist_1.id)
+        adorder_count = AdOrder.objects.count()
+        response = admin_client.post(
+            self.ad_list_url,
+            data=self.get_adorder_data(nomenclature_id, playlist_id, 12),
+            format='json'
+        )
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            'Создан заказ сверх допустимого количества выходов в час.'
+        )
+        assert nomenclature.name in str(response.json()), (
+            'В ответе нет переполненной станции.'
+        )
+        assert AdOrder.objects.count() == adorder_count, (
+            'Заказ сверх лимита сохранён в базе.'
+        )
+        response = admin_client.post(
+            self.ad_list_url,
+            data=self.get_adorder_data(nomenclature_id, playlist_id, 6),
+            format='json'
+        )
+        assert response.status_code == HTTPStatus.CREATED, (
+            f'Код статуса в ответе != 201.\nОтвет: {response.json()}.'
+        )
+
+        response = admin_client.get(
+            self.ad_load_url.format(adorder=adorder.id)
+        )
+        assert response.status_code == HTTPStatus.OK, (
+            'Код статуса в ответе != 200.'
+        )
+        data = response.json()
+        day = DAYS[dt.today().weekday()]
+        assert data['segments'][0]['load'][day][12:16] == [10] * 4, (
+            'Новый заказ не учтён в нагрузке на эфир станции.'
+        )
+        assert data['overbooked'] == [], (
+            'Нагрузка в пределах лимита отмечена как переполнение.'
+        )
+
+    def test_check_ad_load_queries(
+        self,
+        adorder,
+        nomenclature,
+        assert_constant_queries,
+        assert_index_used
+    ):
+        from django.db import connection
+        from nomenclatures.models import Nomenclature
+        from orders.scheduling import OrderLoad, check_ad_load, naive
+
+        interval = AdOrder.objects.get(id=adorder.id).broadcast_interval
+        order = OrderLoad(
+            None,
+            naive(interval.lower),
+            naive(interval.upper),
+            0,
+            {'times_in_hour': 12}
+        )
+        stations = {}
+
+        def add_stations(count):
+            stations[count] = [nomenclature, *Nomenclature.objects.bulk_create([
+                Nomenclature(
+                    name=f'load_{count}_{number}',
+                    settings=nomenclature.settings
+                ) for number in range(count)
+            ])]
+
+        overbooked, _ = assert_constant_queries(
+            lambda count: check_ad_load(stations[count], order, 12),
+            (1, 5),
+            prepare=add_stations,
+            message='Количество запросов при проверке нагрузки растёт '
+                    'с количеством станций'
+        )[-1]
+        assert list(overbooked) == [nomenclature.name], (
+            'Переполнение найдено не на той станции.'
+        )
+        assert_index_used(
+            AdOrder.objects.filter(
+                status__in=(0, 1),
+                broadcast_interval__overlap=(order.lower, order.upper)
+            ),
+            'adorder_interval_gist_idx'
+        )
+        with connection.cursor() as cursor:
+            bgorder_indexes = connection.introspection.get_constraints(
+                cursor, BgOrder._meta.db_table
+            )
+        assert 'bgorder_interval_gist_idx' not in bgorder_indexes, (
+            'У фоновых заказов лишний индекс пересечения интервалов.'
+        )
+
+    def test_broken_station_settings(
+        self,
+        admin_client,
+        settings,
+        adorder,
+        nomenclature,
+        playlist_1
+    ):
+        from nomenclatures.models import Nomenclature
+
+        settings.AD_HOURLY_LIMIT = 12
+        Nomenclature.objects.filter(id=nomenclature.id).update(settings={
+            day: {**day_settings, 'worktime': '20:00:00-09:00:00'}
+            for day, day_settings in nomenclature.settings.items()
+        })
+        response = admin_client.post(
+            self.ad_list_url,
+            data=self.get_adorder_data(
+                str(nomenclature.id), str(playlist_1.id), 6
+            ),
+            format='json'
+        )
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            'Код статуса в ответе != 400.'
+        )
+        assert nomenclature.name in str(response.json()), (
+            'В ответе нет станции с ошибкой в настройках.'
+        )
+        response = admin_client.get(
+            self.ad_load_url.format(adorder=adorder.id)
+        )
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            'Код статуса в ответе != 400.'
+        )
+        assert nomenclature.name in response.json()['settings'], (
+            'В ответе нет станции с ошибкой в настройках.'
+        )
@@ -1,6 +1,9 @@
 import pytest
 from http import HTTPStatus
 
+from django.db.models import F
+
+from api.pagination import KeysetPagination
 from tasks.models import Task
 
 
@@ -182,3 +185,46 @@ class TestTasks:
         )
         task_obj = Task.objects.last()
         assert task_obj.status == 0, 'Неавторизованный пользователь смог отменить репликацию.'
+
+    def test_cursor_pagination(self, admin_client, user, nomenclature):
+        Task.objects.bulk_create([
+            Task(client=nomenclature, owner=user, parameters='test', type=17)
+            for _ in range(3)
+        ])
+        response = admin_client.get(f'{self.url}?cursor=&limit=2&count=true')
+        assert response.status_code == HTTPStatus.OK, (
+            'Не удалось получить первую страницу курсорной пагинации.'
+        )
+        response_data = response.json()
+        assert response_data['count'] == 3, 'Неверное количество репликаций.'
+        assert len(response_data['results']) == 2, 'Неверный размер страницы.'
+        assert 'cursor=' in response_data['next'], (
+            'В ссылке на следующую страницу нет курсора.'
+        )
+        response_data = admin_client.get(response_data['next']).json()
+        assert len(response_data['results']) == 1, (
+            'На последней странице должна остаться одна репликация.'
+        )
+        assert response_data['next'] is None, (
+            'У последней страницы не должно быть следующей.'
+        )
+        response_data = admin_client.get(f'{self.url}?cursor=').json()
+        assert response_data['count'] is None, (
+            'Количество не должно считаться без параметра count.'
+        )
+
+    def test_cursor_expression_ordering(self):
+        queryset = Task.objects.order_by(F('created').desc())
+        assert KeysetPagination().get_ordering(None, queryset, None) == (
+            tuple(Task._meta.ordering)
+        ), 'Сортировка выражением должна заменяться на Meta.ordering.'
+        queryset = Task.objects.order_by(F('created').desc(), 'id')
+        assert KeysetPagination().get_ordering(None, queryset, None) == (
+            ('id',)
+        ), 'Из сортировки кверисета должны остаться только поля.'
+
+    def test_pending_tasks_index(self, task, assert_index_used):
+        assert_index_used(
+            Task.objects.filter(client=task.client_id, status=0),
+            'task_pending_idx'
+        )
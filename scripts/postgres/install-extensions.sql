@@ -1,2 +1,3 @@
 \c rest_api;
-CREATE EXTENSION IF NOT EXISTS hstore;
\ No newline at end of file
+CREATE EXTENSION IF NOT EXISTS hstore;
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
\ No newline at end of file